@@ -121,6 +121,9 @@ class flags(metaclass=FlagsMeta):
     delta_execute = Flag(
         doc="Output SQL commands as executed during migration.")
 
+    delta_candidates = Flag(
+        doc="Print the number of object pairs compared by schema diff.")
+
     server = Flag(
         doc="Print server errors.")
 
@@ -75,3 +75,8 @@ class LRUMapping(collections.abc.MutableMapping):
 
     def __iter__(self):
         return iter(self._dict)
+
+    def items(self):
+        # Unlike __getitem__(), this doesn't promote the entries, so
+        # it is safe to iterate over and preserves the LRU order.
+        return self._dict.items()
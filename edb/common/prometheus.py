@@ -0,0 +1,336 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2021-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""A minimal metrics registry rendering the Prometheus text format.
+
+The instruments are plain Python objects updated in place, so that
+they are cheap enough to be used on hot paths: a counter increment is
+an attribute update, a histogram observation is a bisect plus two
+updates.  Labeled instruments keep one value per tuple of label values.
+"""
+
+
+from __future__ import annotations
+from typing import *  # NoQA
+
+import bisect
+import math
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Registry:
+
+    def __init__(self, *, prefix: Optional[str] = None) -> None:
+        self._prefix = prefix
+        self._metrics: Dict[str, BaseMetric] = {}
+
+    def _add(self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f'metric {metric.name!r} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _make_name(self, name: str) -> str:
+        if self._prefix:
+            return f'{self._prefix}_{name}'
+        return name
+
+    def new_counter(self, name: str, desc: str) -> Counter:
+        return self._add(Counter(self._make_name(name), desc))
+
+    def new_labeled_counter(
+        self, name: str, desc: str, *, labels: Tuple[str, ...],
+    ) -> LabeledCounter:
+        return self._add(
+            LabeledCounter(self._make_name(name), desc, labels=labels))
+
+    def new_gauge(self, name: str, desc: str) -> Gauge:
+        return self._add(Gauge(self._make_name(name), desc))
+
+    def new_histogram(
+        self, name: str, desc: str, *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._add(
+            Histogram(self._make_name(name), desc, buckets=buckets))
+
+    def new_labeled_histogram(
+        self, name: str, desc: str, *,
+        labels: Tuple[str, ...],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> LabeledHistogram:
+        return self._add(
+            LabeledHistogram(
+                self._make_name(name), desc, labels=labels, buckets=buckets))
+
+    def generate(self) -> str:
+        buffer: List[str] = []
+        for metric in self._metrics.values():
+            metric._generate(buffer)
+        buffer.append('')
+        return '\n'.join(buffer)
+
+
+class BaseMetric:
+
+    _type: ClassVar[str]
+
+    def __init__(self, name: str, desc: str) -> None:
+        self.name = name
+        self.desc = desc
+
+    def _generate_header(self, buffer: List[str]) -> None:
+        desc = self.desc.replace('\\', r'\\').replace('\n', r'\n')
+        buffer.append(f'# HELP {self.name} {desc}')
+        buffer.append(f'# TYPE {self.name} {self._type}')
+
+    def _generate(self, buffer: List[str]) -> None:
+        raise NotImplementedError
+
+
+M = TypeVar('M', bound=BaseMetric)
+
+
+class BaseLabeledMetric(BaseMetric):
+
+    def __init__(
+        self, name: str, desc: str, *, labels: Tuple[str, ...],
+    ) -> None:
+        super().__init__(name, desc)
+        self._labels = labels
+
+    def _check_labels(self, label_values: Tuple[str, ...]) -> None:
+        if len(label_values) != len(self._labels):
+            raise ValueError(
+                f'{self.name}: expected {len(self._labels)} label values, '
+                f'got {len(label_values)}')
+
+    def _format_labels(
+        self,
+        label_values: Tuple[str, ...],
+        extra: str = '',
+    ) -> str:
+        pairs = [
+            f'{label}="{_escape_label_value(value)}"'
+            for label, value in zip(self._labels, label_values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}'
+
+
+class Counter(BaseMetric):
+
+    _type = 'counter'
+
+    def __init__(self, name: str, desc: str) -> None:
+        super().__init__(name, desc)
+        self._value = 0.0
+
+    def inc(self, value: float = 1.0) -> None:
+        if value < 0:
+            raise ValueError('a counter cannot be decremented')
+        self._value += value
+
+    def get_value(self) -> float:
+        return self._value
+
+    def _generate(self, buffer: List[str]) -> None:
+        self._generate_header(buffer)
+        buffer.append(f'{self.name} {_format_value(self._value)}')
+
+
+class LabeledCounter(BaseLabeledMetric):
+
+    _type = 'counter'
+
+    def __init__(
+        self, name: str, desc: str, *, labels: Tuple[str, ...],
+    ) -> None:
+        super().__init__(name, desc, labels=labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, value: float, *labels: str) -> None:
+        if value < 0:
+            raise ValueError('a counter cannot be decremented')
+        try:
+            self._values[labels] += value
+        except KeyError:
+            self._check_labels(labels)
+            self._values[labels] = value
+
+    def get_value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def remove(self, *labels: str) -> None:
+        self._values.pop(labels, None)
+
+    def _generate(self, buffer: List[str]) -> None:
+        self._generate_header(buffer)
+        for labels, value in self._values.items():
+            buffer.append(
+                f'{self.name}{self._format_labels(labels)} '
+                f'{_format_value(value)}')
+
+
+class Gauge(BaseMetric):
+
+    _type = 'gauge'
+
+    def __init__(self, name: str, desc: str) -> None:
+        super().__init__(name, desc)
+        self._value = 0.0
+
+    def inc(self, value: float = 1.0) -> None:
+        self._value += value
+
+    def dec(self, value: float = 1.0) -> None:
+        self._value -= value
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def get_value(self) -> float:
+        return self._value
+
+    def _generate(self, buffer: List[str]) -> None:
+        self._generate_header(buffer)
+        buffer.append(f'{self.name} {_format_value(self._value)}')
+
+
+class _HistogramValue:
+
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self, num_buckets: int) -> None:
+        # The last slot counts the observations above the highest bucket.
+        self.counts = [0] * (num_buckets + 1)
+        self.sum = 0.0
+
+
+class BaseHistogram(BaseMetric):
+
+    _type = 'histogram'
+
+    def __init__(
+        self, name: str, desc: str, *, buckets: Sequence[float], **kwargs,
+    ) -> None:
+        super().__init__(name, desc, **kwargs)
+        buckets = sorted(buckets)
+        if not buckets:
+            raise ValueError('a histogram needs at least one bucket')
+        if buckets[-1] == math.inf:
+            buckets.pop()
+        self._buckets = tuple(buckets)
+        self._le = tuple(_format_value(b) for b in self._buckets) + ('+Inf',)
+
+    def _generate_value(
+        self,
+        buffer: List[str],
+        hv: _HistogramValue,
+        labels: Callable[[str], str],
+    ) -> None:
+        total = 0
+        for le, count in zip(self._le, hv.counts):
+            total += count
+            le_label = labels('le="' + le + '"')
+            buffer.append(f'{self.name}_bucket{le_label} {total}')
+        buffer.append(f'{self.name}_sum{labels("")} {_format_value(hv.sum)}')
+        buffer.append(f'{self.name}_count{labels("")} {total}')
+
+
+class Histogram(BaseHistogram):
+
+    def __init__(
+        self, name: str, desc: str, *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, desc, buckets=buckets)
+        self._value = _HistogramValue(len(self._buckets))
+
+    def observe(self, value: float) -> None:
+        hv = self._value
+        hv.counts[bisect.bisect_left(self._buckets, value)] += 1
+        hv.sum += value
+
+    def _generate(self, buffer: List[str]) -> None:
+        self._generate_header(buffer)
+        self._generate_value(
+            buffer,
+            self._value,
+            lambda extra: '{' + extra + '}' if extra else '',
+        )
+
+
+class LabeledHistogram(BaseHistogram, BaseLabeledMetric):
+
+    def __init__(
+        self, name: str, desc: str, *,
+        labels: Tuple[str, ...],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, desc, buckets=buckets, labels=labels)
+        self._values: Dict[Tuple[str, ...], _HistogramValue] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        try:
+            hv = self._values[labels]
+        except KeyError:
+            self._check_labels(labels)
+            hv = self._values[labels] = _HistogramValue(len(self._buckets))
+        hv.counts[bisect.bisect_left(self._buckets, value)] += 1
+        hv.sum += value
+
+    def remove(self, *labels: str) -> None:
+        self._values.pop(labels, None)
+
+    def _generate(self, buffer: List[str]) -> None:
+        self._generate_header(buffer)
+        for label_values, hv in self._values.items():
+            self._generate_value(
+                buffer,
+                hv,
+                lambda extra: self._format_labels(label_values, extra),
+            )
+
+
+def _escape_label_value(value: str) -> str:
+    return (
+        str(value)
+        .replace('\\', r'\\')
+        .replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    elif value == -math.inf:
+        return '-Inf'
+    elif isinstance(value, int) or value.is_integer():
+        return f'{value:.1f}'
+    else:
+        return repr(value)
@@ -153,12 +153,14 @@ if TYPE_CHECKING:
     from edb.ir import ast as irast
     from edb.ir import staeval as ireval
 
+    from . import context as context_mod
     from . import dispatch as dispatch_mod
     from . import inference as inference_mod
     from . import normalization as norm_mod
     from . import stmtctx as stmtctx_mod
 else:
     # Modules will be loaded lazily in _load().
+    context_mod = None
     dispatch_mod = None
     inference_mod = None
     irast = None
@@ -406,6 +408,19 @@ def evaluate_ast_to_python_val(
     return ireval.evaluate_to_python_val(ir.expr, schema=ir.schema)
 
 
+@compiler_entrypoint
+def new_schema_ref_cache(
+    schema: s_schema.Schema,
+) -> context_mod.SchemaRefCache:
+    """Return a cache to share between compilations against *schema*.
+
+    Pass it in :attr:`CompilerOptions.schema_ref_cache` to every
+    compilation against *schema* and call its ``release()`` method
+    once the IR of each compilation is no longer in use.
+    """
+    return context_mod.SchemaRefCache(schema)
+
+
 @compiler_entrypoint
 def compile_constant_tree_to_ir(
     const: qlast.BaseConstant,
@@ -499,7 +514,8 @@ def _load() -> None:
     """Load the compiler modules.  This is done once per process."""
 
     global _LOADED
-    global dispatch_mod, inference_mod, irast, ireval, norm_mod, stmtctx_mod
+    global context_mod, dispatch_mod, inference_mod, irast, ireval
+    global norm_mod, stmtctx_mod
 
     from edb.ir import ast as _irast
     from edb.ir import staeval as _ireval
@@ -508,11 +524,13 @@ def _load() -> None:
     from . import config as _config_compiler  # NOQA
     from . import stmt as _stmt_compiler  # NOQA
 
+    from . import context
     from . import dispatch
     from . import inference
     from . import normalization
     from . import stmtctx
 
+    context_mod = context
     dispatch_mod = dispatch
     inference_mod = inference
     irast = _irast
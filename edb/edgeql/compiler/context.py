@@ -97,13 +97,39 @@ class ScopeInfo:
     pinned_path_id_ns: Optional[FrozenSet[str]] = None
 
 
+class TypeRefCache(Dict[irtyputils.TypeRefCacheKey, irast.TypeRef]):
+    """A per-compilation TypeRef cache layered on a shared one."""
+
+    def __init__(
+        self,
+        shared: Dict[irtyputils.TypeRefCacheKey, irast.TypeRef],
+    ) -> None:
+        super().__init__()
+        self._shared = shared
+
+    def get(  # type: ignore[override]
+        self,
+        key: irtyputils.TypeRefCacheKey,
+        default: Optional[irast.TypeRef] = None,
+    ) -> Optional[irast.TypeRef]:
+        try:
+            return self[key]
+        except KeyError:
+            return self._shared.get(key, default)
+
+
 class PointerRefCache(Dict[irtyputils.PtrRefCacheKey, irast.BasePointerRef]):
 
     _rcache: Dict[irast.BasePointerRef, s_pointers.PointerLike]
+    _shared: Optional[PointerRefCache]
+    #: Refs from the shared cache returned by this cache.
+    _lent: Set[irast.BasePointerRef]
 
-    def __init__(self) -> None:
+    def __init__(self, shared: Optional[PointerRefCache] = None) -> None:
         super().__init__()
         self._rcache = {}
+        self._shared = shared
+        self._lent = set()
 
     def __setitem__(
         self,
@@ -113,11 +139,141 @@ class PointerRefCache(Dict[irtyputils.PtrRefCacheKey, irast.BasePointerRef]):
         super().__setitem__(key, val)
         self._rcache[val] = key[0]
 
+    def get(  # type: ignore[override]
+        self,
+        key: irtyputils.PtrRefCacheKey,
+        default: Optional[irast.BasePointerRef] = None,
+    ) -> Optional[irast.BasePointerRef]:
+        try:
+            return self[key]
+        except KeyError:
+            if self._shared is None:
+                return default
+            ref = self._shared.get(key)
+            if ref is None:
+                return default
+            self._lent.add(ref)
+            return ref
+
     def get_ptrcls_for_ref(
         self,
         ref: irast.BasePointerRef,
     ) -> Optional[s_pointers.PointerLike]:
-        return self._rcache.get(ref)
+        ptrcls = self._rcache.get(ref)
+        if ptrcls is None and self._shared is not None:
+            ptrcls = self._shared.get_ptrcls_for_ref(ref)
+        return ptrcls
+
+
+#: (candidate ids, positional argument type ids,
+#:  (keyword argument name, type id) pairs)
+CallableCacheKey = Tuple[
+    Tuple[uuid.UUID, ...],
+    Tuple[uuid.UUID, ...],
+    Tuple[Tuple[str, uuid.UUID], ...],
+]
+
+
+class SchemaRefCache:
+    """Compilation caches shared by all compilations against a schema.
+
+    IR descriptors of persistent types and pointers, and the outcome
+    of overload resolution for calls on persistent types depend only
+    on the schema, so they can be reused for as long as queries are
+    compiled against the same schema version.
+
+    Every compilation reads through its own cache layers obtained
+    from :meth:`new_type_ref_cache` and :meth:`new_ptr_ref_cache`.
+    Once the compilation (including the SQL generation) is done,
+    :meth:`release` must be called to move the entries describing
+    persistent objects into the shared caches.
+    """
+
+    schema: s_schema.Schema
+    """The schema the cached descriptors were computed for."""
+
+    type_refs: Dict[irtyputils.TypeRefCacheKey, irast.TypeRef]
+    ptr_refs: PointerRefCache
+
+    callables: Dict[CallableCacheKey, Tuple[uuid.UUID, ...]]
+    """Ids of the candidates selected by polymorphic call resolution."""
+
+    def __init__(self, schema: s_schema.Schema) -> None:
+        self.schema = schema
+        self.type_refs = {}
+        self.ptr_refs = PointerRefCache()
+        self.callables = {}
+        self._type_layers: List[TypeRefCache] = []
+        self._ptr_layers: List[PointerRefCache] = []
+
+    def new_type_ref_cache(self) -> TypeRefCache:
+        layer = TypeRefCache(self.type_refs)
+        self._type_layers.append(layer)
+        return layer
+
+    def new_ptr_ref_cache(self) -> PointerRefCache:
+        layer = PointerRefCache(self.ptr_refs)
+        self._ptr_layers.append(layer)
+        return layer
+
+    def is_persistent_type(
+        self,
+        t: s_types.Type,
+        schema: s_schema.Schema,
+    ) -> bool:
+        if self.schema.has_object(t.id):
+            return True
+        elif isinstance(t, s_types.Collection) and not t.is_view(schema):
+            return all(
+                self.is_persistent_type(st, schema)
+                for st in t.get_subtypes(schema)
+            )
+        else:
+            return False
+
+    def _is_persistent_typeref(self, typeref: irast.TypeRef) -> bool:
+        if self.schema.has_object(typeref.id):
+            return True
+        elif typeref.collection is not None and not typeref.is_view:
+            return all(
+                self._is_persistent_typeref(st) for st in typeref.subtypes
+            )
+        else:
+            return False
+
+    def release(self) -> None:
+        for type_layer in self._type_layers:
+            for key, typeref in type_layer.items():
+                if (
+                    key not in self.type_refs
+                    and self._is_persistent_typeref(typeref)
+                ):
+                    self.type_refs[key] = typeref
+        self._type_layers.clear()
+
+        for ptr_layer in self._ptr_layers:
+            for (ptrcls, direction), ptrref in ptr_layer.items():
+                if (
+                    isinstance(ptrref, irast.PointerRef)
+                    and not ptrref.is_derived
+                    and (ptrcls, direction) not in self.ptr_refs
+                    and self.schema.has_object(ptrref.id)
+                ):
+                    self.ptr_refs[ptrcls, direction] = ptrref
+                    _strip_derived_children(ptrref)
+            for ptrref in ptr_layer._lent:
+                _strip_derived_children(ptrref)
+        self._ptr_layers.clear()
+
+
+def _strip_derived_children(ptrref: irast.BasePointerRef) -> None:
+    # ptrref_from_ptrcls() adds pointers derived by a compilation
+    # to the children of their base pointer, these must not outlive
+    # the compilation.
+    if any(child.is_derived for child in ptrref.children):
+        ptrref.children = frozenset(
+            child for child in ptrref.children if not child.is_derived
+        )
 
 
 # Volatility inference computes two volatility results:
@@ -207,6 +363,9 @@ class Environment:
     ptr_ref_cache: PointerRefCache
     type_ref_cache: Dict[irtyputils.TypeRefCacheKey, irast.TypeRef]
 
+    schema_ref_cache: Optional[SchemaRefCache]
+    """Caches shared with other compilations against the same schema."""
+
     dml_exprs: List[qlast.Base]
     """A list of DML expressions (statements and DML-containing
     functions) that appear in a function body.
@@ -257,8 +416,13 @@ class Environment:
         self.schema_refs = set()
         self.schema_ref_exprs = {} if options.track_schema_ref_exprs else None
         self.created_schema_objects = set()
-        self.ptr_ref_cache = PointerRefCache()
-        self.type_ref_cache = {}
+        self.schema_ref_cache = options.schema_ref_cache
+        if self.schema_ref_cache is not None:
+            self.ptr_ref_cache = self.schema_ref_cache.new_ptr_ref_cache()
+            self.type_ref_cache = self.schema_ref_cache.new_type_ref_cache()
+        else:
+            self.ptr_ref_cache = PointerRefCache()
+            self.type_ref_cache = {}
         self.dml_exprs = []
         self.pointer_derivation_map = collections.defaultdict(list)
         self.pointer_specified_info = {}
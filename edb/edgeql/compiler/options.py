@@ -32,6 +32,8 @@ if TYPE_CHECKING:
     from edb.schema import types as s_types
     from edb.schema import pointers as s_pointers
 
+    from . import context
+
 
 @dataclass
 class GlobalCompilerOptions:
@@ -79,6 +81,10 @@ class GlobalCompilerOptions:
     #: multiplicity issues.
     validate_multiplicity: bool = False
 
+    #: TypeRef, PointerRef and call resolution caches to share with
+    #: other compilations against the same schema.
+    schema_ref_cache: Optional[context.SchemaRefCache] = None
+
 
 @dataclass
 class CompilerOptions(GlobalCompilerOptions):
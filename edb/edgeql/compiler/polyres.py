@@ -31,6 +31,7 @@ from edb.ir import utils as irutils
 
 from edb.schema import functions as s_func
 from edb.schema import name as sn
+from edb.schema import objects as s_obj
 from edb.schema import types as s_types
 
 from edb.edgeql import qltypes as ft
@@ -80,6 +81,77 @@ def find_callable(
         kwargs: Mapping[str, Tuple[s_types.Type, irast.Set]],
         ctx: context.ContextLevel) -> List[BoundCall]:
 
+    shared_cache = ctx.env.schema_ref_cache
+    if shared_cache is None:
+        return _find_callable(candidates, args=args, kwargs=kwargs, ctx=ctx)
+
+    candidates = tuple(candidates)
+    cache_key = _get_callable_cache_key(
+        candidates, args=args, kwargs=kwargs, ctx=ctx)
+    if cache_key is None:
+        return _find_callable(candidates, args=args, kwargs=kwargs, ctx=ctx)
+
+    selected = shared_cache.callables.get(cache_key)
+    if selected is not None:
+        # The resolution is known, only bind the arguments of
+        # the selected candidates.
+        matched = []
+        for candidate in candidates:
+            if cast(s_obj.Object, candidate).id in selected:
+                call = try_bind_call_args(args, kwargs, candidate, ctx=ctx)
+                if call is None:
+                    break
+                matched.append(call)
+        else:
+            return matched
+
+    matched = _find_callable(candidates, args=args, kwargs=kwargs, ctx=ctx)
+    shared_cache.callables[cache_key] = tuple(
+        cast(s_obj.Object, call.func).id for call in matched)
+    return matched
+
+
+def _get_callable_cache_key(
+        candidates: Sequence[s_func.CallableLike], *,
+        args: Sequence[Tuple[s_types.Type, irast.Set]],
+        kwargs: Mapping[str, Tuple[s_types.Type, irast.Set]],
+        ctx: context.ContextLevel) -> Optional[context.CallableCacheKey]:
+
+    shared_cache = ctx.env.schema_ref_cache
+    assert shared_cache is not None
+    schema = ctx.env.schema
+
+    if ctx.env.options.func_params is not None:
+        # Resolution in function bodies depends on the parameters.
+        return None
+
+    candidate_ids = []
+    for candidate in candidates:
+        if not isinstance(candidate, s_obj.Object):
+            return None
+        candidate_ids.append(candidate.id)
+
+    arg_type_ids = []
+    for arg_type, _ in args:
+        if not shared_cache.is_persistent_type(arg_type, schema):
+            return None
+        arg_type_ids.append(arg_type.id)
+
+    kwarg_type_ids = []
+    for name, (arg_type, _) in sorted(kwargs.items()):
+        if not shared_cache.is_persistent_type(arg_type, schema):
+            return None
+        kwarg_type_ids.append((name, arg_type.id))
+
+    return tuple(candidate_ids), tuple(arg_type_ids), tuple(kwarg_type_ids)
+
+
+def _find_callable(
+        candidates: Iterable[s_func.CallableLike], *,
+        args: Sequence[Tuple[s_types.Type, irast.Set]],
+        kwargs: Mapping[str, Tuple[s_types.Type, irast.Set]],
+        ctx: context.ContextLevel) -> List[BoundCall]:
+
     implicit_cast_distance = None
     matched = []
 
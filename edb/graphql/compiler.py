@@ -20,8 +20,8 @@
 from __future__ import annotations
 from typing import *
 
+import collections
 import dataclasses
-import functools
 import hashlib
 
 from edb import errors
@@ -47,13 +47,40 @@ class CompiledOperation:
     variables: Dict
 
 
-@functools.lru_cache()
+# The number of databases to keep GraphQL core schemas for.
+GQLCORE_CACHE_SIZE = 64
+
+# Maps database names to the latest GraphQL core schema built for
+# them, along with the schemas it was built from.
+_gqlcore_cache: collections.OrderedDict[
+    Optional[str],
+    Tuple[
+        s_schema.FlatSchema,
+        s_schema.FlatSchema,
+        s_schema.FlatSchema,
+        graphql.GQLCoreSchema,
+    ],
+] = collections.OrderedDict()
+
+
 def _get_gqlcore(
+    dbname: Optional[str],
     std_schema: s_schema.FlatSchema,
     user_schema: s_schema.FlatSchema,
     global_schema: s_schema.FlatSchema,
 ) -> graphql.GQLCoreSchema:
-    return graphql.GQLCoreSchema(
+    entry = _gqlcore_cache.get(dbname)
+    if entry is not None:
+        cached_std, cached_user, cached_global, gqlcore = entry
+        if (
+            cached_std is std_schema
+            and cached_user is user_schema
+            and cached_global is global_schema
+        ):
+            _gqlcore_cache.move_to_end(dbname)
+            return gqlcore
+
+    gqlcore = graphql.GQLCoreSchema(
         s_schema.ChainedSchema(
             std_schema,
             user_schema,
@@ -61,6 +88,15 @@ def _get_gqlcore(
         )
     )
 
+    # Replace the entry for the previous version of the schema,
+    # so that it does not stay pinned in memory.
+    _gqlcore_cache[dbname] = (std_schema, user_schema, global_schema, gqlcore)
+    _gqlcore_cache.move_to_end(dbname)
+    while len(_gqlcore_cache) > GQLCORE_CACHE_SIZE:
+        _gqlcore_cache.popitem(last=False)
+
+    return gqlcore
+
 
 def compile_graphql(
     std_schema: s_schema.FlatSchema,
@@ -74,13 +110,15 @@ def compile_graphql(
     substitutions: Optional[Dict[str, Tuple[str, int, int]]],
     operation_name: str=None,
     variables: Optional[Mapping[str, object]]=None,
+    *,
+    dbname: Optional[str]=None,
 ) -> CompiledOperation:
     if tokens is None:
         ast = graphql.parse_text(gql)
     else:
         ast = graphql.parse_tokens(gql, tokens)
 
-    gqlcore = _get_gqlcore(std_schema, user_schema, global_schema)
+    gqlcore = _get_gqlcore(dbname, std_schema, user_schema, global_schema)
 
     op = graphql.translate_ast(
         gqlcore,
@@ -1756,8 +1756,15 @@ def translate_ast(
     if variables is None:
         variables = {}
 
+    gql_schema = gqlcore.get_document_schema(document_ast)
+    errs = graphql.validate(gql_schema, document_ast)
+    if errs and gql_schema is not gqlcore.graphql_schema:
+        # Report the errors exactly as the complete schema would
+        # (e.g. with the suggestions of all the possible fields).
+        errs = graphql.validate(gqlcore.graphql_schema, document_ast)
+
     validation_errors = convert_errors(
-        graphql.validate(gqlcore.graphql_schema, document_ast),
+        errs,
         substitutions=substitutions)
     if validation_errors:
         err = validation_errors[0]
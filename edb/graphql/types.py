@@ -46,6 +46,7 @@ from graphql import (
 )
 from graphql.type import GraphQLEnumValue, GraphQLScalarType
 from graphql.language import ast as gql_ast
+from graphql.language import visitor as gql_visitor
 import itertools
 
 from edb.edgeql import ast as qlast
@@ -283,6 +284,29 @@ TOP_LEVEL_TYPES = {
     s_name.QualName(module='__graphql__', name='Query'),
     s_name.QualName(module='__graphql__', name='Mutation'),
 }
+INTROSPECTION_FIELDS = {'__schema', '__type'}
+
+# The number of document-specific GraphQL schemas to keep per
+# GQLCoreSchema.
+PARTIAL_SCHEMA_CACHE_SIZE = 256
+
+
+class _DocumentNamesCollector(gql_visitor.Visitor):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.fields: Set[str] = set()
+        self.types: Set[str] = set()
+
+    def enter_field(self, node: gql_ast.FieldNode, *args: Any) -> None:
+        self.fields.add(node.name.value)
+
+    def enter_named_type(
+        self,
+        node: gql_ast.NamedTypeNode,
+        *args: Any,
+    ) -> None:
+        self.types.add(node.name.value)
 
 
 class GQLCoreSchema:
@@ -317,8 +341,20 @@ class GQLCoreSchema:
 
     _type_map: Dict[Tuple[str, bool], GQLBaseType]
 
+    _gql_schema: Optional[GraphQLSchema]
+
+    _partial_schemas: Dict[
+        Tuple[FrozenSet[str], FrozenSet[str], FrozenSet[str]],
+        GraphQLSchema,
+    ]
+
     def __init__(self, edb_schema: s_schema.Schema) -> None:
-        '''Create a graphql schema based on edgedb schema.'''
+        '''Create a graphql schema based on edgedb schema.
+
+        Only the GraphQL type shells are created here, their fields
+        are computed when a GraphQL schema first reaches them, see
+        get_document_schema().
+        '''
 
         self.edb_schema = edb_schema
         # extract and sort modules to have a consistent type ordering
@@ -338,10 +374,7 @@ class GQLCoreSchema:
 
         # Use a fake name as a placeholder.
         Query = s_name.QualName(module='__graphql__', name='Query')
-        query = self._gql_objtypes[Query] = GraphQLObjectType(
-            name='Query',
-            fields=self.get_fields(Query),
-        )
+        self._query_fields = self.get_fields(Query)
 
         # If a database only has abstract types and scalars, no
         # mutations will be possible (such as in a blank database),
@@ -349,26 +382,10 @@ class GQLCoreSchema:
         # error, even if all that can be discovered through GraphQL
         # then is the schema.
         Mutation = s_name.QualName(module='__graphql__', name='Mutation')
-        fields = self.get_fields(Mutation)
-        if not fields:
-            mutation = None
-        else:
-            mutation = self._gql_objtypes[Mutation] = GraphQLObjectType(
-                name='Mutation',
-                fields=fields,
-            )
+        self._mutation_fields = self.get_fields(Mutation)
 
-        # get a sorted list of types relevant for the Schema
-        types = [
-            objt for name, objt in
-            itertools.chain(self._gql_objtypes.items(),
-                            self._gql_inobjtypes.items())
-            # the Query is included separately
-            if name not in TOP_LEVEL_TYPES
-        ]
-        types = sorted(types, key=lambda x: x.name)
-        self._gql_schema = GraphQLSchema(
-            query=query, mutation=mutation, types=types)
+        self._gql_schema = None
+        self._partial_schemas = {}
 
         # this map is used for GQL -> EQL translator needs
         self._type_map = {}
@@ -379,8 +396,125 @@ class GQLCoreSchema:
 
     @property
     def graphql_schema(self) -> GraphQLSchema:
+        '''The complete GraphQL schema, built on first access.'''
+        if self._gql_schema is None:
+            # get a sorted list of types relevant for the Schema
+            types = [
+                objt for name, objt in
+                itertools.chain(self._gql_objtypes.items(),
+                                self._gql_inobjtypes.items())
+                # the Query is included separately
+                if name not in TOP_LEVEL_TYPES
+            ]
+            self._gql_schema = self._make_graphql_schema(
+                self._query_fields, self._mutation_fields, types)
+
         return self._gql_schema
 
+    def get_document_schema(
+        self,
+        document: gql_ast.DocumentNode,
+    ) -> GraphQLSchema:
+        '''Return a GraphQL schema sufficient to validate *document*.
+
+        The schema only includes the root fields used by the document
+        along with the types it names explicitly (e.g. in fragments)
+        and the implementations of the named interfaces, so only the
+        part of the type graph reachable from those has to be
+        materialized.  Introspection queries get the complete schema.
+        '''
+        if self._gql_schema is not None:
+            return self._gql_schema
+
+        names = _DocumentNamesCollector()
+        gql_visitor.visit(document, names)
+
+        if names.fields & INTROSPECTION_FIELDS:
+            return self.graphql_schema
+
+        query_fields = frozenset(names.fields & self._query_fields.keys())
+        mutation_fields = frozenset(
+            names.fields & self._mutation_fields.keys())
+        type_names = frozenset(names.types - {'Query', 'Mutation'})
+        key = (query_fields, mutation_fields, type_names)
+
+        schema = self._partial_schemas.get(key)
+        if schema is None:
+            types = []
+            gql_types = self._get_types_by_name()
+            for type_name in type_names:
+                gql_type = gql_types.get(type_name)
+                if gql_type is None:
+                    # Let the validation against the complete schema
+                    # report the unknown type.
+                    return self.graphql_schema
+                types.append(gql_type)
+
+            # Fragments on interfaces are only valid if the schema
+            # knows the object types that implement them.
+            interfaces = {
+                t for t in types if isinstance(t, GraphQLInterfaceType)}
+            if interfaces:
+                types.extend(
+                    t for t in self._gql_objtypes.values()
+                    if not interfaces.isdisjoint(t.interfaces)
+                )
+
+            schema = self._make_graphql_schema(
+                {n: self._query_fields[n] for n in sorted(query_fields)},
+                {n: self._mutation_fields[n]
+                 for n in sorted(mutation_fields)},
+                types,
+            )
+
+            if len(self._partial_schemas) >= PARTIAL_SCHEMA_CACHE_SIZE:
+                del self._partial_schemas[next(iter(self._partial_schemas))]
+            self._partial_schemas[key] = schema
+
+        return schema
+
+    def _get_types_by_name(self) -> Dict[str, GraphQLNamedType]:
+        types: Dict[str, GraphQLNamedType] = {
+            t.name: t
+            for t in EDB_TO_GQL_SCALARS_MAP.values()
+            if isinstance(t, GraphQLNamedType)
+        }
+        for t in itertools.chain(
+            self._gql_enums.values(),
+            self._gql_ordertypes.values(),
+            self._gql_interfaces.values(),
+            self._gql_objtypes.values(),
+            self._gql_inobjtypes.values(),
+        ):
+            types[t.name] = t
+
+        return types
+
+    def _make_graphql_schema(
+        self,
+        query_fields: Dict[str, GraphQLField],
+        mutation_fields: Dict[str, GraphQLField],
+        types: Iterable[GraphQLNamedType],
+    ) -> GraphQLSchema:
+        query = GraphQLObjectType(
+            name='Query',
+            fields=query_fields,
+        )
+
+        if not mutation_fields:
+            mutation = None
+        else:
+            mutation = GraphQLObjectType(
+                name='Mutation',
+                fields=mutation_fields,
+            )
+
+        return GraphQLSchema(
+            query=query,
+            mutation=mutation,
+            types=sorted(types, key=lambda x: x.name),
+        )
+
     def get_gql_name(self, name: s_name.QualName) -> str:
         module, shortname = name.module, name.name
         if module in {'default', 'std'}:
@@ -89,6 +89,31 @@ class DBConfigTable(dbops.Table):
         )
 
 
+class SchemaDeltaLogTable(dbops.Table):
+    """Recent schema deltas, used by servers to refresh their schemas.
+
+    Every row transforms the schema with *base_version* into the schema
+    with *version*, as reported by the __schema_version__ object.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(name=('edgedb', '_schema_delta_log'))
+
+        self.add_columns([
+            dbops.Column(name='id', type='bigserial', required=True),
+            dbops.Column(name='base_version', type='uuid', required=True),
+            dbops.Column(name='version', type='uuid', required=True),
+            dbops.Column(name='delta', type='bytea', required=True),
+        ])
+
+        self.add_constraint(
+            dbops.UniqueConstraint(
+                table_name=('edgedb', '_schema_delta_log'),
+                columns=['version'],
+            ),
+        )
+
+
 class ExpressionType(dbops.CompositeType):
     def __init__(self) -> None:
         super().__init__(name=('edgedb', 'expression_t'))
@@ -3252,6 +3277,7 @@ async def bootstrap(conn: asyncpg.Connection) -> None:
         dbops.CreateSchema(name='edgedbstd'),
         dbops.CreateCompositeType(ExpressionType()),
         dbops.CreateTable(DBConfigTable()),
+        dbops.CreateTable(SchemaDeltaLogTable()),
         dbops.CreateFunction(QuoteIdentFunction()),
         dbops.CreateFunction(QuoteNameFunction()),
         dbops.CreateFunction(AlterCurrentDatabaseSetString()),
@@ -534,7 +534,9 @@ class RestoreReady(ServerMessage):
     mtype = MessageType('+')
     message_length = MessageLength
     headers = Headers
-    jobs = UInt16('Number of parallel jobs for restore, currently always "1"')
+    jobs = UInt16(
+        'Number of data blocks the server reads ahead; the data is '
+        'always restored on a single backend connection')
 
 
 class CommandComplete(ServerMessage):
@@ -714,7 +716,8 @@ class Prepare(ClientMessage):
     io_format = EnumOf(UInt8, IOFormat, 'Data I/O format.')
     expected_cardinality = EnumOf(UInt8, Cardinality,
                                   'Expected result cardinality')
-    statement_name = Bytes('Prepared statement name. Currently must be empty.')
+    statement_name = Bytes(
+        'Prepared statement name, empty for the anonymous statement.')
     command = String('Command text.')
 
 
@@ -766,7 +769,8 @@ class Restore(ClientMessage):
     message_length = MessageLength
     headers = Headers
     jobs = UInt16(
-        'Number of parallel jobs for restore (only "1" is supported)')
+        'Requested number of parallel jobs for restore, used by the server '
+        'as the number of data blocks to read ahead')
     header_data = Bytes(
         'Original DumpHeader packet data excluding mtype and message_length')
 
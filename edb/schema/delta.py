@@ -30,6 +30,7 @@ from edb import errors
 
 from edb.common import adapter
 from edb.common import checked
+from edb.common import debug
 from edb.common import markup
 from edb.common import ordered
 from edb.common import parsing
@@ -50,6 +51,17 @@ from . import schema as s_schema
 from . import utils
 
 
+#: Above this many (new, old) pairs, delta_objects() only scores the
+#: pairs that share a blocking key (see _get_blocking_keys()) instead of
+#: the full cross product.
+DELTA_BLOCKING_MIN_PAIRS = 4096
+
+#: Member blocking keys shared by more old objects than this are too
+#: common to tell objects apart (e.g. the ``id`` pointer of every object
+#: type) and are ignored.
+DELTA_BLOCKING_MAX_BUCKET = 64
+
+
 def delta_objects(
     old: Iterable[so.Object_T],
     new: Iterable[so.Object_T],
@@ -81,13 +93,6 @@ def delta_objects(
     newnames = {o.get_name(new_schema) for o in new}
     common_names = oldnames & newnames
 
-    pairs = sorted(
-        itertools.product(new, old),
-        key=lambda pair: pair[0].get_name(new_schema) not in common_names,
-    )
-
-    full_matrix: List[Tuple[so.Object_T, so.Object_T, float]] = []
-
     # If there are any renames that are already decided on, honor those first
     renames_x: Set[sn.Name] = set()
     renames_y: Set[sn.Name] = set()
@@ -97,9 +102,24 @@ def delta_objects(
             renames_x.add(rename.new_name)
             renames_y.add(rename.classname)
 
+    banned_alters: Dict[sn.Name, Set[sn.Name]] = {}
+    has_banned_ops = False
+
     if context.guidance is not None:
         guidance = context.guidance
 
+        for cls, (old_name, new_name) in guidance.banned_alters:
+            if cls is sclass:
+                banned_alters.setdefault(new_name, set()).add(old_name)
+
+        has_banned_ops = any(
+            cls is sclass
+            for cls, _ in itertools.chain(
+                guidance.banned_creations,
+                guidance.banned_deletions,
+            )
+        )
+
         def can_create(name: sn.Name) -> bool:
             return (sclass, name) not in guidance.banned_creations
 
@@ -118,6 +138,37 @@ def delta_objects(
         def can_delete(name: sn.Name) -> bool:
             return True
 
+    candidates: Iterable[Tuple[so.Object_T, so.Object_T]]
+    if (
+        len(new) * len(old) > DELTA_BLOCKING_MIN_PAIRS
+        # Banned creations and deletions force an ALTER regardless
+        # of similarity, so every pair is a candidate then.
+        and not has_banned_ops
+    ):
+        candidates = _get_candidate_pairs(
+            old,
+            new,
+            context=context,
+            old_schema=old_schema,
+            new_schema=new_schema,
+        )
+    else:
+        candidates = itertools.product(new, old)
+
+    pairs = sorted(
+        candidates,
+        key=lambda pair: pair[0].get_name(new_schema) not in common_names,
+    )
+
+    context.scored_pairs += len(pairs)
+    if debug.flags.delta_candidates:
+        debug.print(
+            f'delta_objects({sclass.__name__}): scored {len(pairs)} '
+            f'of {len(new) * len(old)} pairs'
+        )
+
+    full_matrix: List[Tuple[so.Object_T, so.Object_T, float]] = []
+
     for x, y in pairs:
         x_name = x.get_name(new_schema)
         y_name = y.get_name(old_schema)
@@ -166,13 +217,26 @@ def delta_objects(
         if y not in full_matrix_y:
             full_matrix_y[y] = (similarity, x)
 
-        if (
-            can_alter(y.get_name(old_schema), x.get_name(new_schema))
-            and full_matrix_x[x][0] != 1.0
-            and full_matrix_y[y][0] != 1.0
-        ):
-            x_alter_variants[x] += 1
-            y_alter_variants[y] += 1
+    # Count the alternatives to creating or deleting every object that
+    # has no exact match.  Pairs that were not scored always differ in
+    # name and so are never an exact match either.
+    inexact_x = [
+        x for x in new if full_matrix_x.get(x, (0.0, None))[0] != 1.0]
+    inexact_y = [
+        y for y in old if full_matrix_y.get(y, (0.0, None))[0] != 1.0]
+
+    if inexact_x and inexact_y:
+        inexact_y_names = {y.get_name(old_schema) for y in inexact_y}
+        banned_y: Dict[sn.Name, int] = collections.Counter()
+        for x in inexact_x:
+            banned = inexact_y_names.intersection(
+                banned_alters.get(x.get_name(new_schema), ()))
+            x_alter_variants[x] = len(inexact_y) - len(banned)
+            banned_y.update(banned)
+
+        for y in inexact_y:
+            y_alter_variants[y] = (
+                len(inexact_x) - banned_y[y.get_name(old_schema)])
 
     alters = []
 
@@ -235,7 +299,7 @@ def delta_objects(
         if can_create(x_name) and x_name not in renames_x:
             create = x.as_create_delta(schema=new_schema, context=context)
             if x_alter_variants[x] > 0 and parent_confidence != 1.0:
-                confidence = full_matrix_x[x][0]
+                confidence = full_matrix_x.get(x, (0.0, None))[0]
             else:
                 confidence = 1.0
             create.set_annotation('confidence', confidence)
@@ -259,7 +323,7 @@ def delta_objects(
         if can_delete(y_name) and y_name not in renames_y:
             delete = y.as_delete_delta(schema=old_schema, context=context)
             if y_alter_variants[y] > 0 and parent_confidence != 1.0:
-                confidence = full_matrix_y[y][0]
+                confidence = full_matrix_y.get(y, (0.0, None))[0]
             else:
                 confidence = 1.0
             delete.set_annotation('confidence', confidence)
@@ -268,6 +332,122 @@ def delta_objects(
     return delta
 
 
+def _get_candidate_pairs(
+    old: Iterable[so.Object_T],
+    new: Iterable[so.Object_T],
+    *,
+    context: so.ComparisonContext,
+    old_schema: s_schema.Schema,
+    new_schema: s_schema.Schema,
+) -> List[Tuple[so.Object_T, so.Object_T]]:
+    """Return the (new, old) pairs of objects sharing a blocking key.
+
+    Objects that are left without a distinguishing key, i.e. with only
+    their name keys, are paired with every object of the other side,
+    as they would be in the full cross product.
+    """
+    old = list(old)
+    old_keys = [
+        (y, _get_blocking_keys(y, old_schema, context, old=True))
+        for y in old
+    ]
+
+    buckets: Dict[Hashable, List[so.Object_T]] = collections.defaultdict(list)
+    for y, keys in old_keys:
+        for key in keys:
+            buckets[key].append(y)
+
+    ignored = {
+        key for key, objs in buckets.items()
+        if key[0] == 'member' and len(objs) > DELTA_BLOCKING_MAX_BUCKET
+    }
+    unblocked_old = [
+        y for y, keys in old_keys
+        if not _has_distinguishing_key(keys - ignored)
+    ]
+
+    pairs = []
+    for x in new:
+        keys = _get_blocking_keys(x, new_schema, context, old=False)
+        keys -= ignored
+        if not _has_distinguishing_key(keys):
+            pairs.extend((x, y) for y in old)
+            continue
+
+        seen: Set[so.Object_T] = set()
+        for y in itertools.chain(
+            unblocked_old,
+            *(buckets.get(key, ()) for key in keys),
+        ):
+            if y not in seen:
+                seen.add(y)
+                pairs.append((x, y))
+
+    return pairs
+
+
+def _has_distinguishing_key(keys: Set[Hashable]) -> bool:
+    return any(key[0] in {'member', 'referrer'} for key in keys)
+
+
+def _get_blocking_keys(
+    obj: so.Object,
+    schema: s_schema.Schema,
+    context: so.ComparisonContext,
+    *,
+    old: bool,
+) -> Set[Hashable]:
+    """Return the keys of the blocks *obj* belongs to when diffing.
+
+    Objects that share no key are unlikely to be similar enough to
+    be considered an ALTER or a RENAME of one another, and are not
+    compared.  An object that is both renamed and altered must still
+    share a key with its old version, so the keys overlap:
+
+    * the object name (with the already decided renames applied
+      to *old* objects), so that a pair of objects with the same name
+      is always compared;
+    * the unqualified short name, to catch module moves and renames
+      of the parent object;
+    * a key for every member of every object index of the object
+      (e.g. every pointer name of an object type), to catch renames
+      of objects that retain a part of their structure;
+    * the name of the referring object (e.g. the source of a pointer),
+      with the already decided renames applied, to catch renames of
+      objects within the same parent.
+    """
+    from . import referencing as s_referencing
+
+    name = obj.get_name(schema)
+    keys: Set[Hashable] = {('name', name)}
+    if old:
+        keys.add(('name', context.get_obj_name(schema, obj)))
+
+    cls = type(obj)
+    shortname = sn.shortname_from_fullname(name)
+    if isinstance(shortname, sn.QualName):
+        keys.add(('local', cls, shortname.name))
+    else:
+        keys.add(('local', cls, str(shortname)))
+
+    for refdict in cls.get_refdicts():
+        coll = obj.get_field_value(schema, refdict.attr)
+        if isinstance(coll, so.ObjectIndexBase):
+            keys.update(
+                ('member', cls, refdict.attr, k) for k in coll.keys(schema))
+
+    if isinstance(obj, s_referencing.ReferencedObject):
+        referrer = obj.get_referrer(schema)
+        if referrer is not None:
+            if old:
+                referrer_name = context.get_obj_name(schema, referrer)
+            else:
+                referrer_name = referrer.get_name(schema)
+            keys.add(('referrer', cls, referrer_name))
+
+    return keys
+
+
 def _sort_by_inheritance(
     schema: s_schema.Schema,
     objs: Iterable[so.InheritingObjectT],
@@ -198,6 +198,8 @@ class ComparisonContext:
     deletions: Dict[Tuple[Type[Object], sn.Name], sd.DeleteObject[Object]]
     guidance: Optional[DeltaGuidance]
     parent_ops: List[sd.ObjectCommand[Any]]
+    #: The number of object pairs compared by delta_objects().
+    scored_pairs: int
 
     def __init__(
         self,
@@ -213,6 +215,7 @@ class ComparisonContext:
         self.deletions = {}
         self.placeholder_ctr: Dict[str, int] = collections.Counter()
         self.parent_ops = []
+        self.scored_pairs = 0
 
     def is_deleting(self, schema: s_schema.Schema, obj: Object) -> bool:
         return (type(obj), obj.get_name(schema)) in self.deletions
@@ -692,10 +695,10 @@ class ObjectMeta(type):
                         ftype.schema_restore
                     ),
                 ) -> Any:
-                    data = schema.get_obj_data_raw(self)
-                    v = data[_fi]
+                    # Restored values are memoized by the schema.
+                    v = schema.get_obj_field_restored(self, _fi, _sr)
                     if v is not None:
-                        return _sr(v)
+                        return v
                     else:
                         try:
                             return _f.get_default()
@@ -1141,13 +1144,13 @@ class Object(s_abc.Object, ObjectContainer, metaclass=ObjectMeta):
         field = type(self).get_field(field_name)
 
         if isinstance(field, SchemaField):
-            data = schema.get_obj_data_raw(self)
-            val = data[field.index]
+            if field.is_reducible:
+                val = schema.get_obj_field_restored(
+                    self, field.index, field.type.schema_restore)
+            else:
+                val = schema.get_obj_data_raw(self)[field.index]
             if val is not None:
-                if field.is_reducible:
-                    return field.type.schema_restore(val)
-                else:
-                    return val
+                return val
             else:
                 try:
                     return field.get_default()
@@ -1171,13 +1174,13 @@ class Object(s_abc.Object, ObjectContainer, metaclass=ObjectMeta):
         field = type(self).get_field(field_name)
 
         if isinstance(field, SchemaField):
-            data = schema.get_obj_data_raw(self)
-            val = data[field.index]
+            if field.is_reducible:
+                val = schema.get_obj_field_restored(
+                    self, field.index, field.type.schema_restore)
+            else:
+                val = schema.get_obj_data_raw(self)[field.index]
             if val is not None:
-                if field.is_reducible:
-                    return field.type.schema_restore(val)
-                else:
-                    return val
+                return val
             elif default is not NoDefault:
                 return default
 
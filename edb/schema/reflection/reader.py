@@ -72,6 +72,10 @@ def parse_into(
     name_to_id = {}
     shortname_to_id = collections.defaultdict(set)
     globalname_to_id = {}
+    type_to_ids: Dict[str, Dict[uuid.UUID, None]] = (
+        collections.defaultdict(dict))
+    module_to_ids: Dict[s_name.Name, Dict[uuid.UUID, None]] = (
+        collections.defaultdict(dict))
     dict_of_dicts: Callable[
         [],
         Dict[Tuple[Type[s_obj.Object], str], Dict[uuid.UUID, None]],
@@ -101,6 +105,7 @@ def parse_into(
 
         if isinstance(obj, s_obj.QualifiedObject):
             name_to_id[name] = objid
+            module_to_ids[name.get_module_name()][objid] = None
         else:
             globalname_to_id[mcls, name] = objid
 
@@ -109,6 +114,7 @@ def parse_into(
             shortname_to_id[mcls, shortname].add(objid)
 
         id_to_type[objid] = type(obj).__name__
+        type_to_ids[type(obj).__name__][objid] = None
 
         all_fields = mcls.get_schema_fields()
         objdata: List[Any] = [None] * len(all_fields)
@@ -249,11 +255,27 @@ def parse_into(
         ),
         globalname_to_id=schema._globalname_to_id.update(globalname_to_id),
         refs_to=mm.finish(),
+        type_to_ids=_merge_id_index(schema._type_to_ids, type_to_ids),
+        module_to_ids=_merge_id_index(schema._module_to_ids, module_to_ids),
     )
 
     return schema
 
 
+def _merge_id_index(
+    index: immutables.Map[Any, immutables.Map[uuid.UUID, None]],
+    updates: Dict[Any, Dict[uuid.UUID, None]],
+) -> immutables.Map[Any, immutables.Map[uuid.UUID, None]]:
+    with index.mutate() as mm:
+        for key, ids in updates.items():
+            existing = mm.get(key)
+            if existing is None:
+                mm[key] = immutables.Map(ids)
+            else:
+                mm[key] = existing.update(ids)
+        return mm.finish()
+
+
 def _parse_expression(val: Dict[str, Any]) -> s_expr.Expression:
     refids = frozenset(
         uuidgen.UUID(r) for r in val['refs']
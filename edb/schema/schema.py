@@ -74,6 +74,110 @@ STD_SOURCES = (
 
 Schema_T = TypeVar('Schema_T', bound='Schema')
 
+_MISSING = object()
+
+# Maximum number of entries kept in each per-schema memo table.
+MEMO_TABLE_MAX_SIZE = 4096
+
+# Maximum number of objects whose restored reducible field values are
+# kept; larger, as the table is shared by all derived schemas.
+RESTORE_MEMO_MAX_SIZE = 65536
+
+
+class _MemoTable:
+    """A bounded memoization table for lookups on a single schema state.
+
+    Tables are owned by a FlatSchema instance and are carried over to
+    a derived schema only when the indexes the memoized lookups depend
+    on are unchanged, or when entries are checked against the data they
+    were computed from on lookup, so stale entries are never returned.
+    """
+
+    __slots__ = ('_entries', '_max_size', 'hits', 'misses')
+
+    def __init__(self, max_size: int = MEMO_TABLE_MAX_SIZE) -> None:
+        self._entries: Dict[Hashable, Any] = {}
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        result = self._entries.get(key, _MISSING)
+        if result is _MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def set(self, key: Hashable, value: Any) -> None:
+        entries = self._entries
+        if len(entries) >= self._max_size and key not in entries:
+            # Evict the oldest entry.
+            del entries[next(iter(entries))]
+        entries[key] = value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FlatSchemaDelta(NamedTuple):
+    """A set of index updates transforming one FlatSchema into another.
+
+    *base_generation* is the generation of the schema the delta must be
+    applied to, *generation* is the generation of the resulting schema.
+    *updates* contains a ``(index_name, set_entries, deleted_keys)``
+    triple for every changed index of the schema.
+    """
+
+    base_generation: int
+    generation: int
+    updates: Tuple[
+        Tuple[str, Tuple[Tuple[Any, Any], ...], Tuple[Any, ...]],
+        ...
+    ]
+
+    def get_size(self) -> int:
+        """Return the number of index entries updated by the delta.
+
+        Index values that are whole id sets are sent in full, so they
+        count as the number of ids in them.
+        """
+        size = 0
+        for _, set_entries, deleted_keys in self.updates:
+            size += len(deleted_keys)
+            for _, v in set_entries:
+                if isinstance(v, (immu.Map, frozenset)):
+                    size += len(v)
+                else:
+                    size += 1
+        return size
+
+
+def _add_to_index(
+    index: immu.Map[Any, immu.Map[uuid.UUID, None]],
+    key: Any,
+    obj_id: uuid.UUID,
+) -> immu.Map[Any, immu.Map[uuid.UUID, None]]:
+    ids = index.get(key)
+    if ids is None:
+        ids = immu.Map()
+    return index.set(key, ids.set(obj_id, None))
+
+
+def _discard_from_index(
+    index: immu.Map[Any, immu.Map[uuid.UUID, None]],
+    key: Any,
+    obj_id: uuid.UUID,
+) -> immu.Map[Any, immu.Map[uuid.UUID, None]]:
+    ids = index.get(key)
+    if ids is None or obj_id not in ids:
+        return index
+    ids = ids.delete(obj_id)
+    if ids:
+        return index.set(key, ids)
+    else:
+        return index.delete(key)
+
 
 class Schema(abc.ABC):
 
@@ -125,6 +229,22 @@ class Schema(abc.ABC):
     ) -> Tuple[Any, ...]:
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_obj_field_restored(
+        self,
+        obj: so.Object,
+        index: int,
+        restore: Callable[[Any], Any],
+    ) -> Any:
+        """Return the value of the reducible field *index* of *obj*.
+
+        The raw value is passed through *restore* (the field type's
+        ``schema_restore``), unless it is ``None``.  The result is
+        memoized, so repeated reads of an unchanged field return
+        the same object.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def set_obj_field(
         self: Schema_T,
@@ -481,7 +601,32 @@ class FlatSchema(Schema):
         uuid.UUID,
     ]
     _refs_to: Refs_T
+    # Object ids by schema class name, used by get_objects(type=...).
+    _type_to_ids: immu.Map[str, immu.Map[uuid.UUID, None]]
+    # Ids of qualified objects by module name, used by
+    # get_objects(included_modules=...).
+    _module_to_ids: immu.Map[sn.Name, immu.Map[uuid.UUID, None]]
     _generation: int
+    # Memoized lookups, see _init_memo_tables().
+    _referrers_memo: _MemoTable
+    _referrers_ex_memo: _MemoTable
+    _casts_memo: _MemoTable
+    _functions_memo: _MemoTable
+    _operators_memo: _MemoTable
+    _restore_memo: _MemoTable
+
+    # Names of all immutable indexes that make up the schema state,
+    # used to compute and apply schema deltas.
+    _index_names = (
+        '_id_to_data',
+        '_id_to_type',
+        '_name_to_id',
+        '_shortname_to_id',
+        '_globalname_to_id',
+        '_refs_to',
+        '_type_to_ids',
+        '_module_to_ids',
+    )
 
     def __init__(self) -> None:
         self._id_to_data = immu.Map()
@@ -490,7 +635,63 @@ class FlatSchema(Schema):
         self._name_to_id = immu.Map()
         self._globalname_to_id = immu.Map()
         self._refs_to = immu.Map()
+        self._type_to_ids = immu.Map()
+        self._module_to_ids = immu.Map()
         self._generation = 0
+        self._init_memo_tables(None)
+
+    def _init_memo_tables(self, base: Optional[FlatSchema]) -> None:
+        # Memo tables of *base* are reused if the indexes the
+        # respective lookups depend on are the same.
+        if base is not None and self._refs_to is base._refs_to:
+            self._referrers_memo = base._referrers_memo
+            self._referrers_ex_memo = base._referrers_ex_memo
+            if self._id_to_data is base._id_to_data:
+                self._casts_memo = base._casts_memo
+            else:
+                self._casts_memo = _MemoTable()
+        else:
+            self._referrers_memo = _MemoTable()
+            self._referrers_ex_memo = _MemoTable()
+            self._casts_memo = _MemoTable()
+
+        # Restored values are checked against the data of the object
+        # they were restored from, so the table is always carried over
+        # and only the entries of mutated objects are invalidated.
+        if base is not None:
+            self._restore_memo = base._restore_memo
+        else:
+            self._restore_memo = _MemoTable(RESTORE_MEMO_MAX_SIZE)
+
+        if base is not None and self._shortname_to_id is base._shortname_to_id:
+            self._functions_memo = base._functions_memo
+            self._operators_memo = base._operators_memo
+        else:
+            self._functions_memo = _MemoTable()
+            self._operators_memo = _MemoTable()
+
+    def get_memo_stats(self) -> Dict[str, Tuple[int, int, int]]:
+        """Return (hits, misses, size) for every memo table."""
+        return {
+            name: (table.hits, table.misses, len(table))
+            for name, table in (
+                ('referrers', self._referrers_memo),
+                ('referrers_ex', self._referrers_ex_memo),
+                ('casts', self._casts_memo),
+                ('functions', self._functions_memo),
+                ('operators', self._operators_memo),
+                ('restore', self._restore_memo),
+            )
+        }
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {name: getattr(self, name) for name in self._index_names}
+        state['_generation'] = self._generation
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._init_memo_tables(None)
 
     def _replace(
         self,
@@ -508,6 +709,12 @@ class FlatSchema(Schema):
             immu.Map[Tuple[Type[so.Object], sn.Name], uuid.UUID]
         ],
         refs_to: Optional[Refs_T] = None,
+        type_to_ids: Optional[
+            immu.Map[str, immu.Map[uuid.UUID, None]]
+        ] = None,
+        module_to_ids: Optional[
+            immu.Map[sn.Name, immu.Map[uuid.UUID, None]]
+        ] = None,
     ) -> FlatSchema:
         new = FlatSchema.__new__(FlatSchema)
 
@@ -541,10 +748,87 @@ class FlatSchema(Schema):
         else:
             new._refs_to = refs_to
 
+        if type_to_ids is None:
+            new._type_to_ids = self._type_to_ids
+        else:
+            new._type_to_ids = type_to_ids
+
+        if module_to_ids is None:
+            new._module_to_ids = self._module_to_ids
+        else:
+            new._module_to_ids = module_to_ids
+
         new._generation = self._generation + 1
+        new._init_memo_tables(self)
 
         return new  # type: ignore
 
+    def get_delta(self, new: FlatSchema) -> FlatSchemaDelta:
+        """Compute the delta that transforms this schema into *new*."""
+        updates = []
+        for index_name in self._index_names:
+            old_index = getattr(self, index_name)
+            new_index = getattr(new, index_name)
+            if old_index is new_index:
+                continue
+
+            set_entries = []
+            for k, v in new_index.items():
+                old_v = old_index.get(k, _MISSING)
+                if old_v is not v and old_v != v:
+                    set_entries.append((k, v))
+
+            deleted_keys = tuple(k for k in old_index if k not in new_index)
+
+            if set_entries or deleted_keys:
+                updates.append((index_name, tuple(set_entries), deleted_keys))
+
+        return FlatSchemaDelta(
+            base_generation=self._generation,
+            generation=new._generation,
+            updates=tuple(updates),
+        )
+
+    def apply_delta(
+        self,
+        delta: FlatSchemaDelta,
+        *,
+        rebase: bool = False,
+    ) -> FlatSchema:
+        """Return a new schema with *delta* applied to this schema.
+
+        Generations are local to a process, so a delta computed in
+        another process must be applied with *rebase* set.  In that
+        case the caller is responsible for making sure that this schema
+        is equivalent to the base schema of the delta.
+        """
+        if rebase:
+            delta = delta._replace(
+                base_generation=self._generation,
+                generation=self._generation + 1,
+            )
+        elif delta.base_generation != self._generation:
+            raise errors.SchemaError(
+                f'cannot apply schema delta: expected base schema '
+                f'generation {delta.base_generation}, got {self!r}')
+
+        new = FlatSchema.__new__(FlatSchema)
+        for index_name in self._index_names:
+            setattr(new, index_name, getattr(self, index_name))
+
+        for index_name, set_entries, deleted_keys in delta.updates:
+            with getattr(self, index_name).mutate() as mm:
+                for k in deleted_keys:
+                    del mm[k]
+                for k, v in set_entries:
+                    mm[k] = v
+                setattr(new, index_name, mm.finish())
+
+        new._generation = delta.generation
+        new._init_memo_tables(self)
+
+        return new
+
     def _update_obj_name(
         self,
         obj_id: uuid.UUID,
@@ -555,10 +839,12 @@ class FlatSchema(Schema):
         immu.Map[sn.Name, uuid.UUID],
         immu.Map[Tuple[Type[so.Object], sn.Name], FrozenSet[uuid.UUID]],
         immu.Map[Tuple[Type[so.Object], sn.Name], uuid.UUID],
+        immu.Map[sn.Name, immu.Map[uuid.UUID, None]],
     ]:
         name_to_id = self._name_to_id
         shortname_to_id = self._shortname_to_id
         globalname_to_id = self._globalname_to_id
+        module_to_ids = self._module_to_ids
         is_global = not issubclass(sclass, so.QualifiedObject)
 
         has_sn_cache = issubclass(sclass, (s_func.Function, s_oper.Operator))
@@ -568,6 +854,8 @@ class FlatSchema(Schema):
                 globalname_to_id = globalname_to_id.delete((sclass, old_name))
             else:
                 name_to_id = name_to_id.delete(old_name)
+                module_to_ids = _discard_from_index(
+                    module_to_ids, old_name.get_module_name(), obj_id)
             if has_sn_cache:
                 old_shortname = sn.shortname_from_fullname(old_name)
                 sn_key = (sclass, old_shortname)
@@ -599,6 +887,8 @@ class FlatSchema(Schema):
                     raise errors.SchemaError(
                         f'name {new_name!r} is already in the schema')
                 name_to_id = name_to_id.set(new_name, obj_id)
+                module_to_ids = _add_to_index(
+                    module_to_ids, new_name.get_module_name(), obj_id)
 
             if has_sn_cache:
                 new_shortname = sn.shortname_from_fullname(new_name)
@@ -611,7 +901,7 @@ class FlatSchema(Schema):
 
                 shortname_to_id = shortname_to_id.set(sn_key, ids | {obj_id})
 
-        return name_to_id, shortname_to_id, globalname_to_id
+        return name_to_id, shortname_to_id, globalname_to_id, module_to_ids
 
     def update_obj(
         self,
@@ -635,6 +925,7 @@ class FlatSchema(Schema):
         name_to_id = None
         shortname_to_id = None
         globalname_to_id = None
+        module_to_ids = None
         orig_refs = {}
         new_refs = {}
 
@@ -642,13 +933,16 @@ class FlatSchema(Schema):
             field = all_fields[fieldname]
             findex = field.index
             if fieldname == 'name':
-                name_to_id, shortname_to_id, globalname_to_id = (
-                    self._update_obj_name(
-                        obj_id,
-                        sclass,
-                        data[findex],
-                        value
-                    )
+                (
+                    name_to_id,
+                    shortname_to_id,
+                    globalname_to_id,
+                    module_to_ids,
+                ) = self._update_obj_name(
+                    obj_id,
+                    sclass,
+                    data[findex],
+                    value
                 )
 
             if value is None:
@@ -676,6 +970,7 @@ class FlatSchema(Schema):
         return self._replace(name_to_id=name_to_id,
                              shortname_to_id=shortname_to_id,
                              globalname_to_id=globalname_to_id,
+                             module_to_ids=module_to_ids,
                              id_to_data=id_to_data,
                              refs_to=refs_to)
 
@@ -696,6 +991,33 @@ class FlatSchema(Schema):
                    f'is not present in the schema {self!r}')
             raise errors.SchemaError(err) from None
 
+    def get_obj_field_restored(
+        self,
+        obj: so.Object,
+        index: int,
+        restore: Callable[[Any], Any],
+    ) -> Any:
+        obj_id = obj.id
+        data = self._id_to_data.get(obj_id)
+        memo = self._restore_memo
+        # Entries are (data, {index: restored_value}) for every object.
+        entry = memo.get(obj_id)
+        if entry is _MISSING or entry[0] is not data:
+            if data is None:
+                data = self.get_obj_data_raw(obj)
+            values = {}
+            memo.set(obj_id, (data, values))
+        else:
+            values = entry[1]
+
+        result = values.get(index, _MISSING)
+        if result is _MISSING:
+            result = data[index]
+            if result is not None:
+                result = restore(result)
+            values[index] = result
+        return result
+
     def set_obj_field(
         self,
         obj: so.Object,
@@ -723,11 +1045,15 @@ class FlatSchema(Schema):
         name_to_id = None
         shortname_to_id = None
         globalname_to_id = None
+        module_to_ids = None
         if fieldname == 'name':
             old_name = data[findex]
-            name_to_id, shortname_to_id, globalname_to_id = (
-                self._update_obj_name(obj_id, sclass, old_name, value)
-            )
+            (
+                name_to_id,
+                shortname_to_id,
+                globalname_to_id,
+                module_to_ids,
+            ) = self._update_obj_name(obj_id, sclass, old_name, value)
 
         data_list = list(data)
         data_list[findex] = value
@@ -753,6 +1079,7 @@ class FlatSchema(Schema):
             name_to_id=name_to_id,
             shortname_to_id=shortname_to_id,
             globalname_to_id=globalname_to_id,
+            module_to_ids=module_to_ids,
             id_to_data=id_to_data,
             refs_to=refs_to,
         )
@@ -776,19 +1103,23 @@ class FlatSchema(Schema):
         name_to_id = None
         shortname_to_id = None
         globalname_to_id = None
+        module_to_ids = None
         orig_value = data[findex]
 
         if orig_value is None:
             return self
 
         if fieldname == 'name':
-            name_to_id, shortname_to_id, globalname_to_id = (
-                self._update_obj_name(
-                    obj_id,
-                    sclass,
-                    orig_value,
-                    None
-                )
+            (
+                name_to_id,
+                shortname_to_id,
+                globalname_to_id,
+                module_to_ids,
+            ) = self._update_obj_name(
+                obj_id,
+                sclass,
+                orig_value,
+                None
             )
 
         data_list = list(data)
@@ -810,6 +1141,7 @@ class FlatSchema(Schema):
             name_to_id=name_to_id,
             shortname_to_id=shortname_to_id,
             globalname_to_id=globalname_to_id,
+            module_to_ids=module_to_ids,
             id_to_data=id_to_data,
             refs_to=refs_to,
         )
@@ -914,8 +1246,12 @@ class FlatSchema(Schema):
                     new_refs[field.name] = ref
             refs_to = self._update_refs_to(id, sclass, None, new_refs)
 
-        name_to_id, shortname_to_id, globalname_to_id = self._update_obj_name(
-            id, sclass, None, name)
+        (
+            name_to_id,
+            shortname_to_id,
+            globalname_to_id,
+            module_to_ids,
+        ) = self._update_obj_name(id, sclass, None, name)
 
         updates = dict(
             id_to_data=self._id_to_data.set(id, data),
@@ -924,6 +1260,9 @@ class FlatSchema(Schema):
             shortname_to_id=shortname_to_id,
             globalname_to_id=globalname_to_id,
             refs_to=refs_to,
+            type_to_ids=_add_to_index(
+                self._type_to_ids, sclass.__name__, id),
+            module_to_ids=module_to_ids,
         )
 
         if (
@@ -965,8 +1304,12 @@ class FlatSchema(Schema):
 
         updates = {}
 
-        name_to_id, shortname_to_id, globalname_to_id = self._update_obj_name(
-            obj.id, sclass, name, None)
+        (
+            name_to_id,
+            shortname_to_id,
+            globalname_to_id,
+            module_to_ids,
+        ) = self._update_obj_name(obj.id, sclass, name, None)
 
         object_ref_fields = sclass.get_object_reference_fields()
         if not object_ref_fields:
@@ -989,6 +1332,9 @@ class FlatSchema(Schema):
             id_to_data=self._id_to_data.delete(obj.id),
             id_to_type=self._id_to_type.delete(obj.id),
             refs_to=refs_to,
+            type_to_ids=_discard_from_index(
+                self._type_to_ids, sclass.__name__, obj.id),
+            module_to_ids=module_to_ids,
         ))
 
         return self._replace(**updates)  # type: ignore
@@ -1101,7 +1447,6 @@ class FlatSchema(Schema):
                 type=s_oper.Operator,
             )
 
-    @functools.lru_cache()
     def _get_casts(
         self,
         stype: s_types.Type,
@@ -1110,6 +1455,26 @@ class FlatSchema(Schema):
         implicit: bool = False,
         assignment: bool = False,
     ) -> FrozenSet[s_casts.Cast]:
+        key = (stype, disposition, implicit, assignment)
+        result = self._casts_memo.get(key)
+        if result is _MISSING:
+            result = self._compute_casts(
+                stype,
+                disposition=disposition,
+                implicit=implicit,
+                assignment=assignment,
+            )
+            self._casts_memo.set(key, result)
+        return result  # type: ignore
+
+    def _compute_casts(
+        self,
+        stype: s_types.Type,
+        *,
+        disposition: str,
+        implicit: bool,
+        assignment: bool,
+    ) -> FrozenSet[s_casts.Cast]:
 
         all_casts = cast(
             FrozenSet[s_casts.Cast],
@@ -1157,7 +1522,6 @@ class FlatSchema(Schema):
         return self._get_referrers(
             scls, scls_type=scls_type, field_name=field_name)
 
-    @functools.lru_cache()
     def _get_referrers(
         self,
         scls: so.Object,
@@ -1165,6 +1529,21 @@ class FlatSchema(Schema):
         scls_type: Optional[Type[so.Object_T]] = None,
         field_name: Optional[str] = None,
     ) -> FrozenSet[so.Object_T]:
+        key = (scls, scls_type, field_name)
+        result = self._referrers_memo.get(key)
+        if result is _MISSING:
+            result = self._compute_referrers(
+                scls, scls_type=scls_type, field_name=field_name)
+            self._referrers_memo.set(key, result)
+        return result  # type: ignore
+
+    def _compute_referrers(
+        self,
+        scls: so.Object,
+        *,
+        scls_type: Optional[Type[so.Object_T]],
+        field_name: Optional[str],
+    ) -> FrozenSet[so.Object_T]:
 
         try:
             refs = self._refs_to[scls.id]
@@ -1195,7 +1574,6 @@ class FlatSchema(Schema):
 
             return frozenset(referrers)  # type: ignore
 
-    @functools.lru_cache()
     def get_referrers_ex(
         self,
         scls: so.Object,
@@ -1204,6 +1582,22 @@ class FlatSchema(Schema):
     ) -> Dict[
         Tuple[Type[so.Object_T], str],
         FrozenSet[so.Object_T],
+    ]:
+        key = (scls, scls_type)
+        result = self._referrers_ex_memo.get(key)
+        if result is _MISSING:
+            result = self._compute_referrers_ex(scls, scls_type=scls_type)
+            self._referrers_ex_memo.set(key, result)
+        return result  # type: ignore
+
+    def _compute_referrers_ex(
+        self,
+        scls: so.Object,
+        *,
+        scls_type: Optional[Type[so.Object_T]],
+    ) -> Dict[
+        Tuple[Type[so.Object_T], str],
+        FrozenSet[so.Object_T],
     ]:
         try:
             refs = self._refs_to[scls.id]
@@ -1366,9 +1760,11 @@ class FlatSchema(Schema):
         type: Optional[Type[so.Object_T]] = None,
         extra_filters: Iterable[Callable[[Schema, so.Object], bool]] = (),
     ) -> SchemaIterator[so.Object_T]:
+        if included_modules:
+            included_modules = frozenset(included_modules)
         return SchemaIterator[so.Object_T](
             self,
-            self._id_to_type,
+            self._get_object_ids(type=type, included_modules=included_modules),
             exclude_stdlib=exclude_stdlib,
             exclude_global=exclude_global,
             exclude_internal=exclude_internal,
@@ -1380,6 +1776,42 @@ class FlatSchema(Schema):
             extra_filters=extra_filters,
         )
 
+    def _get_object_ids(
+        self,
+        *,
+        type: Optional[Type[so.Object]] = None,
+        included_modules: Optional[AbstractSet[sn.Name]] = None,
+    ) -> Iterable[uuid.UUID]:
+        """Return the ids of objects that might match the given filters.
+
+        The result is a superset of matching ids; the filters still
+        have to be applied to the objects themselves.
+        """
+        candidates: Optional[List[immu.Map[uuid.UUID, None]]] = None
+
+        if included_modules:
+            candidates = []
+            for module in included_modules:
+                ids = self._module_to_ids.get(module)
+                if ids is not None:
+                    candidates.append(ids)
+
+        if type is not None:
+            by_type = [
+                ids for clsname, ids in self._type_to_ids.items()
+                if issubclass(so.ObjectMeta.get_schema_class(clsname), type)
+            ]
+            if (
+                candidates is None
+                or sum(map(len, by_type)) < sum(map(len, candidates))
+            ):
+                candidates = by_type
+
+        if candidates is None:
+            return self._id_to_type
+        else:
+            return itertools.chain.from_iterable(candidates)
+
     def get_modules(self) -> Tuple[s_mod.Module, ...]:
         modules = []
         for (objtype, _), objid in self._globalname_to_id.items():
@@ -1624,6 +2056,22 @@ class ChainedSchema(Schema):
             else:
                 return self._base_schema.get_obj_data_raw(obj)
 
+    def get_obj_field_restored(
+        self,
+        obj: so.Object,
+        index: int,
+        restore: Callable[[Any], Any],
+    ) -> Any:
+        if isinstance(obj, so.GlobalObject):
+            return self._global_schema.get_obj_field_restored(
+                obj, index, restore)
+        elif self._top_schema.has_object(obj.id):
+            return self._top_schema.get_obj_field_restored(
+                obj, index, restore)
+        else:
+            return self._base_schema.get_obj_field_restored(
+                obj, index, restore)
+
     def set_obj_field(
         self,
         obj: so.Object,
@@ -1870,12 +2318,20 @@ class ChainedSchema(Schema):
         type: Optional[Type[so.Object_T]] = None,
         extra_filters: Iterable[Callable[[Schema, so.Object], bool]] = (),
     ) -> SchemaIterator[so.Object_T]:
+        if included_modules:
+            included_modules = frozenset(included_modules)
         return SchemaIterator[so.Object_T](
             self,
-            itertools.chain(
-                self._base_schema._id_to_type,
-                self._top_schema._id_to_type,
-                self._global_schema._id_to_type,
+            itertools.chain.from_iterable(
+                schema._get_object_ids(
+                    type=type,
+                    included_modules=included_modules,
+                )
+                for schema in (
+                    self._base_schema,
+                    self._top_schema,
+                    self._global_schema,
+                )
             ),
             exclude_global=exclude_global,
             exclude_stdlib=exclude_stdlib,
@@ -1901,32 +2357,34 @@ class ChainedSchema(Schema):
         return migration
 
 
-@functools.lru_cache()
 def _get_functions(
     schema: FlatSchema,
     name: sn.Name,
 ) -> Optional[Tuple[s_func.Function, ...]]:
-    objids = schema._shortname_to_id.get((s_func.Function, name))
-    if objids is None:
-        return None
-    return cast(
-        Tuple[s_func.Function, ...],
-        tuple(schema.get_by_id(oid) for oid in objids),
-    )
+    result = schema._functions_memo.get(name)
+    if result is _MISSING:
+        objids = schema._shortname_to_id.get((s_func.Function, name))
+        if objids is None:
+            result = None
+        else:
+            result = tuple(schema.get_by_id(oid) for oid in objids)
+        schema._functions_memo.set(name, result)
+    return cast(Optional[Tuple[s_func.Function, ...]], result)
 
 
-@functools.lru_cache()
 def _get_operators(
     schema: FlatSchema,
     name: sn.Name,
 ) -> Optional[Tuple[s_oper.Operator, ...]]:
-    objids = schema._shortname_to_id.get((s_oper.Operator, name))
-    if objids is None:
-        return
-    return cast(
-        Tuple[s_oper.Operator, ...],
-        tuple(schema.get_by_id(oid) for oid in objids),
-    )
+    result = schema._operators_memo.get(name)
+    if result is _MISSING:
+        objids = schema._shortname_to_id.get((s_oper.Operator, name))
+        if objids is None:
+            result = None
+        else:
+            result = tuple(schema.get_by_id(oid) for oid in objids)
+        schema._operators_memo.set(name, result)
+    return cast(Optional[Tuple[s_oper.Operator, ...]], result)
 
 
 @functools.lru_cache()
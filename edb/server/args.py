@@ -84,6 +84,11 @@ class ServerConfig(NamedTuple):
     runstate_dir: pathlib.Path
     max_backend_connections: Optional[int]
     compiler_pool_size: int
+    compiler_pool_delta_sync: bool
+    compiler_pool_max_dbs: int
+    query_cache_dir: Optional[pathlib.Path]
+    lazy_db_introspection: bool
+    db_idle_eviction_timeout: int
     echo_runtime_info: bool
     emit_server_status: str
     temp_dir: bool
@@ -325,6 +330,32 @@ _server_options = [
         '--compiler-pool-size', type=int,
         default=compute_default_compiler_pool_size(),
         callback=_validate_compiler_pool_size),
+    click.option(
+        '--compiler-pool-delta-sync', type=bool, default=False, is_flag=True,
+        help='send compiler worker processes only the changes between '
+             'the schema they hold and the new schema after DDL, instead '
+             'of the entire schema'),
+    click.option(
+        '--compiler-pool-max-dbs', type=click.IntRange(min=1),
+        default=32, metavar='NUM',
+        help='The maximum NUM of databases whose schema every compiler '
+             'worker process keeps in memory; the least recently used '
+             'ones are evicted and sent again when needed.'),
+    click.option(
+        '--query-cache-dir', type=PathPath(), default=None, metavar='PATH',
+        help='directory where compiled queries are periodically saved, so '
+             'that they are reused after a server restart; compiled queries '
+             'are not persisted if not set'),
+    click.option(
+        '--lazy-db-introspection', type=bool, default=False, is_flag=True,
+        help='introspect the schema of a database when it is first '
+             'connected to, instead of introspecting all databases on '
+             'server startup'),
+    click.option(
+        '--db-idle-eviction-timeout', type=int, default=0, metavar='SECONDS',
+        help='unload the schema of a database after it has had no '
+             'connections for this many seconds; requires '
+             '--lazy-db-introspection; 0 (the default) disables eviction'),
     click.option(
         '--echo-runtime-info', type=bool, default=False, is_flag=True,
         help='[DEPREATED, use --emit-server-status] '
@@ -459,6 +490,14 @@ def parse_args(**kwargs: Any):
 
     del kwargs['auto_shutdown']
 
+    if kwargs['db_idle_eviction_timeout'] < 0:
+        abort('--db-idle-eviction-timeout must not be negative')
+    if (
+        kwargs['db_idle_eviction_timeout']
+        and not kwargs['lazy_db_introspection']
+    ):
+        abort('--db-idle-eviction-timeout requires --lazy-db-introspection')
+
     if kwargs['temp_dir']:
         if kwargs['data_dir']:
             abort('--temp-dir is incompatible with --data-dir/-D')
@@ -0,0 +1,97 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2021-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from __future__ import annotations
+from typing import *
+
+import hashlib
+import logging
+import os
+import pathlib
+
+from edb.server import buildmeta
+from edb.server import defines
+
+
+logger = logging.getLogger('edb.server')
+
+CacheEntries = List[Tuple[Any, Any]]
+
+
+class PersistentQueryCache:
+    """On-disk storage of compiled queries, one file per database.
+
+    Every file is prefixed with a key derived from the server version,
+    the catalog version and the schema fingerprint of the database, so
+    entries compiled by a different server build or against a different
+    schema are never loaded; such files are removed instead.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self._path = path
+        self._path.mkdir(parents=True, exist_ok=True)
+
+    def _get_file_name(self, dbname: str) -> str:
+        # Database names are not necessarily valid file names.
+        dbname_hash = hashlib.sha1(dbname.encode('utf-8')).hexdigest()
+        return f'qcache_{dbname_hash}.pickle'
+
+    def _get_cache_key(self, schema_fingerprint: bytes) -> bytes:
+        h = hashlib.sha1(schema_fingerprint)
+        h.update(str(defines.EDGEDB_CATALOG_VERSION).encode())
+        h.update(buildmeta.get_version_json().encode())
+        return h.digest()
+
+    def load(self, dbname: str, schema_fingerprint: bytes) -> CacheEntries:
+        fn = self._get_file_name(dbname)
+        if not (self._path / fn).exists():
+            return []
+
+        entries = buildmeta.read_data_cache(
+            self._get_cache_key(schema_fingerprint),
+            fn,
+            source_dir=self._path,
+        )
+        if entries is None:
+            logger.debug(
+                'dropping stale persistent query cache of database %r',
+                dbname)
+            self.drop(dbname)
+            return []
+
+        return entries
+
+    def save(
+        self,
+        dbname: str,
+        schema_fingerprint: bytes,
+        entries: CacheEntries,
+    ) -> None:
+        buildmeta.write_data_cache(
+            entries,
+            self._get_cache_key(schema_fingerprint),
+            self._get_file_name(dbname),
+            target_dir=self._path,
+        )
+
+    def drop(self, dbname: str) -> None:
+        try:
+            os.unlink(self._path / self._get_file_name(dbname))
+        except FileNotFoundError:
+            pass
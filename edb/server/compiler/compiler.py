@@ -83,6 +83,9 @@ from . import status
 
 EMPTY_MAP = immutables.Map()
 
+# The number of schema versions to keep shared compilation caches for.
+SCHEMA_REF_CACHE_SIZE = 16
+
 
 @dataclasses.dataclass(frozen=True)
 class CompilerDatabaseState:
@@ -265,6 +268,14 @@ class Compiler:
         self._local_intro_query = None
         self._global_intro_query = None
         self._backend_runtime_params = backend_runtime_params
+        self._schema_ref_caches: collections.OrderedDict[
+            Tuple[int, int],
+            Tuple[
+                s_schema.Schema,
+                s_schema.Schema,
+                qlcompiler.context.SchemaRefCache,
+            ],
+        ] = collections.OrderedDict()
 
     def _hash_sql(self, sql: bytes, **kwargs: bytes):
         h = hashlib.sha1(sql)
@@ -537,6 +548,27 @@ class Compiler:
 
         return sql.decode(), argmap
 
+    def _get_schema_ref_cache(
+        self,
+        current_tx: dbstate.Transaction,
+    ) -> qlcompiler.context.SchemaRefCache:
+        user_schema = current_tx.get_user_schema()
+        global_schema = current_tx.get_global_schema()
+        key = (id(user_schema), id(global_schema))
+        entry = self._schema_ref_caches.get(key)
+        if entry is not None:
+            # The entry holds references to the schemas, so their
+            # ids cannot have been reused by other objects.
+            self._schema_ref_caches.move_to_end(key)
+            return entry[2]
+
+        cache = qlcompiler.new_schema_ref_cache(
+            current_tx.get_schema(self._std_schema))
+        self._schema_ref_caches[key] = (user_schema, global_schema, cache)
+        while len(self._schema_ref_caches) > SCHEMA_REF_CACHE_SIZE:
+            self._schema_ref_caches.popitem(last=False)
+        return cache
+
     def _compile_ql_query(
         self,
         ctx: CompileContext,
@@ -564,51 +596,66 @@ class Compiler:
             '__internal_no_const_folding',
         )
 
-        ir = qlcompiler.compile_ast_to_ir(
-            ql,
-            schema=current_tx.get_schema(self._std_schema),
-            options=qlcompiler.CompilerOptions(
-                modaliases=current_tx.get_modaliases(),
-                implicit_tid_in_shapes=(
-                    can_have_implicit_fields and ctx.inline_typeids
-                ),
-                implicit_tname_in_shapes=(
-                    can_have_implicit_fields and ctx.inline_typenames
-                ),
-                implicit_id_in_shapes=(
-                    can_have_implicit_fields and ctx.inline_objectids
-                ),
-                constant_folding=not disable_constant_folding,
-                json_parameters=ctx.json_parameters,
-                implicit_limit=ctx.implicit_limit,
-                allow_writing_protected_pointers=ctx.schema_reflection_mode,
-                apply_query_rewrites=(
-                    not ctx.bootstrap_mode
-                    and not ctx.schema_reflection_mode
-                ),
-            ),
-        )
-
-        if ir.cardinality.is_single():
-            result_cardinality = enums.Cardinality.AT_MOST_ONE
+        if ctx.bootstrap_mode or ctx.schema_reflection_mode:
+            schema_ref_cache = None
         else:
-            result_cardinality = enums.Cardinality.MANY
-            if ctx.expected_cardinality_one:
-                raise errors.ResultCardinalityMismatchError(
-                    f'the query has cardinality {result_cardinality.name} '
-                    f'which does not match the expected cardinality ONE')
+            schema_ref_cache = self._get_schema_ref_cache(current_tx)
 
-        sql_text, argmap = pg_compiler.compile_ir_to_sql(
-            ir,
-            pretty=(
-                debug.flags.edgeql_compile
-                or debug.flags.edgeql_compile_sql_text
-                or debug.flags.delta_execute
+        options = qlcompiler.CompilerOptions(
+            modaliases=current_tx.get_modaliases(),
+            implicit_tid_in_shapes=(
+                can_have_implicit_fields and ctx.inline_typeids
+            ),
+            implicit_tname_in_shapes=(
+                can_have_implicit_fields and ctx.inline_typenames
+            ),
+            implicit_id_in_shapes=(
+                can_have_implicit_fields and ctx.inline_objectids
             ),
-            expected_cardinality_one=ctx.expected_cardinality_one,
-            output_format=_convert_format(ctx.output_format),
+            constant_folding=not disable_constant_folding,
+            json_parameters=ctx.json_parameters,
+            implicit_limit=ctx.implicit_limit,
+            allow_writing_protected_pointers=ctx.schema_reflection_mode,
+            apply_query_rewrites=(
+                not ctx.bootstrap_mode
+                and not ctx.schema_reflection_mode
+            ),
+            schema_ref_cache=schema_ref_cache,
         )
 
+        try:
+            ir = qlcompiler.compile_ast_to_ir(
+                ql,
+                schema=current_tx.get_schema(self._std_schema),
+                options=options,
+            )
+
+            if ir.cardinality.is_single():
+                result_cardinality = enums.Cardinality.AT_MOST_ONE
+            else:
+                result_cardinality = enums.Cardinality.MANY
+                if ctx.expected_cardinality_one:
+                    raise errors.ResultCardinalityMismatchError(
+                        f'the query has cardinality '
+                        f'{result_cardinality.name} which does not match '
+                        f'the expected cardinality ONE')
+
+            sql_text, argmap = pg_compiler.compile_ir_to_sql(
+                ir,
+                pretty=(
+                    debug.flags.edgeql_compile
+                    or debug.flags.edgeql_compile_sql_text
+                    or debug.flags.delta_execute
+                ),
+                expected_cardinality_one=ctx.expected_cardinality_one,
+                output_format=_convert_format(ctx.output_format),
+            )
+        finally:
+            # The IR is not used past this point, so the shared
+            # TypeRefs and PointerRefs can be restored.
+            if schema_ref_cache is not None:
+                schema_ref_cache.release()
+
         if (
             (mstate := current_tx.get_migration_state())
             and not migration_block_query
@@ -17,47 +17,225 @@
 #
 
 
+"""Framed messaging between the compiler pool and its workers.
+
+Every message is a list of buffers, as produced by :func:`dumps`: a
+pickle (protocol 5) and its out-of-band buffers, so large ``bytes``
+objects wrapped in :class:`pickle.PickleBuffer` are never copied into
+the pickle stream.  Messages larger than :data:`SHM_THRESHOLD` are
+passed through a shared memory segment, only its name is sent over
+the socket.
+"""
+
 from __future__ import annotations
 
 import asyncio
+import itertools
 import os
+import pickle
 import socket
 import struct
+import tempfile
 import typing
 
 
-_uint64_unpacker = struct.Struct('!Q').unpack
+_uint64_unpack_from = struct.Struct('!Q').unpack_from
 _uint64_packer = struct.Struct('!Q').pack
 
+# Message header: request id, payload kind.
+_msg_header = struct.Struct('!QB')
+_uint32 = struct.Struct('!I')
+
+_PAYLOAD_INLINE = 0
+_PAYLOAD_SHM = 1
+
+# The size of the preallocated receive buffer.  Messages that do not
+# fit into it are received into a buffer of their own.
+READ_BUFFER_SIZE = 64 * 1024
+
+# Messages larger than this are passed through shared memory.
+SHM_THRESHOLD = 1024 * 1024
+
+# POSIX shared memory objects live in /dev/shm on Linux.
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+_shm_counter = itertools.count()
+
+Buffer = typing.Union[bytes, bytearray, memoryview]
+
+
+def dumps(obj: typing.Any) -> typing.List[Buffer]:
+    buffers: typing.List[pickle.PickleBuffer] = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    return [data, *(buf.raw() for buf in buffers)]
+
+
+def loads(parts: typing.Sequence[memoryview]) -> typing.Any:
+    return pickle.loads(parts[0], buffers=parts[1:])
+
+
+def _encode_parts(parts: typing.Sequence[Buffer]) -> typing.List[Buffer]:
+    table = struct.pack(
+        f'!I{len(parts)}Q', len(parts), *(len(p) for p in parts))
+    return [table, *parts]
+
+
+def _decode_parts(payload: memoryview) -> typing.List[memoryview]:
+    nparts = _uint32.unpack_from(payload)[0]
+    lengths = struct.unpack_from(f'!{nparts}Q', payload, 4)
+    offset = 4 + 8 * nparts
+    parts = []
+    for length in lengths:
+        parts.append(payload[offset:offset + length])
+        offset += length
+    return parts
+
+
+def _write_shm(name: str, chunks: typing.Sequence[Buffer]) -> None:
+    fd = os.open(
+        os.path.join(SHM_DIR, name),
+        os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+        0o600,
+    )
+    try:
+        for chunk in chunks:
+            view = memoryview(chunk).cast('B')
+            while view:
+                view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def _read_shm(name: str) -> memoryview:
+    path = os.path.join(SHM_DIR, name)
+    with open(path, 'rb', buffering=0) as f:
+        buf = memoryview(bytearray(os.fstat(f.fileno()).st_size))
+        pos = 0
+        while pos < len(buf):
+            n = f.readinto(buf[pos:])
+            if not n:
+                raise ConnectionError(
+                    f'shared memory segment {name} is truncated')
+            pos += n
+    os.unlink(path)
+    return buf
+
+
+def _unlink_shm(name: typing.Optional[str]) -> None:
+    if name is not None:
+        try:
+            os.unlink(os.path.join(SHM_DIR, name))
+        except FileNotFoundError:
+            pass
+
+
+def encode_message(
+    req_id: int,
+    parts: typing.Sequence[Buffer],
+) -> typing.Tuple[typing.List[Buffer], typing.Optional[str]]:
+    """Frame a message.
+
+    Return the buffers to write to the socket and the name of the
+    shared memory segment the payload was put into, if any.
+    """
+    payload = _encode_parts(parts)
+    size = sum(len(p) for p in payload)
+    if size > SHM_THRESHOLD:
+        shm_name = f'edgedb-amsg-{os.getpid()}-{next(_shm_counter)}'
+        _write_shm(shm_name, payload)
+        header = _msg_header.pack(req_id, _PAYLOAD_SHM)
+        name = shm_name.encode()
+        return [_uint64_packer(len(header) + len(name)), header, name], (
+            shm_name)
+    else:
+        header = _msg_header.pack(req_id, _PAYLOAD_INLINE)
+        return [_uint64_packer(len(header) + size), header, *payload], None
+
+
+def decode_message(
+    msg: Buffer,
+) -> typing.Tuple[int, typing.List[memoryview]]:
+    msgview = memoryview(msg)
+    req_id, kind = _msg_header.unpack_from(msgview)
+    payload = msgview[_msg_header.size:]
+    if kind == _PAYLOAD_SHM:
+        payload = _read_shm(str(payload, 'utf-8'))
+    return req_id, _decode_parts(payload)
 
-class MessageStream:
-    """Data stream that yields messages."""
-
-    def __init__(self):
-        self._buffer = b''
-        self._curmsg_len = -1
-
-    def feed_data(self, data):
-        # TODO: rewrite to avoid buffer copies.
-        self._buffer += data
-        while self._buffer:
-            if self._curmsg_len == -1:
-                if len(self._buffer) >= 8:
-                    self._curmsg_len = _uint64_unpacker(self._buffer[:8])[0]
-                    self._buffer = self._buffer[8:]
-                else:
-                    return
 
-            if self._curmsg_len > 0 and len(self._buffer) >= self._curmsg_len:
-                msg = self._buffer[:self._curmsg_len]
-                self._buffer = self._buffer[self._curmsg_len:]
-                self._curmsg_len = -1
-                yield msg
+class MessageStream:
+    """Data stream that yields messages.
+
+    Data is received straight into a preallocated buffer returned by
+    get_buffer().  Messages that do not fit into it are received into
+    a buffer of their own, so that no byte is copied more than once.
+    """
+
+    def __init__(self, buffer_size: int = READ_BUFFER_SIZE):
+        self._buf = memoryview(bytearray(buffer_size))
+        # Received data not yet processed is in self._buf[_start:_end].
+        self._start = 0
+        self._end = 0
+        # The buffer of a large message being received.
+        self._msg: typing.Optional[memoryview] = None
+        self._msg_pos = 0
+
+    def get_buffer(self) -> memoryview:
+        if self._msg is not None:
+            return self._msg[self._msg_pos:]
+        if self._end == len(self._buf):
+            # Move the incomplete message to the start of the buffer.
+            pending = self._end - self._start
+            self._buf[:pending] = self._buf[self._start:self._end]
+            self._start = 0
+            self._end = pending
+        return self._buf[self._end:]
+
+    def buffer_updated(self, nbytes: int) -> typing.List[Buffer]:
+        if self._msg is not None:
+            self._msg_pos += nbytes
+            if self._msg_pos < len(self._msg):
+                return []
+            msg = self._msg
+            self._msg = None
+            return [msg]
+
+        self._end += nbytes
+        msgs: typing.List[Buffer] = []
+        while self._end - self._start >= 8:
+            msg_len = _uint64_unpack_from(self._buf, self._start)[0]
+            begin = self._start + 8
+            received = self._end - begin
+            if received >= msg_len:
+                msgs.append(bytes(self._buf[begin:begin + msg_len]))
+                self._start = begin + msg_len
+            elif msg_len + 8 > len(self._buf):
+                msg = memoryview(bytearray(msg_len))
+                msg[:received] = self._buf[begin:self._end]
+                self._msg = msg
+                self._msg_pos = received
+                self._start = self._end = 0
+                break
             else:
-                return
+                break
+
+        if self._start == self._end:
+            self._start = self._end = 0
+        return msgs
+
+    def feed_data(self, data: Buffer) -> typing.List[Buffer]:
+        view = memoryview(data).cast('B')
+        msgs = []
+        while view:
+            buf = self.get_buffer()
+            n = min(len(buf), len(view))
+            buf[:n] = view[:n]
+            view = view[n:]
+            msgs.extend(self.buffer_updated(n))
+        return msgs
 
 
-class HubProtocol(asyncio.Protocol):
+class HubProtocol(asyncio.BufferedProtocol):
     """The Protocol used on the hub side connecting to workers."""
 
     def __init__(self, *, loop, on_pid, on_connection_lost):
@@ -67,44 +245,69 @@ class HubProtocol(asyncio.Protocol):
         self._stream = MessageStream()
         self._resp_waiter = None
         self._resp_expected_id = -1
+        # Shared memory segments of the requests, by request id.
+        self._req_shm_names: typing.Dict[int, str] = {}
         self._on_pid = on_pid
         self._on_connection_lost = on_connection_lost
         self._pid = None
+        self._pid_buf = memoryview(bytearray(8))
+        self._pid_received = 0
 
     def connection_made(self, tr):
         self._transport = tr
 
-    def send(self, req_id: int, waiter: asyncio.Future, payload: bytes):
+    def send(
+        self,
+        req_id: int,
+        waiter: asyncio.Future,
+        parts: typing.Sequence[Buffer],
+    ):
         if self._resp_waiter is not None and not self._resp_waiter.done():
             raise RuntimeError('FramedProtocol: another send() is in progress')
         self._resp_waiter = waiter
         self._resp_expected_id = req_id
-        self._transport.writelines(
-            (_uint64_packer(len(payload) + 8), _uint64_packer(req_id), payload)
-        )
+        buffers, shm_name = encode_message(req_id, parts)
+        if shm_name is not None:
+            self._req_shm_names[req_id] = shm_name
+        # Not writelines(), which joins the buffers.
+        for buf in buffers:
+            self._transport.write(buf)
 
     def process_message(self, msg):
-        msgview = memoryview(msg)
-        req_id = _uint64_unpacker(msgview[:8])[0]
+        req_id, parts = decode_message(msg)
+        if self._req_shm_names:
+            # Requests are processed in order, so the worker has
+            # consumed the segments of this and all prior requests.
+            for sent_id in [i for i in self._req_shm_names if i <= req_id]:
+                _unlink_shm(self._req_shm_names.pop(sent_id))
         if req_id != self._resp_expected_id:
             # This could have happened if the previous request got cancelled.
             return
         if self._resp_waiter is not None and not self._resp_waiter.done():
-            self._resp_waiter.set_result(msgview[8:])
+            self._resp_waiter.set_result(parts)
             self._resp_waiter = None
             self._resp_expected_id = -1
 
-    def data_received(self, data):
+    def get_buffer(self, sizehint):
+        if self._pid is None:
+            return self._pid_buf[self._pid_received:]
+        return self._stream.get_buffer()
+
+    def buffer_updated(self, nbytes):
         if self._pid is None:
-            pid_data = data[:8]
-            data = data[8:]
-            self._pid = _uint64_unpacker(pid_data)[0]
-            self._on_pid(self, self._transport, self._pid)
-        for msg in self._stream.feed_data(data):
+            self._pid_received += nbytes
+            if self._pid_received == len(self._pid_buf):
+                self._pid = _uint64_unpack_from(self._pid_buf)[0]
+                self._on_pid(self, self._transport, self._pid)
+            return
+        for msg in self._stream.buffer_updated(nbytes):
             self.process_message(msg)
 
     def connection_lost(self, exc):
         self._closed = True
+        for shm_name in self._req_shm_names.values():
+            _unlink_shm(shm_name)
+        self._req_shm_names.clear()
 
         if self._resp_waiter is not None:
             if exc is not None:
@@ -129,12 +332,15 @@ class HubConnection:
     def is_closed(self):
         return self._protocol._closed
 
-    async def request(self, data: bytes) -> bytes:
+    async def request(
+        self,
+        parts: typing.Sequence[Buffer],
+    ) -> typing.List[memoryview]:
         self._req_id_cnt += 1
         req_id = self._req_id_cnt
 
         waiter = self._loop.create_future()
-        self._protocol.send(req_id, waiter, data)
+        self._protocol.send(req_id, waiter, parts)
         return await waiter
 
     def abort(self):
@@ -149,33 +355,48 @@ class WorkerConnection:
         self._sock.connect(sockname)
         self._sock.sendall(_uint64_packer(os.getpid()))
         self._stream = MessageStream()
+        # Shared memory segments of the replies, the hub removes
+        # them once read.
+        self._reply_shm_names: typing.Set[str] = set()
+
+    def reply(self, req_id, parts: typing.Sequence[Buffer]):
+        buffers, shm_name = encode_message(req_id, parts)
+        if shm_name is not None:
+            self._reply_shm_names.add(shm_name)
+        buffers = [memoryview(b).cast('B') for b in buffers if len(b)]
+        while buffers:
+            sent = self._sock.sendmsg(buffers)
+            while sent:
+                if sent >= len(buffers[0]):
+                    sent -= len(buffers.pop(0))
+                else:
+                    buffers[0] = buffers[0][sent:]
+                    sent = 0
 
-    def _on_message(self, msg: bytes):
-        msgview = memoryview(msg)
-        req_id = _uint64_unpacker(msgview[:8])[0]
-        return req_id, msgview[8:]
-
-    def reply(self, req_id, payload):
-        self._sock.sendall(
-            b"".join(
-                (
-                    _uint64_packer(len(payload) + 8),
-                    _uint64_packer(req_id),
-                    payload,
-                )
-            )
-        )
-
-    def iter_request(self):
+    def iter_request(
+        self,
+    ) -> typing.Iterator[typing.Tuple[int, typing.List[memoryview]]]:
         while True:
-            data = b'' if self._sock is None else self._sock.recv(4096)
-            if not data:
+            if self._sock is None:
+                nbytes = 0
+            else:
+                nbytes = self._sock.recv_into(self._stream.get_buffer())
+            if not nbytes:
                 # EOF received - abort
                 self.abort()
                 return
-            yield from map(self._on_message, self._stream.feed_data(data))
+            msgs = self._stream.buffer_updated(nbytes)
+            if msgs and self._reply_shm_names:
+                self._reply_shm_names = {
+                    name for name in self._reply_shm_names
+                    if os.path.exists(os.path.join(SHM_DIR, name))
+                }
+            yield from map(decode_message, msgs)
 
     def abort(self):
+        for shm_name in self._reply_shm_names:
+            _unlink_shm(shm_name)
+        self._reply_shm_names.clear()
         if self._sock is not None:
             self._sock.close()
             self._sock = None
@@ -31,8 +31,7 @@ import subprocess
 import sys
 import time
 
-import immutables
-
+from edb.server import metrics
 from edb.server import pgcluster
 
 from edb.common import debug
@@ -45,6 +44,10 @@ from . import state
 PROCESS_INITIAL_RESPONSE_TIMEOUT: float = 60.0
 KILL_TIMEOUT: float = 10.0
 WORKER_MOD: str = __name__.rpartition('.')[0] + '.worker'
+DEFAULT_MAX_DBS_PER_WORKER: int = 32
+# How long to wait for a busy worker that already holds the schema of
+# the database before syncing it to another worker.
+DB_AFFINITY_TIMEOUT: float = 0.01
 
 
 logger = logging.getLogger("edb.server")
@@ -57,9 +60,22 @@ _ENV = os.environ.copy()
 _ENV['PYTHONPATH'] = ':'.join(sys.path)
 
 
+# Pickled schemas and configs are wrapped into PickleBuffer so that
+# they are sent to the workers out-of-band, without being copied into
+# the pickle of the call.
+
 @functools.lru_cache()
 def _pickle_memoized(schema):
-    return pickle.dumps(schema, -1)
+    return pickle.PickleBuffer(pickle.dumps(schema, -1))
+
+
+@functools.lru_cache()
+def _pickle_schema_delta_memoized(base_schema, schema):
+    delta = base_schema.get_delta(schema)
+    if delta.get_size() > len(schema._id_to_data):
+        # The schema has changed too much, a full transfer is cheaper.
+        return _pickle_memoized(schema)
+    return pickle.PickleBuffer(pickle.dumps(delta, -1))
 
 
 class Worker:
@@ -69,7 +85,7 @@ class Worker:
     def __init__(
         self,
         manager,
-        dbs: state.DatabasesState,
+        max_dbs: int,
         backend_runtime_params: pgcluster.BackendRuntimeParams,
         std_schema,
         refl_schema,
@@ -79,7 +95,7 @@ class Worker:
         server,
         pid
     ):
-        self._dbs = dbs
+        self._dbs = state.DatabasesState(max_dbs)
         self._pid = pid
 
         self._backend_runtime_params = backend_runtime_params
@@ -95,8 +111,12 @@ class Worker:
         self._con = None
         self._last_used = time.monotonic()
         self._closed = False
+        # A small index identifying the worker in metrics, reused by
+        # the workers that replace it.
+        self._slot = manager._acquire_worker_slot()
+        self._slot_label = str(self._slot)
 
-    async def _attach(self, init_args_pickled: bytes):
+    async def _attach(self, init_args_pickled: pickle.PickleBuffer):
         self._manager._stats_spawned += 1
 
         self._con = self._server.get_by_pid(self._pid)
@@ -117,12 +137,12 @@ class Worker:
                 'the connection to the compiler worker process is '
                 'unexpectedly closed')
 
-        msg = pickle.dumps((method_name, args))
+        msg = amsg.dumps((method_name, args))
         data = await self._con.request(msg)
-        status, *data = pickle.loads(data)
-
         self._last_used = time.monotonic()
 
+        status, *data = amsg.loads(data)
+
         if status == 0:
             if sync_state is not None:
                 sync_state()
@@ -146,6 +166,7 @@ class Worker:
         self._closed = True
         self._manager._stats_killed += 1
         self._manager._workers.pop(self._pid, None)
+        self._manager._release_worker_slot(self._slot)
         self._manager._report_worker(self, action="kill")
         try:
             os.kill(self._pid, signal.SIGTERM)
@@ -169,6 +190,8 @@ class Pool(amsg.ServerProtocol):
         refl_schema,
         schema_class_layout,
         pool_size,
+        schema_delta_sync: bool = False,
+        max_dbs_per_worker: int = DEFAULT_MAX_DBS_PER_WORKER,
     ):
         self._loop = loop
         self._dbindex = dbindex
@@ -182,10 +205,23 @@ class Pool(amsg.ServerProtocol):
 
         self._poolsock_name = os.path.join(
             self._runstate_dir, 'compilers.socket')
+        self._preload_file_name = os.path.join(
+            self._runstate_dir, 'compilers.preload')
 
         assert pool_size >= 1
         self._pool_size = pool_size
         self._workers = {}
+        self._worker_slots = set()
+
+        # When enabled, workers that already hold a previous version
+        # of a schema receive only the delta against it instead of
+        # the entire pickled schema.
+        self._schema_delta_sync = schema_delta_sync
+
+        # The number of database states every worker keeps, see
+        # state.DatabasesState.
+        assert max_dbs_per_worker >= 1
+        self._max_dbs_per_worker = max_dbs_per_worker
 
         self._server = amsg.Server(self._poolsock_name, loop, self)
         self._template_proc = None
@@ -206,7 +242,11 @@ class Pool(amsg.ServerProtocol):
             self._server,
             pid,
         )
-        await worker._attach(init_args_pickled)
+        try:
+            await worker._attach(init_args_pickled)
+        except BaseException:
+            self._release_worker_slot(worker._slot)
+            raise
         self._report_worker(worker)
 
         self._workers[pid] = worker
@@ -227,20 +267,8 @@ class Pool(amsg.ServerProtocol):
 
     @functools.lru_cache(maxsize=None)
     def _get_init_args(self):
-        dbs: state.DatabasesState = immutables.Map()
-        for db in self._dbindex.iter_dbs():
-            dbs = dbs.set(
-                db.name,
-                state.DatabaseState(
-                    name=db.name,
-                    user_schema=db.user_schema,
-                    reflection_cache=db.reflection_cache,
-                    database_config=db.db_config,
-                )
-            )
-
         init_args = (
-            dbs,
+            self._max_dbs_per_worker,
             self._backend_runtime_params,
             self._std_schema,
             self._refl_schema,
@@ -251,7 +279,38 @@ class Pool(amsg.ServerProtocol):
         return init_args
 
     def _get_pickled_init_args(self):
-        return pickle.dumps(self._get_init_args(), -1)
+        # The instance-wide part of the init args is preloaded by
+        # the template process, see _write_preload_file().
+        (
+            max_dbs,
+            _backend_runtime_params,
+            _std_schema,
+            _refl_schema,
+            _schema_class_layout,
+            global_schema,
+            system_config,
+        ) = self._get_init_args()
+        return pickle.PickleBuffer(
+            pickle.dumps((max_dbs, global_schema, system_config), -1))
+
+    def _write_preload_file(self):
+        with open(self._preload_file_name, 'wb') as f:
+            pickle.dump(
+                (
+                    self._backend_runtime_params,
+                    self._std_schema,
+                    self._refl_schema,
+                    self._schema_class_layout,
+                ),
+                f,
+                -1,
+            )
+
+    def _remove_preload_file(self):
+        try:
+            os.unlink(self._preload_file_name)
+        except FileNotFoundError:
+            pass
 
     def worker_connected(self, pid):
         logger.debug("Worker with PID %s connected, sending init args.", pid)
@@ -263,7 +322,23 @@ class Pool(amsg.ServerProtocol):
 
     def worker_disconnected(self, pid):
         logger.debug("Worker with PID %s disconnected.", pid)
-        self._workers.pop(pid, None)
+        worker = self._workers.pop(pid, None)
+        if worker is not None:
+            self._release_worker_slot(worker._slot)
+
+    def _acquire_worker_slot(self) -> int:
+        slot = 0
+        while slot in self._worker_slots:
+            slot += 1
+        self._worker_slots.add(slot)
+        return slot
+
+    def _release_worker_slot(self, slot: int) -> None:
+        self._worker_slots.discard(slot)
+
+    def _observe_compile(self, worker, started_at):
+        metrics.compile_duration.observe(
+            time.monotonic() - started_at, worker._slot_label)
 
     async def start(self):
         if self._running is not None:
@@ -278,20 +353,26 @@ class Pool(amsg.ServerProtocol):
         env = _ENV
         if debug.flags.server:
             env = {'EDGEDB_DEBUG_SERVER': '1', **_ENV}
-        self._template_proc = await asyncio.create_subprocess_exec(
-            *[
-                sys.executable, '-m', WORKER_MOD,
-                '--sockname', self._poolsock_name,
-                '--numproc', str(self._pool_size),
-            ],
-            env=env,
-            stdin=subprocess.DEVNULL,
-        )
+        self._write_preload_file()
+        try:
+            self._template_proc = await asyncio.create_subprocess_exec(
+                *[
+                    sys.executable, '-m', WORKER_MOD,
+                    '--sockname', self._poolsock_name,
+                    '--numproc', str(self._pool_size),
+                    '--preload-file', self._preload_file_name,
+                ],
+                env=env,
+                stdin=subprocess.DEVNULL,
+            )
 
-        await asyncio.wait_for(
-            self._ready_evt.wait(),
-            PROCESS_INITIAL_RESPONSE_TIMEOUT
-        )
+            await asyncio.wait_for(
+                self._ready_evt.wait(),
+                PROCESS_INITIAL_RESPONSE_TIMEOUT
+            )
+        except BaseException:
+            self._remove_preload_file()
+            raise
 
     async def stop(self):
         if not self._running:
@@ -308,6 +389,10 @@ class Pool(amsg.ServerProtocol):
             proc.terminate()
             await proc.wait()
 
+        # Kept until now, so that a restarted template process
+        # can read it again.
+        self._remove_preload_file()
+
         self._running = False
 
     def _report_worker(self, worker: Worker, *, action: str = "spawn"):
@@ -325,6 +410,12 @@ class Pool(amsg.ServerProtocol):
             self._stats_killed,
         )
 
+    def _pickle_schema(self, worker_schema, schema):
+        if self._schema_delta_sync and worker_schema is not None:
+            return _pickle_schema_delta_memoized(worker_schema, schema)
+        else:
+            return _pickle_memoized(schema)
+
     def _compute_compile_preargs(
         self,
         worker,
@@ -346,6 +437,8 @@ class Pool(amsg.ServerProtocol):
             database_config=None,
             system_config=None,
         ):
+            # Mirrors the update of the LRU in worker.__sync__(), so
+            # this must be called on every successful sync.
             worker_db = worker._dbs.get(dbname)
             if worker_db is None:
                 assert user_schema is not None
@@ -354,7 +447,7 @@ class Pool(amsg.ServerProtocol):
                 assert database_config is not None
                 assert system_config is not None
 
-                worker._dbs = worker._dbs.set(dbname, state.DatabaseState(
+                worker._dbs.use(state.DatabaseState(
                     name=dbname,
                     user_schema=user_schema,
                     reflection_cache=reflection_cache,
@@ -363,20 +456,15 @@ class Pool(amsg.ServerProtocol):
                 worker._global_schema = global_schema
                 worker._system_config = system_config
             else:
-                if (
-                    user_schema is not None
-                    or reflection_cache is not None
-                    or database_config is not None
-                ):
-                    worker._dbs = worker._dbs.set(dbname, state.DatabaseState(
-                        name=dbname,
-                        user_schema=(
-                            user_schema or worker_db.user_schema),
-                        reflection_cache=(
-                            reflection_cache or worker_db.reflection_cache),
-                        database_config=(
-                            database_config or worker_db.database_config),
-                    ))
+                worker._dbs.use(state.DatabaseState(
+                    name=dbname,
+                    user_schema=(
+                        user_schema or worker_db.user_schema),
+                    reflection_cache=(
+                        reflection_cache or worker_db.reflection_cache),
+                    database_config=(
+                        database_config or worker_db.database_config),
+                ))
 
                 if global_schema is not None:
                     worker._global_schema = global_schema
@@ -388,6 +476,7 @@ class Pool(amsg.ServerProtocol):
         to_update = {}
 
         if worker_db is None:
+            metrics.compiler_db_resyncs_total.inc(1.0, dbname)
             preargs += (
                 _pickle_memoized(user_schema),
                 _pickle_memoized(reflection_cache),
@@ -405,7 +494,7 @@ class Pool(amsg.ServerProtocol):
         else:
             if worker_db.user_schema is not user_schema:
                 preargs += (
-                    _pickle_memoized(user_schema),
+                    self._pickle_schema(worker_db.user_schema, user_schema),
                 )
                 to_update['user_schema'] = user_schema
             else:
@@ -421,7 +510,7 @@ class Pool(amsg.ServerProtocol):
 
             if worker._global_schema is not global_schema:
                 preargs += (
-                    _pickle_memoized(global_schema),
+                    self._pickle_schema(worker._global_schema, global_schema),
                 )
                 to_update['global_schema'] = global_schema
             else:
@@ -443,24 +532,101 @@ class Pool(amsg.ServerProtocol):
             else:
                 preargs += (None,)
 
-        if to_update:
-            callback = functools.partial(
-                sync_worker_state_cb,
-                worker=worker,
-                dbname=dbname,
-                **to_update
-            )
-        else:
-            callback = None
+        callback = functools.partial(
+            sync_worker_state_cb,
+            worker=worker,
+            dbname=dbname,
+            **to_update
+        )
 
         return preargs, callback
 
-    async def _acquire_worker(self):
+    async def _call_with_state_sync(
+        self,
+        worker,
+        method_name,
+        dbname,
+        user_schema,
+        global_schema,
+        reflection_cache,
+        database_config,
+        system_config,
+        *compile_args
+    ):
+        preargs, sync_state = self._compute_compile_preargs(
+            worker,
+            dbname,
+            user_schema,
+            global_schema,
+            reflection_cache,
+            database_config,
+            system_config,
+        )
+
+        try:
+            return await worker.call(
+                method_name,
+                *preargs,
+                *compile_args,
+                sync_state=sync_state
+            )
+        except state.StaleSchemaDelta:
+            # The worker does not have the schema the delta was computed
+            # against.  Forget what we know about the worker state and
+            # fall back to a full state transfer.
+            worker._dbs.pop(dbname, None)
+            worker._global_schema = None
+        except state.MissingDatabaseState:
+            # The worker has evicted the database without us noticing.
+            worker._dbs.pop(dbname, None)
+
+        preargs, sync_state = self._compute_compile_preargs(
+            worker,
+            dbname,
+            user_schema,
+            global_schema,
+            reflection_cache,
+            database_config,
+            system_config,
+        )
+
+        return await worker.call(
+            method_name,
+            *preargs,
+            *compile_args,
+            sync_state=sync_state
+        )
+
+    async def _acquire_worker(self, *, dbname=None, user_schema=None):
+        def holds_schema(w):
+            worker_db = w._dbs.get(dbname)
+            return (
+                worker_db is not None
+                and worker_db.user_schema is user_schema
+            )
+
+        condition = holds_schema if dbname is not None else None
+        affinity_timeout = 0.0
+        if condition is not None:
+            # Only wait for a busy worker if there is one that holds
+            # the schema.
+            if any(map(condition, self._workers.values())):
+                affinity_timeout = DB_AFFINITY_TIMEOUT
+
         while (
-            worker := await self._workers_queue.acquire()
+            worker := await self._workers_queue.acquire(
+                condition=condition,
+                affinity_timeout=affinity_timeout,
+            )
         ).get_pid() not in self._workers:
             # The worker was disconnected; skip to the next one.
             pass
+
+        if condition is not None:
+            if condition(worker):
+                metrics.compiler_db_affinity_hits_total.inc(1.0, dbname)
+            else:
+                metrics.compiler_db_affinity_misses_total.inc(1.0, dbname)
         return worker
 
     def _release_worker(self, worker):
@@ -478,28 +644,26 @@ class Pool(amsg.ServerProtocol):
         system_config,
         *compile_args
     ):
-        worker = await self._acquire_worker()
+        worker = await self._acquire_worker(
+            dbname=dbname, user_schema=user_schema)
+        started_at = time.monotonic()
         try:
-            preargs, sync_state = self._compute_compile_preargs(
+            units, state = await self._call_with_state_sync(
                 worker,
+                'compile',
                 dbname,
                 user_schema,
                 global_schema,
                 reflection_cache,
                 database_config,
                 system_config,
-            )
-
-            units, state = await worker.call(
-                'compile',
-                *preargs,
-                *compile_args,
-                sync_state=sync_state
+                *compile_args
             )
             worker._last_pickled_state = state
             return units, state
 
         finally:
+            self._observe_compile(worker, started_at)
             self._release_worker(worker)
 
     async def compile_in_tx(self, txid, pickled_state, *compile_args):
@@ -533,12 +697,15 @@ class Pool(amsg.ServerProtocol):
             # state, we don't want to waste resources transferring the
             # state over the network. So we replace the state with a marker,
             # that the compiler process will recognize.
-            pickled_state = state.REUSE_LAST_STATE_MARKER
+            state_arg = state.REUSE_LAST_STATE_MARKER
+        else:
+            state_arg = pickle.PickleBuffer(pickled_state)
 
+        started_at = time.monotonic()
         try:
             units, new_pickled_state = await worker.call(
                 'compile_in_tx',
-                pickled_state,
+                state_arg,
                 txid,
                 *compile_args
             )
@@ -546,6 +713,7 @@ class Pool(amsg.ServerProtocol):
             return units, new_pickled_state
 
         finally:
+            self._observe_compile(worker, started_at)
             # Put the worker at the end of the queue so that the chance
             # of reusing it later (and maximising the chance of
             # the w._last_pickled_state is pickled_state` check returning
@@ -562,26 +730,24 @@ class Pool(amsg.ServerProtocol):
         system_config,
         *compile_args
     ):
-        worker = await self._acquire_worker()
+        worker = await self._acquire_worker(
+            dbname=dbname, user_schema=user_schema)
+        started_at = time.monotonic()
         try:
-            preargs, sync_state = self._compute_compile_preargs(
+            return await self._call_with_state_sync(
                 worker,
+                'compile_notebook',
                 dbname,
                 user_schema,
                 global_schema,
                 reflection_cache,
                 database_config,
                 system_config,
-            )
-
-            return await worker.call(
-                'compile_notebook',
-                *preargs,
-                *compile_args,
-                sync_state=sync_state
+                *compile_args
             )
 
         finally:
+            self._observe_compile(worker, started_at)
             self._release_worker(worker)
 
     async def try_compile_rollback(self, eql: bytes):
@@ -604,26 +770,24 @@ class Pool(amsg.ServerProtocol):
         system_config,
         *compile_args
     ):
-        worker = await self._acquire_worker()
+        worker = await self._acquire_worker(
+            dbname=dbname, user_schema=user_schema)
+        started_at = time.monotonic()
         try:
-            preargs, sync_state = self._compute_compile_preargs(
+            return await self._call_with_state_sync(
                 worker,
+                'compile_graphql',
                 dbname,
                 user_schema,
                 global_schema,
                 reflection_cache,
                 database_config,
                 system_config,
-            )
-
-            return await worker.call(
-                'compile_graphql',
-                *preargs,
-                *compile_args,
-                sync_state=sync_state
+                *compile_args
             )
 
         finally:
+            self._observe_compile(worker, started_at)
             self._release_worker(worker)
 
     async def describe_database_dump(
@@ -668,7 +832,8 @@ async def create_compiler_pool(
     std_schema,
     refl_schema,
     schema_class_layout,
-
+    schema_delta_sync: bool = False,
+    max_dbs_per_worker: int = DEFAULT_MAX_DBS_PER_WORKER,
 ) -> Pool:
     loop = asyncio.get_running_loop()
     pool = Pool(
@@ -680,6 +845,8 @@ async def create_compiler_pool(
         refl_schema=refl_schema,
         schema_class_layout=schema_class_layout,
         dbindex=dbindex,
+        schema_delta_sync=schema_delta_sync,
+        max_dbs_per_worker=max_dbs_per_worker,
     )
 
     await pool.start()
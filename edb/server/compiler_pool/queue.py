@@ -38,6 +38,9 @@ class WorkerQueue(typing.Generic[W]):
     loop: asyncio.AbstractEventLoop
 
     _waiters: typing.Deque[asyncio.Future[None]]
+    _affinity_waiters: typing.Deque[
+        typing.Tuple[_AcquireCondition[W], asyncio.Future[typing.Optional[W]]]
+    ]
     _queue: typing.Deque[W]
 
     def __init__(
@@ -46,13 +49,31 @@ class WorkerQueue(typing.Generic[W]):
     ) -> None:
         self._loop = loop
         self._waiters = collections.deque()
+        self._affinity_waiters = collections.deque()
         self._queue = collections.deque()
 
     async def acquire(
         self,
         *,
-        condition: typing.Optional[_AcquireCondition[W]]=None
+        condition: typing.Optional[_AcquireCondition[W]]=None,
+        affinity_timeout: float=0.0,
     ) -> W:
+        """Acquire a worker, preferring the ones matching *condition*.
+
+        If *affinity_timeout* is set and no free worker matches
+        *condition*, wait up to that many seconds for a matching worker
+        to be released before taking any other worker.
+        """
+        if condition is not None and affinity_timeout > 0:
+            for w in self._queue:
+                if condition(w):
+                    self._queue.remove(w)
+                    return w
+            worker = await self._wait_for_affinity(
+                condition, affinity_timeout)
+            if worker is not None:
+                return worker
+
         # There can be a race between a waiter scheduled for to wake up
         # and a worker being stolen (due to quota being enforced,
         # for example).  In which case the waiter might get finally
@@ -97,7 +118,42 @@ class WorkerQueue(typing.Generic[W]):
 
         return self._queue.popleft()
 
+    async def _wait_for_affinity(
+        self,
+        condition: _AcquireCondition[W],
+        timeout: float,
+    ) -> typing.Optional[W]:
+        waiter: asyncio.Future[typing.Optional[W]] = self._loop.create_future()
+        entry = (condition, waiter)
+        self._affinity_waiters.append(entry)
+        timer = self._loop.call_later(timeout, _set_result, waiter, None)
+        try:
+            return await waiter
+        except BaseException:
+            if (
+                waiter.done()
+                and not waiter.cancelled()
+                and waiter.result() is not None
+            ):
+                # A worker was handed to us, but we can't take it.
+                self.release(waiter.result())
+            raise
+        finally:
+            timer.cancel()
+            try:
+                self._affinity_waiters.remove(entry)
+            except ValueError:
+                # Removed by release() handing over a worker.
+                pass
+
     def release(self, worker: W, *, put_in_front: bool=True) -> None:
+        for entry in self._affinity_waiters:
+            condition, waiter = entry
+            if not waiter.done() and condition(worker):
+                self._affinity_waiters.remove(entry)
+                waiter.set_result(worker)
+                return
+
         if put_in_front:
             self._queue.appendleft(worker)
         else:
@@ -110,3 +166,8 @@ class WorkerQueue(typing.Generic[W]):
             if not waiter.done():
                 waiter.set_result(None)
                 break
+
+
+def _set_result(fut: asyncio.Future[typing.Any], result: typing.Any) -> None:
+    if not fut.done():
+        fut.set_result(result)
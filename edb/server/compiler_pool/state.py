@@ -17,6 +17,7 @@
 #
 
 
+import collections
 import typing
 
 import immutables
@@ -35,11 +36,36 @@ class DatabaseState(typing.NamedTuple):
     database_config: immutables.Map[str, config.SettingValue]
 
 
-DatabasesState = immutables.Map[str, DatabaseState]
+class DatabasesState(collections.OrderedDict[str, DatabaseState]):
+    """The database states held by a compiler worker.
+
+    At most *capacity* databases are kept, the least recently used
+    ones are evicted.  The pool mirrors the states of every worker,
+    so both sides must call :meth:`use` for the same databases in
+    the same order.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        super().__init__()
+        self.capacity = capacity
+
+    def use(self, db: DatabaseState) -> None:
+        self[db.name] = db
+        self.move_to_end(db.name)
+        while len(self) > self.capacity:
+            self.popitem(last=False)
 
 
 class FailedStateSync(Exception):
     pass
 
 
+class StaleSchemaDelta(FailedStateSync):
+    pass
+
+
+class MissingDatabaseState(FailedStateSync):
+    pass
+
+
 REUSE_LAST_STATE_MARKER = b'REUSE_LAST_STATE_MARKER'
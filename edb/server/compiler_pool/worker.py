@@ -48,8 +48,9 @@ from . import amsg
 from . import state
 
 
+PRELOADED: bool = False
 INITED: bool = False
-DBS: state.DatabasesState = immutables.Map()
+DBS: state.DatabasesState
 BACKEND_RUNTIME_PARAMS: pgcluster.BackendRuntimeParams = \
     pgcluster.get_default_runtime_params()
 COMPILER: compiler.Compiler
@@ -63,40 +64,81 @@ INSTANCE_CONFIG: immutables.Map[str, config.SettingValue]
 NUM_SPAWNS_RESET_INTERVAL = 1
 
 
+def __preload__(preload_file: str) -> None:
+    """Load the instance-wide compiler state in the template process.
+
+    Workers are forked after this, so they share the std schema,
+    the reflection schema and the class layout copy-on-write instead
+    of unpickling a copy each.
+    """
+    global PRELOADED
+    global BACKEND_RUNTIME_PARAMS
+    global COMPILER
+    global STD_SCHEMA
+
+    with open(preload_file, 'rb') as f:
+        (
+            backend_runtime_params,
+            std_schema,
+            refl_schema,
+            schema_class_layout,
+        ) = pickle.load(f)
+
+    BACKEND_RUNTIME_PARAMS = backend_runtime_params
+    COMPILER = compiler.Compiler(
+        backend_runtime_params=BACKEND_RUNTIME_PARAMS,
+    )
+    STD_SCHEMA = std_schema
+
+    COMPILER.initialize(
+        std_schema, refl_schema, schema_class_layout,
+    )
+    PRELOADED = True
+
+
 def __init_worker__(
     init_args_pickled: bytes,
 ) -> None:
     global INITED
     global DBS
-    global BACKEND_RUNTIME_PARAMS
-    global COMPILER
-    global STD_SCHEMA
     global GLOBAL_SCHEMA
     global INSTANCE_CONFIG
 
+    if not PRELOADED:
+        raise RuntimeError(
+            'compiler worker template process was started without '
+            '--preload-file')
+
     (
-        dbs,
-        backend_runtime_params,
-        std_schema,
-        refl_schema,
-        schema_class_layout,
+        max_dbs,
         global_schema,
         system_config,
     ) = pickle.loads(init_args_pickled)
 
     INITED = True
-    DBS = dbs
-    BACKEND_RUNTIME_PARAMS = backend_runtime_params
-    COMPILER = compiler.Compiler(
-        backend_runtime_params=BACKEND_RUNTIME_PARAMS,
-    )
-    STD_SCHEMA = std_schema
+    # Database states are sent on demand by _compute_compile_preargs()
+    # of the pool.
+    DBS = state.DatabasesState(max_dbs)
     GLOBAL_SCHEMA = global_schema
     INSTANCE_CONFIG = system_config
 
-    COMPILER.initialize(
-        std_schema, refl_schema, schema_class_layout,
-    )
+
+def _load_schema(
+    pickled_schema: bytes,
+    base_schema: Optional[s_schema.FlatSchema],
+) -> s_schema.FlatSchema:
+    schema = pickle.loads(pickled_schema)
+    if isinstance(schema, s_schema.FlatSchemaDelta):
+        if (
+            base_schema is None
+            or base_schema._generation != schema.base_generation
+        ):
+            raise state.StaleSchemaDelta(
+                f'cannot apply schema delta: worker schema is '
+                f'{base_schema!r}, expected generation '
+                f'{schema.base_generation}')
+        schema = base_schema.apply_delta(schema)
+    return schema
 
 
 def __sync__(
@@ -107,17 +149,20 @@ def __sync__(
     database_config: Optional[bytes],
     system_config: Optional[bytes],
 ) -> state.DatabaseState:
-    global DBS
     global GLOBAL_SCHEMA
     global INSTANCE_CONFIG
 
     try:
         db = DBS.get(dbname)
         if db is None:
-            assert user_schema is not None
+            if user_schema is None:
+                # The pool expected us to have the database, e.g.
+                # it missed an eviction.
+                raise state.MissingDatabaseState(
+                    f'compiler worker has no state for {dbname!r}')
             assert reflection_cache is not None
             assert database_config is not None
-            user_schema_unpacked = pickle.loads(user_schema)
+            user_schema_unpacked = _load_schema(user_schema, None)
             reflection_cache_unpacked = pickle.loads(reflection_cache)
             database_config_unpacked = pickle.loads(database_config)
             db = state.DatabaseState(
@@ -126,12 +171,12 @@ def __sync__(
                 reflection_cache_unpacked,
                 database_config_unpacked,
             )
-            DBS = DBS.set(dbname, db)
         else:
             updates = {}
 
             if user_schema is not None:
-                updates['user_schema'] = pickle.loads(user_schema)
+                updates['user_schema'] = _load_schema(
+                    user_schema, db.user_schema)
             if reflection_cache is not None:
                 updates['reflection_cache'] = pickle.loads(reflection_cache)
             if database_config is not None:
@@ -139,14 +184,19 @@ def __sync__(
 
             if updates:
                 db = db._replace(**updates)
-                DBS = DBS.set(dbname, db)
 
         if global_schema is not None:
-            GLOBAL_SCHEMA = pickle.loads(global_schema)
+            GLOBAL_SCHEMA = _load_schema(global_schema, GLOBAL_SCHEMA)
 
         if system_config is not None:
             INSTANCE_CONFIG = pickle.loads(system_config)
 
+        # Only update the LRU once the sync has succeeded, as the pool
+        # does not update its mirror after a FailedStateSync.
+        DBS.use(db)
+
+    except state.FailedStateSync:
+        raise
     except Exception as ex:
         raise state.FailedStateSync(
             f'failed to sync worker state: {type(ex).__name__}({ex})') from ex
@@ -265,6 +315,7 @@ def compile_graphql(
         db.database_config,
         INSTANCE_CONFIG,
         *compile_args,
+        dbname=dbname,
         **compile_kwargs
     )
 
@@ -274,7 +325,7 @@ def worker(sockname):
     try:
         for req_id, req in con.iter_request():
             try:
-                methname, args = pickle.loads(req)
+                methname, args = amsg.loads(req)
                 if methname == '__init_worker__':
                     meth = __init_worker__
                 else:
@@ -317,11 +368,11 @@ def worker(sockname):
                     )
 
             try:
-                pickled = pickle.dumps(data, -1)
+                pickled = amsg.dumps(data)
             except Exception as ex:
                 ex_tb = traceback.format_exc()
                 ex_str = f'{ex}:\n\n{ex_tb}'
-                pickled = pickle.dumps((2, ex_str), -1)
+                pickled = amsg.dumps((2, ex_str))
 
             con.reply(req_id, pickled)
     finally:
@@ -363,6 +414,7 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--sockname')
     parser.add_argument('--numproc')
+    parser.add_argument('--preload-file')
     args = parser.parse_args()
 
     numproc = int(args.numproc)
@@ -374,6 +426,8 @@ def main():
     max_worker_spawns = numproc * 2
 
     ql_parser.preload()
+    if args.preload_file:
+        __preload__(args.preload_file)
     gc.freeze()
 
     children = set()
@@ -96,6 +96,9 @@ class ConnectionState:
     in_use_since: float = 0
     in_use: bool = False
     in_stack_since: float = 0
+    # An opaque key describing the state the connection was released
+    # with, see Block.acquire().
+    affinity: typing.Optional[typing.Hashable] = None
 
 
 class Block(typing.Generic[C]):
@@ -226,7 +229,10 @@ class Block(typing.Generic[C]):
 
         return self.conn_stack.popleft()
 
-    async def acquire(self) -> C:
+    async def acquire(
+        self,
+        affinity: typing.Optional[typing.Hashable] = None,
+    ) -> C:
         # There can be a race between a waiter scheduled for to wake up
         # and a connection being stolen (due to quota being enforced,
         # for example).  In which case the waiter might get finally
@@ -271,6 +277,15 @@ class Block(typing.Generic[C]):
                         self._wakeup_next_waiter()
                     raise
 
+            if affinity is not None:
+                # Yield the most recently used connection that was released
+                # with the same affinity, if there is one.  This way, the
+                # caller can avoid re-establishing the connection state.
+                for i, conn in enumerate(reversed(self.conn_stack)):
+                    if self.conns[conn].affinity == affinity:
+                        del self.conn_stack[-1 - i]
+                        return conn
+
             # Yield the most recently used connection from the top of the stack
             return self.conn_stack.pop()
         finally:
@@ -1037,7 +1052,11 @@ class Pool(BasePool[C]):
 
         return None, None
 
-    async def _acquire(self, dbname: str) -> C:
+    async def _acquire(
+        self,
+        dbname: str,
+        affinity: typing.Optional[typing.Hashable],
+    ) -> C:
         block = self._get_block(dbname)
 
         room_for_new_conns = self._cur_capacity < self._max_capacity
@@ -1065,7 +1084,7 @@ class Pool(BasePool[C]):
                 # Block has no connections at all, or not enough connections.
                 self._schedule_new_conn(block)
 
-            return await block.acquire()
+            return await block.acquire(affinity)
 
         if not block_nconns:
             # This is a block without any connections.
@@ -1073,15 +1092,15 @@ class Pool(BasePool[C]):
             # reallocated for this block.
             if not self._try_steal_conn(block):
                 self._new_blocks_waitlist[block] = True
-            return await block.acquire()
+            return await block.acquire(affinity)
 
         if block_nconns < block.quota:
             # Let's see if we can steal a connection from some block
             # that's over quota and open a new one.
             self._try_steal_conn(block)
-            return await block.acquire()
+            return await block.acquire(affinity)
 
-        return await block.acquire()
+        return await block.acquire(affinity)
 
     def _run_gc(self) -> None:
         loop = self._get_loop()
@@ -1108,11 +1127,16 @@ class Pool(BasePool[C]):
             while (conn := block.try_steal(only_older_than)) is not None:
                 loop.create_task(self._discard_conn(block, conn))
 
-    async def acquire(self, dbname: str) -> C:
+    async def acquire(
+        self,
+        dbname: str,
+        *,
+        affinity: typing.Optional[typing.Hashable] = None,
+    ) -> C:
         self._nacquires += 1
         self._maybe_schedule_tick()
         try:
-            conn = await self._acquire(dbname)
+            conn = await self._acquire(dbname, affinity)
         finally:
             self._nacquires -= 1
 
@@ -1124,7 +1148,14 @@ class Pool(BasePool[C]):
 
         return conn
 
-    def release(self, dbname: str, conn: C, *, discard: bool=False) -> None:
+    def release(
+        self,
+        dbname: str,
+        conn: C,
+        *,
+        discard: bool=False,
+        affinity: typing.Optional[typing.Hashable] = None,
+    ) -> None:
         try:
             block = self._blocks[dbname]
         except KeyError:
@@ -1151,6 +1182,7 @@ class Pool(BasePool[C]):
         block.querytime_avg.add(time.monotonic() - conn_state.in_use_since)
         conn_state.in_use = False
         conn_state.in_use_since = 0
+        conn_state.affinity = affinity
 
         self._maybe_schedule_tick()
 
@@ -1253,7 +1285,12 @@ class _NaivePool(BasePool[C]):
                 self._blocks.move_to_end(block.dbname, last=True)
                 return
 
-    async def acquire(self, dbname: str) -> C:
+    async def acquire(
+        self,
+        dbname: str,
+        *,
+        affinity: typing.Optional[typing.Hashable] = None,
+    ) -> C:
         self._maybe_tick()
 
         block = self._get_block(dbname)
@@ -1266,11 +1303,18 @@ class _NaivePool(BasePool[C]):
             # in `release()`, because it would hang if no other block releases.
             await self._steal_conn(block)
 
-        return await block.acquire()
+        return await block.acquire(affinity)
 
-    def release(self, dbname: str, conn: C) -> None:
+    def release(
+        self,
+        dbname: str,
+        conn: C,
+        *,
+        affinity: typing.Optional[typing.Hashable] = None,
+    ) -> None:
         self._maybe_tick()
         this_block = self._get_block(dbname)
+        this_block.conns[conn].affinity = affinity
 
         if this_block.count_conns() < this_block.count_waiters():
             this_block.release(conn)
@@ -29,11 +29,15 @@ cpdef enum SideEffects:
 cdef class DatabaseIndex:
     cdef:
         dict _dbs
+        set _unloaded_dbs
         object _server
         object _sys_config
         object _comp_sys_config
         object _std_schema
         object _global_schema
+        object _global_schema_fingerprint
+
+    cdef _clear_schema_fingerprints(self)
 
 
 cdef class Database:
@@ -43,6 +47,9 @@ cdef class Database:
         DatabaseIndex _index
         object _views
 
+        readonly int compiled_queries_gen
+        readonly object schema_fingerprint
+
         readonly str name
         readonly object dbver
         readonly object db_config
@@ -53,6 +60,7 @@ cdef class Database:
 
     cdef _invalidate_caches(self)
     cdef _cache_compiled_query(self, key, query_unit)
+    cdef _lookup_compiled_query(self, key)
     cdef _new_view(self, user, query_cache)
     cdef _remove_view(self, view)
     cdef _update_backend_ids(self, new_types)
@@ -62,6 +70,7 @@ cdef class Database:
         reflection_cache=?,
         backend_ids=?,
         db_config=?,
+        schema_fingerprint=?,
     )
 
 cdef class DatabaseConnectionView:
@@ -107,6 +116,7 @@ cdef class DatabaseConnectionView:
 
     cdef in_tx(self)
     cdef in_tx_error(self)
+    cdef in_tx_with_ddl(self)
 
     cdef cache_compiled_query(self, object key, object query_unit)
     cdef lookup_compiled_query(self, object key)
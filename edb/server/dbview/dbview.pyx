@@ -28,7 +28,7 @@ from edb import errors
 from edb.common import lru, uuidgen
 from edb.schema import extensions as s_ext
 from edb.schema import schema as s_schema
-from edb.server import defines, config
+from edb.server import defines, config, metrics
 from edb.server.compiler import dbstate
 from edb.pgsql import dbops
 
@@ -54,7 +54,8 @@ cdef next_dbver():
 
 cdef class Database:
 
-    # Global LRU cache of compiled anonymous queries
+    # Global LRU cache of compiled anonymous queries, shared by
+    # all frontends (binary protocol and HTTP extensions).
     _eql_to_compiled: typing.Mapping[str, dbstate.QueryUnit]
 
     def __init__(
@@ -65,17 +66,20 @@ cdef class Database:
         object user_schema,
         object db_config,
         object reflection_cache,
-        object backend_ids
+        object backend_ids,
+        object schema_fingerprint=None
     ):
         self.name = name
 
         self.dbver = next_dbver()
+        self.schema_fingerprint = schema_fingerprint
 
         self._index = index
         self._views = weakref.WeakSet()
 
         self._eql_to_compiled = lru.LRUMapping(
             maxsize=defines._MAX_QUERIES_CACHE)
+        self.compiled_queries_gen = 0
 
         self.db_config = db_config
         self.user_schema = user_schema
@@ -92,6 +96,7 @@ cdef class Database:
         reflection_cache=None,
         backend_ids=None,
         db_config=None,
+        schema_fingerprint=None,
     ):
         if new_schema is None:
             raise AssertionError('new_schema is not supposed to be None')
@@ -99,6 +104,9 @@ cdef class Database:
         self.dbver = next_dbver()
 
         self.user_schema = new_schema
+        # The fingerprint is only known for schemas loaded from the
+        # backend, schemas produced by local DDL don't have one.
+        self.schema_fingerprint = schema_fingerprint
 
         self.extensions = {
             ext.get_name(new_schema).name: ext
@@ -118,6 +126,7 @@ cdef class Database:
 
     cdef _invalidate_caches(self):
         self._eql_to_compiled.clear()
+        self.compiled_queries_gen += 1
 
     cdef _cache_compiled_query(self, key, compiled: dbstate.QueryUnit):
         assert compiled.cacheable
@@ -128,6 +137,39 @@ cdef class Database:
             return
 
         self._eql_to_compiled[key] = compiled, self.dbver
+        self.compiled_queries_gen += 1
+
+    cdef _lookup_compiled_query(self, key):
+        query_unit, qu_dbver = self._eql_to_compiled.get(key, DICTDEFAULT)
+        if query_unit is not None and qu_dbver != self.dbver:
+            query_unit = None
+        if query_unit is None:
+            metrics.query_cache_misses_total.inc(1.0, self.name)
+        else:
+            metrics.query_cache_hits_total.inc(1.0, self.name)
+        return query_unit
+
+    def cache_compiled_query(self, key, compiled: dbstate.QueryUnit):
+        # Python-level entry point for frontends other than the binary
+        # protocol (e.g. the EdgeQL-over-HTTP extension), so that all of
+        # them share the same bounded per-database cache.
+        self._cache_compiled_query(key, compiled)
+
+    def lookup_compiled_query(self, key):
+        return self._lookup_compiled_query(key)
+
+    def get_compiled_queries(self):
+        # Return the cached queries valid for the current schema,
+        # least recently used first.
+        return [
+            (key, query_unit)
+            for key, (query_unit, dbver) in self._eql_to_compiled.items()
+            if dbver == self.dbver
+        ]
+
+    def warm_compiled_queries(self, entries):
+        for key, query_unit in entries:
+            self._eql_to_compiled[key] = query_unit, self.dbver
 
     cdef _new_view(self, user, query_cache):
         view = DatabaseConnectionView(self, user=user, query_cache=query_cache)
@@ -353,6 +395,9 @@ cdef class DatabaseConnectionView:
     cdef in_tx_error(self):
         return self._tx_error
 
+    cdef in_tx_with_ddl(self):
+        return self._in_tx_with_ddl
+
     cdef cache_compiled_query(self, object key, object query_unit):
         assert query_unit.cacheable
 
@@ -374,10 +419,7 @@ cdef class DatabaseConnectionView:
         if self._in_tx_with_ddl or self._in_tx_with_set:
             query_unit = self._eql_to_compiled.get(key)
         else:
-            query_unit, qu_dbver = self._db._eql_to_compiled.get(
-                key, DICTDEFAULT)
-            if query_unit is not None and qu_dbver != self._db.dbver:
-                query_unit = None
+            query_unit = self._db._lookup_compiled_query(key)
 
         return query_unit
 
@@ -531,13 +573,25 @@ cdef class DatabaseConnectionView:
 
 cdef class DatabaseIndex:
 
-    def __init__(self, server, *, std_schema, global_schema, sys_config):
+    def __init__(
+        self,
+        server,
+        *,
+        std_schema,
+        global_schema,
+        sys_config,
+        global_schema_fingerprint=None,
+    ):
         self._dbs = {}
+        # Names of databases that are known to exist, but whose
+        # schema has not been introspected (or has been unloaded).
+        self._unloaded_dbs = set()
         self._server = server
         self._sys_config = sys_config
         self._comp_sys_config = config.get_compilation_config(sys_config)
         self._std_schema = std_schema
         self._global_schema = global_schema
+        self._global_schema_fingerprint = global_schema_fingerprint
 
     def count_connections(self, dbname: str):
         try:
@@ -554,8 +608,11 @@ cdef class DatabaseIndex:
         return self._comp_sys_config
 
     def update_sys_config(self, sys_config):
+        comp_sys_config = config.get_compilation_config(sys_config)
         self._sys_config = sys_config
-        self._comp_sys_config = config.get_compilation_config(sys_config)
+        if comp_sys_config != self._comp_sys_config:
+            self._comp_sys_config = comp_sys_config
+            self._clear_schema_fingerprints()
 
     def get_db(self, dbname):
         try:
@@ -569,11 +626,32 @@ cdef class DatabaseIndex:
     def maybe_get_db(self, dbname):
         return self._dbs.get(dbname)
 
+    def has_db(self, dbname):
+        return dbname in self._dbs or dbname in self._unloaded_dbs
+
+    def is_db_loaded(self, dbname):
+        return dbname in self._dbs
+
     def get_global_schema(self):
         return self._global_schema
 
-    def update_global_schema(self, global_schema):
+    def get_global_schema_fingerprint(self):
+        return self._global_schema_fingerprint
+
+    def update_global_schema(self, global_schema, fingerprint=None):
+        # The fingerprint is only known for a global schema loaded from
+        # the backend, one produced by local DDL doesn't have one.
         self._global_schema = global_schema
+        self._global_schema_fingerprint = fingerprint
+        self._clear_schema_fingerprints()
+
+    cdef _clear_schema_fingerprints(self):
+        # The fingerprints of the loaded databases include the global
+        # schema and the instance config, so they can't be trusted
+        # until the databases are introspected again.
+        cdef Database db
+        for db in self._dbs.values():
+            db.schema_fingerprint = None
 
     def register_db(
         self,
@@ -583,6 +661,7 @@ cdef class DatabaseIndex:
         db_config,
         reflection_cache,
         backend_ids,
+        schema_fingerprint=None,
         refresh=False
     ):
         cdef Database db
@@ -592,7 +671,12 @@ cdef class DatabaseIndex:
                 raise RuntimeError(
                     f'cannot register DB {dbname!r}: it is already registered')
             db._set_and_signal_new_user_schema(
-                user_schema, reflection_cache, backend_ids)
+                user_schema,
+                reflection_cache,
+                backend_ids,
+                None,
+                schema_fingerprint,
+            )
         else:
             db = Database(
                 self,
@@ -601,11 +685,28 @@ cdef class DatabaseIndex:
                 db_config=db_config,
                 reflection_cache=reflection_cache,
                 backend_ids=backend_ids,
+                schema_fingerprint=schema_fingerprint,
             )
             self._dbs[dbname] = db
+            self._unloaded_dbs.discard(dbname)
+        return db
+
+    def register_unloaded_db(self, dbname):
+        if dbname not in self._dbs:
+            self._unloaded_dbs.add(dbname)
+
+    def unload_db(self, dbname):
+        cdef Database db
+        db = self._dbs[dbname]
+        if len(db._views):
+            raise RuntimeError(
+                f'cannot unload DB {dbname!r}: it has open connections')
+        del self._dbs[dbname]
+        self._unloaded_dbs.add(dbname)
 
     def unregister_db(self, dbname):
-        self._dbs.pop(dbname)
+        self._unloaded_dbs.discard(dbname)
+        self._dbs.pop(dbname, None)
 
     def iter_dbs(self):
         return iter(self._dbs.values())
@@ -638,7 +739,8 @@ cdef class DatabaseIndex:
         # _save_system_overrides *must* happen before
         # the callbacks below, because certain config changes
         # may cause the backend connection to drop.
-        self._sys_config = op.apply(config.get_settings(), self._sys_config)
+        self.update_sys_config(
+            op.apply(config.get_settings(), self._sys_config))
         await self._save_system_overrides(conn)
 
         if op.opcode is config.OpCode.CONFIG_ADD:
@@ -32,7 +32,7 @@ EDGEDB_VISIBLE_METADATA_PREFIX = r'EdgeDB metadata follows, do not modify.\n'
 EDGEDB_SPECIAL_DBS = {EDGEDB_TEMPLATE_DB, EDGEDB_SYSTEM_DB}
 
 # Increment this whenever the database layout or stdlib changes.
-EDGEDB_CATALOG_VERSION = 2021_07_23_14_00
+EDGEDB_CATALOG_VERSION = 2021_07_29_00_00
 
 # Resource limit on open FDs for the server process.
 # By default, at least on macOS, the max number of open FDs
@@ -43,6 +43,14 @@ EDGEDB_MIN_RLIMIT_NOFILE = 2048
 BACKEND_CONNECTIONS_MIN = 4
 BACKEND_COMPILER_POOL_SIZE_MIN = 1
 
+# The upper bound on the number of backend connections a single
+# DUMP may use in parallel.
+DUMP_MAX_JOBS = 8
+
+# The upper bound on the number of data blocks a RESTORE reads ahead
+# of the backend connection applying them.
+RESTORE_MAX_PREFETCH_BLOCKS = 8
+
 _MAX_QUERIES_CACHE = 1000
 
 _QUERY_ROLLING_AVG_LEN = 10
@@ -52,6 +60,18 @@ DEFAULT_MODULE_ALIAS = 'default'
 
 
 HTTP_PORT_QUERY_CACHE_SIZE = 1000
+
+# The maximum number of queries in a single batch request to the
+# EdgeQL-over-HTTP port.
+HTTP_PORT_MAX_BATCH_SIZE = 100
+
+# The number of most recent schema deltas kept in every database
+# for other servers to catch up with remote DDL incrementally.
+SCHEMA_DELTA_LOG_SIZE = 50
+
+# The interval in seconds between saves of compiled query caches
+# to disk when the persistent query cache is enabled.
+QUERY_CACHE_PERSIST_INTERVAL = 60
 HTTP_PORT_MAX_CONCURRENCY = 250  # XXX
 
 # The time in seconds the EdgeDB server shall wait between retries to connect
@@ -185,6 +185,11 @@ async def _run_server(
             internal_runstate_dir=internal_runstate_dir,
             max_backend_connections=args.max_backend_connections,
             compiler_pool_size=args.compiler_pool_size,
+            compiler_pool_delta_sync=args.compiler_pool_delta_sync,
+            compiler_pool_max_dbs=args.compiler_pool_max_dbs,
+            query_cache_dir=args.query_cache_dir,
+            lazy_db_introspection=args.lazy_db_introspection,
+            db_idle_eviction_timeout=args.db_idle_eviction_timeout,
             nethosts=args.bind_addresses,
             netport=args.port,
             auto_shutdown_after=args.auto_shutdown_after,
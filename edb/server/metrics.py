@@ -0,0 +1,137 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2021-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from __future__ import annotations
+
+from edb.common import prometheus as prom
+
+
+registry = prom.Registry(prefix='edgedb_server')
+
+client_connections_current = registry.new_gauge(
+    'client_connections_current',
+    'Current number of active client connections.',
+)
+
+client_connections_total = registry.new_counter(
+    'client_connections_total',
+    'Total number of authenticated client connections.',
+)
+
+bytes_received_total = registry.new_labeled_counter(
+    'client_bytes_received_total',
+    'Total number of bytes received from clients.',
+    labels=('interface',),
+)
+
+bytes_sent_total = registry.new_labeled_counter(
+    'client_bytes_sent_total',
+    'Total number of bytes sent to clients.',
+    labels=('interface',),
+)
+
+compile_duration = registry.new_labeled_histogram(
+    'compile_duration_seconds',
+    'Time it takes a compiler worker to compile a request.',
+    labels=('worker',),
+)
+
+compiler_db_resyncs_total = registry.new_labeled_counter(
+    'compiler_db_resyncs_total',
+    'Number of times the state of a database was sent in full to a '
+    'compiler worker that did not hold it.',
+    labels=('database',),
+)
+
+compiler_db_affinity_hits_total = registry.new_labeled_counter(
+    'compiler_db_affinity_hits_total',
+    'Number of compilations scheduled on a compiler worker already '
+    'holding the schema of the database.',
+    labels=('database',),
+)
+
+compiler_db_affinity_misses_total = registry.new_labeled_counter(
+    'compiler_db_affinity_misses_total',
+    'Number of compilations scheduled on a compiler worker that had '
+    'to be sent the schema of the database.',
+    labels=('database',),
+)
+
+query_cache_hits_total = registry.new_labeled_counter(
+    'query_cache_hits_total',
+    'Number of compiled query cache hits.',
+    labels=('database',),
+)
+
+query_cache_misses_total = registry.new_labeled_counter(
+    'query_cache_misses_total',
+    'Number of compiled query cache misses.',
+    labels=('database',),
+)
+
+backend_acquire_wait = registry.new_labeled_histogram(
+    'backend_connection_acquire_wait_seconds',
+    'Time spent waiting for a backend connection from the pool.',
+    labels=('database',),
+    buckets=(
+        0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05,
+        0.1, 0.5, 1.0, 5.0, 10.0, 30.0,
+    ),
+)
+
+backend_query_duration = registry.new_histogram(
+    'backend_query_duration_seconds',
+    'Time it takes to run a command on a backend connection.',
+)
+
+db_introspections_total = registry.new_counter(
+    'db_lazy_introspections_total',
+    'Number of databases introspected on their first connection.',
+)
+
+db_evictions_total = registry.new_counter(
+    'db_evictions_total',
+    'Number of idle databases whose schema was unloaded.',
+)
+
+restore_bytes_total = registry.new_counter(
+    'restore_bytes_total',
+    'Total number of bytes of data blocks restored.',
+)
+
+restore_throughput = registry.new_histogram(
+    'restore_throughput_bytes_per_second',
+    'Throughput of restoring the data blocks of a dump.',
+    buckets=(
+        2 ** 20, 2 ** 22, 2 ** 24, 2 ** 26, 2 ** 28, 2 ** 30,
+    ),
+)
+
+
+def remove_database(dbname: str) -> None:
+    """Drop the series of a database that no longer exists."""
+    for metric in (
+        compiler_db_resyncs_total,
+        compiler_db_affinity_hits_total,
+        compiler_db_affinity_misses_total,
+        query_cache_hits_total,
+        query_cache_misses_total,
+        backend_acquire_wait,
+    ):
+        metric.remove(dbname)
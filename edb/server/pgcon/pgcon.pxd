@@ -86,11 +86,16 @@ cdef class PGConnection:
         object server
 
         readonly bint idle
+        double command_started_at
 
         object cancel_fut
 
         bint _is_ssl
 
+        # Serialized session state last applied to _edgecon_state, or
+        # None if it is unknown.
+        readonly bytes last_state
+
     cdef before_command(self)
 
     cdef write(self, buf)
@@ -103,6 +108,18 @@ cdef class PGConnection:
     cdef fallthrough_idle(self)
 
     cdef before_prepare(self, stmt_name, dbver, WriteBuffer outbuf)
+    cdef _write_parse_bind_execute_json(
+        self,
+        WriteBuffer buf,
+        bytes stmt_name,
+        sql,
+        bint parse,
+        args,
+    )
+    cdef _decode_json_result(self, WriteBuffer out, sql)
+    cdef bytes before_apply_state(self, bytes state)
+    cdef after_apply_state(self, bytes state)
+    cdef invalidate_state(self)
 
     cdef make_clean_stmt_message(self, bytes stmt_name)
     cdef make_auth_password_md5_message(self, bytes salt)
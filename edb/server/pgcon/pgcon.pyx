@@ -26,6 +26,7 @@ import os.path
 import socket
 import ssl as ssl_mod
 import struct
+import time
 
 cimport cython
 cimport cpython
@@ -61,6 +62,7 @@ from edb.server.pgproto.pgproto cimport (
 from edb.server import buildmeta
 from edb.server import compiler
 from edb.server import defines
+from edb.server import metrics
 from edb.server.cache cimport stmt_cache
 from edb.server import pgconnparams
 from edb.server.protocol cimport binary as edgecon
@@ -71,6 +73,7 @@ from . import errors as pgerror
 
 DEF DATA_BUFFER_SIZE = 100_000
 DEF PREP_STMTS_CACHE = 100
+DEF JSON_STREAM_CHUNK_SIZE = 64 * 1024
 DEF TCP_KEEPIDLE = 24
 DEF TCP_KEEPINTVL = 2
 DEF TCP_KEEPCNT = 3
@@ -86,6 +89,8 @@ cdef object POSTGRES_SHUTDOWN_ERR_CODES = {
 
 
 cdef bytes INIT_CON_SCRIPT = None
+cdef bytes SNAPSHOT_BEGIN = (
+    b'START TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
 
 
 def _build_init_con_script() -> bytes:
@@ -362,6 +367,8 @@ cdef class PGConnection:
 
         self._is_ssl = False
 
+        self.last_state = None
+
     @property
     def is_ssl(self):
         return self._is_ssl
@@ -506,32 +513,18 @@ cdef class PGConnection:
 
         return parse, store_stmt
 
-    async def _parse_execute_to_buf(
+    cdef _write_parse_bind_execute_json(
         self,
+        WriteBuffer buf,
+        bytes stmt_name,
         sql,
-        sql_hash,
-        dbver,
-        use_prep_stmt,
+        bint parse,
         args,
-        WriteBuffer out,
     ):
         cdef:
             WriteBuffer parse_buf
             WriteBuffer bind_buf
             WriteBuffer execute_buf
-            WriteBuffer buf
-            ssize_t size
-            bint parse = 1
-            bint store_stmt = 0
-
-        buf = WriteBuffer.new()
-
-        if use_prep_stmt:
-            stmt_name = sql_hash
-            parse, store_stmt = self.before_prepare(
-                stmt_name, dbver, buf)
-        else:
-            stmt_name = b''
 
         if parse:
             parse_buf = WriteBuffer.new_message(b'P')
@@ -566,12 +559,18 @@ cdef class PGConnection:
         execute_buf.end_message()
         buf.write_buffer(execute_buf)
 
-        buf.write_bytes(SYNC_MESSAGE)
-
-        self.write(buf)
+    async def _wait_for_result_to_buf(
+        self,
+        WriteBuffer out,
+        bytes stmt_name,
+        dbver,
+        bint store_stmt,
+    ):
+        # Reads the responses up to and including the next ReadyForQuery,
+        # redirecting the data rows to *out*.  Returns the backend error,
+        # if any.
         error = None
         self.waiting_for_sync = True
-        data = None
         while True:
             if not self.buffer.take_message():
                 await self.wait_for_message()
@@ -612,26 +611,44 @@ cdef class PGConnection:
             finally:
                 self.buffer.finish_message()
 
-        if error is not None:
-            raise error
-
-        return data
+        return error
 
-    async def _parse_execute_json(
+    async def _parse_execute_to_buf(
         self,
         sql,
         sql_hash,
         dbver,
         use_prep_stmt,
         args,
+        WriteBuffer out,
     ):
         cdef:
-            WriteBuffer out
-            Py_buffer pybuf
+            WriteBuffer buf
+            bint parse = 1
+            bint store_stmt = 0
 
-        out = WriteBuffer.new()
-        await self._parse_execute_to_buf(
-            sql, sql_hash, dbver, use_prep_stmt, args, out)
+        buf = WriteBuffer.new()
+
+        if use_prep_stmt:
+            stmt_name = sql_hash
+            parse, store_stmt = self.before_prepare(
+                stmt_name, dbver, buf)
+        else:
+            stmt_name = b''
+
+        self._write_parse_bind_execute_json(buf, stmt_name, sql, parse, args)
+        buf.write_bytes(SYNC_MESSAGE)
+
+        self.write(buf)
+        error = await self._wait_for_result_to_buf(
+            out, stmt_name, dbver, store_stmt)
+
+        if error is not None:
+            raise error
+
+    cdef _decode_json_result(self, WriteBuffer out, sql):
+        cdef:
+            Py_buffer pybuf
 
         cpython.PyObject_GetBuffer(out, &pybuf, cpython.PyBUF_SIMPLE)
         try:
@@ -669,6 +686,265 @@ cdef class PGConnection:
         finally:
             cpython.PyBuffer_Release(&pybuf)
 
+    async def _parse_execute_json(
+        self,
+        sql,
+        sql_hash,
+        dbver,
+        use_prep_stmt,
+        args,
+    ):
+        cdef:
+            WriteBuffer out
+
+        out = WriteBuffer.new()
+        await self._parse_execute_to_buf(
+            sql, sql_hash, dbver, use_prep_stmt, args, out)
+        return self._decode_json_result(out, sql)
+
+    async def _flush_json_chunk(self, WriteBuffer chunk, write_cb):
+        waiter = write_cb(memoryview(chunk))
+        if waiter is not None:
+            # The consumer cannot keep up; stop reading from the backend
+            # until it catches up.
+            self.transport.pause_reading()
+            try:
+                await waiter
+            finally:
+                if self.transport is not None:
+                    self.transport.resume_reading()
+
+    async def _parse_execute_json_elements(
+        self,
+        sql,
+        sql_hash,
+        dbver,
+        use_prep_stmt,
+        args,
+        write_cb,
+    ):
+        cdef:
+            WriteBuffer buf
+            WriteBuffer chunk = None
+            bint parse = 1
+            bint store_stmt = 0
+            int16_t ncol
+            int32_t coll
+            Py_ssize_t nrows = 0
+
+        buf = WriteBuffer.new()
+
+        if use_prep_stmt:
+            stmt_name = sql_hash
+            parse, store_stmt = self.before_prepare(
+                stmt_name, dbver, buf)
+        else:
+            stmt_name = b''
+
+        self._write_parse_bind_execute_json(buf, stmt_name, sql, parse, args)
+        buf.write_bytes(SYNC_MESSAGE)
+        self.write(buf)
+
+        error = None
+        write_error = None
+        self.waiting_for_sync = True
+        while True:
+            if not self.buffer.take_message():
+                if chunk is not None:
+                    # Nothing else has arrived yet, pass on what we have.
+                    try:
+                        await self._flush_json_chunk(chunk, write_cb)
+                    except Exception as ex:
+                        write_error = ex
+                    chunk = None
+                await self.wait_for_message()
+            elif (
+                chunk is not None
+                and chunk.len() >= JSON_STREAM_CHUNK_SIZE
+            ):
+                try:
+                    await self._flush_json_chunk(chunk, write_cb)
+                except Exception as ex:
+                    write_error = ex
+                chunk = None
+
+            mtype = self.buffer.get_message_type()
+
+            try:
+                if mtype == b'D':
+                    # DataRow
+                    ncol = self.buffer.read_int16()
+                    if ncol != 1:
+                        raise RuntimeError(
+                            f'received more than column in DataRow '
+                            f'for a JSON query {sql!r}')
+                    coll = self.buffer.read_int32()
+                    if coll == -1:
+                        raise RuntimeError(
+                            f'received NULL for a JSON query {sql!r}')
+                    data = self.buffer.read_bytes(coll)
+
+                    # Once the consumer is gone, the rest of the result
+                    # is only read to keep the connection in sync.
+                    if write_error is None:
+                        if chunk is None:
+                            chunk = WriteBuffer.new()
+                        if nrows:
+                            chunk.write_byte(b',')
+                        chunk.write_bytes(data)
+                    nrows += 1
+
+                elif mtype == b'E':
+                    # ErrorResponse
+                    er_cls, fields = self.parse_error_message()
+                    error = er_cls(fields=fields)
+
+                elif mtype == b'1':
+                    # ParseComplete
+                    self.buffer.discard_message()
+                    if store_stmt:
+                        self.prep_stmts[stmt_name] = dbver
+
+                elif mtype in {b'C', b'n', b'2', b'I', b'3'}:
+                    # CommandComplete
+                    # NoData
+                    # BindComplete
+                    # EmptyQueryResponse
+                    # CloseComplete
+                    self.buffer.discard_message()
+
+                elif mtype == b'Z':
+                    # ReadyForQuery
+                    self.parse_sync_message()
+                    break
+
+                else:
+                    self.fallthrough()
+
+            finally:
+                self.buffer.finish_message()
+
+        if write_error is not None:
+            raise write_error
+
+        if chunk is not None:
+            await self._flush_json_chunk(chunk, write_cb)
+
+        if error is not None:
+            raise error
+
+        return nrows
+
+    async def _parse_execute_json_batch(
+        self,
+        list queries,
+        bint same_snapshot,
+    ):
+        cdef:
+            WriteBuffer buf
+            WriteBuffer out
+            list pending = list(range(len(queries)))
+            list deferred
+            list stmts
+            list results = [None] * len(queries)
+            set parsing
+            bint parse
+            bint store_stmt
+            bint begin_sent = 0
+
+        buf = WriteBuffer.new()
+
+        if same_snapshot:
+            out = WriteBuffer.new_message(b'Q')
+            out.write_bytestring(SNAPSHOT_BEGIN)
+            buf.write_buffer(out.end_message())
+            begin_sent = 1
+
+        error = None
+        while pending:
+            # A statement parsed in this round only exists once its
+            # ParseComplete arrives, so a later query with the same hash
+            # is deferred to the next round rather than sent without a
+            # Parse: if the Parse fails, it gets the real error instead
+            # of "prepared statement does not exist".
+            deferred = []
+            stmts = []
+            parsing = set()
+
+            for i in pending:
+                sql, sql_hash, dbver, use_prep_stmt, args = queries[i]
+                parse = 1
+                store_stmt = 0
+                if use_prep_stmt:
+                    stmt_name = sql_hash
+                    if stmt_name in parsing:
+                        deferred.append(i)
+                        continue
+                    parse, store_stmt = self.before_prepare(
+                        stmt_name, dbver, buf)
+                    if parse:
+                        parsing.add(stmt_name)
+                else:
+                    stmt_name = b''
+
+                self._write_parse_bind_execute_json(
+                    buf, stmt_name, sql, parse, args)
+                # A SYNC after every query, so that an error only fails
+                # the query that caused it.
+                buf.write_bytes(SYNC_MESSAGE)
+                stmts.append((i, stmt_name, store_stmt))
+
+            if same_snapshot and not deferred:
+                # The transaction is read-only, nothing to commit.
+                out = WriteBuffer.new_message(b'Q')
+                out.write_bytestring(b'ROLLBACK')
+                buf.write_buffer(out.end_message())
+
+            self.write(buf)
+            buf = WriteBuffer.new()
+
+            if begin_sent:
+                error = await self._wait_for_result_to_buf(
+                    WriteBuffer.new(), b'', 0, False)
+                begin_sent = 0
+
+            for i, stmt_name, store_stmt in stmts:
+                sql, _, dbver, _, _ = queries[i]
+                out = WriteBuffer.new()
+                item_error = await self._wait_for_result_to_buf(
+                    out, stmt_name, dbver, store_stmt)
+                if error is not None:
+                    # The transaction could not be started.
+                    results[i] = error
+                elif item_error is not None:
+                    results[i] = item_error
+                else:
+                    try:
+                        results[i] = self._decode_json_result(out, sql)
+                    except RuntimeError as e:
+                        results[i] = e
+
+            if error is not None:
+                for i in deferred:
+                    results[i] = error
+                if same_snapshot and deferred:
+                    # Still close the transaction block, if any.
+                    out = WriteBuffer.new_message(b'Q')
+                    out.write_bytestring(b'ROLLBACK')
+                    buf.write_buffer(out.end_message())
+                    self.write(buf)
+                deferred = []
+
+            pending = deferred
+
+        if same_snapshot:
+            rollback_error = await self._wait_for_result_to_buf(
+                WriteBuffer.new(), b'', 0, False)
+            if rollback_error is not None:
+                raise rollback_error
+
+        return results
+
     async def parse_execute_json(
         self,
         sql,
@@ -689,6 +965,55 @@ cdef class PGConnection:
         finally:
             await self.after_command()
 
+    async def parse_execute_json_elements(
+        self,
+        sql,
+        sql_hash,
+        dbver,
+        use_prep_stmt,
+        args,
+        write_cb,
+    ):
+        """Execute a JSON_ELEMENTS query streaming its result.
+
+        The elements are passed to *write_cb* as they arrive, in
+        chunks of comma-separated JSON.  If *write_cb* returns a
+        future, reading from the backend is paused until the future is
+        done.  Returns the number of elements.
+        """
+        self.before_command()
+        try:
+            return await self._parse_execute_json_elements(
+                sql, sql_hash, dbver, use_prep_stmt, args, write_cb)
+        finally:
+            await self.after_command()
+
+    async def parse_execute_json_batch(
+        self,
+        list queries,
+        bint same_snapshot=False,
+    ):
+        """Execute a batch of JSON queries in a single round trip.
+
+        *queries* is a list of ``(sql, sql_hash, dbver, use_prep_stmt,
+        args)`` tuples, as passed to parse_execute_json().  Every query
+        is followed by its own SYNC, so an error only fails the query
+        that caused it.  A query reusing a statement that is first
+        parsed in the same batch is sent in another round trip, once
+        the outcome of that Parse is known.  With *same_snapshot* the
+        batch runs in a single read-only REPEATABLE READ transaction
+        instead, where an error fails all the queries after it.
+
+        Returns a list with either the JSON result or the error of
+        each query.
+        """
+        self.before_command()
+        try:
+            return await self._parse_execute_json_batch(
+                queries, same_snapshot)
+        finally:
+            await self.after_command()
+
     async def parse_execute_notebook(
         self,
         sql,
@@ -713,6 +1038,27 @@ cdef class PGConnection:
         finally:
             await self.after_command()
 
+    cdef bytes before_apply_state(self, bytes state):
+        # Returns the state that needs to be sent to the backend.
+        if state is None:
+            return None
+        if state == self.last_state:
+            # This backend connection already runs with the same
+            # session state, no need to re-apply it.
+            return None
+        self.last_state = None
+        return state
+
+    cdef after_apply_state(self, bytes state):
+        # Remember the applied state, but only if it is committed:
+        # should a transaction have been started, a rollback would
+        # undo it.
+        if state is not None and self.xact_status == PQTRANS_IDLE:
+            self.last_state = state
+
+    cdef invalidate_state(self):
+        self.last_state = None
+
     def _build_apply_state_req(self, bytes serstate, WriteBuffer out):
         cdef:
             WriteBuffer buf
@@ -956,7 +1302,8 @@ cdef class PGConnection:
     ):
         self.before_command()
         try:
-            return await self._parse_execute(
+            state = self.before_apply_state(state)
+            ret = await self._parse_execute(
                 query,
                 edgecon,
                 bind_data,
@@ -964,6 +1311,12 @@ cdef class PGConnection:
                 state,
                 dbver
             )
+            if query.has_set:
+                # The query has modified the session state.
+                self.invalidate_state()
+            else:
+                self.after_apply_state(state)
+            return ret
         finally:
             await self.after_command()
 
@@ -974,6 +1327,7 @@ cdef class PGConnection:
 
         out = WriteBuffer.new()
 
+        state = self.before_apply_state(state)
         if state is not None:
             self._build_apply_state_req(state, out)
             # We must use SYNC and not FLUSH here, as otherwise
@@ -995,6 +1349,7 @@ cdef class PGConnection:
             await self._parse_apply_state_resp(state)
             self.waiting_for_sync = True
             await self.wait_for_sync()
+            self.after_apply_state(state)
 
         self.waiting_for_sync = True
         while True:
@@ -1061,6 +1416,118 @@ cdef class PGConnection:
         finally:
             await self.after_command()
 
+    async def _pipeline_queries(self, list sql_groups, bytes state):
+        cdef:
+            WriteBuffer out
+            WriteBuffer buf
+            list ends = []
+            Py_ssize_t total = 0
+            Py_ssize_t executed = 0
+            Py_ssize_t completed = 0
+            Py_ssize_t num_groups = len(sql_groups)
+
+        out = WriteBuffer.new()
+
+        state = self.before_apply_state(state)
+        if state is not None:
+            self._build_apply_state_req(state, out)
+            # See _simple_query() for why this must be a SYNC.
+            out.write_bytes(SYNC_MESSAGE)
+
+        for sql_group in sql_groups:
+            for sql in sql_group:
+                buf = WriteBuffer.new_message(b'P')
+                buf.write_bytestring(b'')  # statement name
+                buf.write_bytestring(sql)
+                buf.write_int16(0)  # number of parameter types
+                out.write_buffer(buf.end_message())
+
+                buf = WriteBuffer.new_message(b'B')
+                buf.write_bytestring(b'')  # portal name
+                buf.write_bytestring(b'')  # statement name
+                buf.write_int16(0)  # number of format codes
+                buf.write_int16(0)  # number of parameters
+                buf.write_int16(0)  # number of result columns
+                out.write_buffer(buf.end_message())
+
+                buf = WriteBuffer.new_message(b'E')
+                buf.write_bytestring(b'')  # portal name
+                buf.write_int32(0)  # limit: 0 - return all rows
+                out.write_buffer(buf.end_message())
+
+            total += len(sql_group)
+            ends.append(total)
+
+        # A single SYNC for the entire pipeline: should any statement
+        # fail, Postgres skips everything up to here.
+        out.write_bytes(SYNC_MESSAGE)
+
+        self.write(out)
+
+        if state is not None:
+            await self._parse_apply_state_resp(state)
+            self.waiting_for_sync = True
+            await self.wait_for_sync()
+            self.after_apply_state(state)
+
+        exc = None
+
+        self.waiting_for_sync = True
+        while True:
+            if not self.buffer.take_message():
+                await self.wait_for_message()
+            mtype = self.buffer.get_message_type()
+
+            try:
+                if mtype == b'C' or mtype == b'I':
+                    # CommandComplete or EmptyQueryResponse
+                    self.buffer.discard_message()
+                    executed += 1
+
+                elif (
+                    mtype == b'D'  # DataRow
+                    or mtype == b'1'  # ParseComplete
+                    or mtype == b'2'  # BindComplete
+                    or mtype == b'n'  # NoData
+                ):
+                    self.buffer.discard_message()
+
+                elif mtype == b'E':
+                    # ErrorResponse
+                    exc = self.parse_error_message()
+
+                elif mtype == b'Z':
+                    self.parse_sync_message()
+                    break
+
+                else:
+                    self.fallthrough()
+
+            finally:
+                self.buffer.finish_message()
+
+        while completed < num_groups and ends[completed] <= executed:
+            completed += 1
+
+        if exc is not None:
+            exc = exc[0](fields=exc[1])
+        return completed, exc
+
+    async def pipeline_queries(self, list sql_groups, bytes state=None):
+        """Execute groups of SQL statements in a single round trip.
+
+        All statements are sent as one Parse/Bind/Execute stream
+        terminated by a single Sync.  Returns a ``(completed, error)``
+        tuple, where *completed* is the number of groups that were
+        executed in full and *error* is the backend error that stopped
+        the pipeline in group number *completed*, if any.
+        """
+        self.before_command()
+        try:
+            return await self._pipeline_queries(sql_groups, state)
+        finally:
+            await self.after_command()
+
     async def run_ddl(
         self,
         object query_unit,
@@ -1186,15 +1653,56 @@ cdef class PGConnection:
         finally:
             await self.after_command()
 
-    async def _restore(self, restore_block, bytes data, dict type_map):
+    def prepare_restore_data(self, restore_block, bytes data, dict type_map):
+        """Build the binary COPY stream for a dump data block.
+
+        No backend communication happens here, so the data of the next
+        block can be prepared while the previous block is being restored.
+        """
         cdef:
             WriteBuffer buf
-            WriteBuffer qbuf
-            WriteBuffer out
 
             char* cbuf
             ssize_t clen
-            ssize_t ncols
+            ssize_t ncols = -1
+
+        cpython.PyBytes_AsStringAndSize(data, &cbuf, &clen)
+        if clen < 7 or cbuf[0] != b'd':
+            raise RuntimeError('unexpected dump data message structure')
+
+        buf = WriteBuffer.new()
+        if (
+            restore_block.compat_elided_cols
+            or any(desc for desc in restore_block.data_mending_desc)
+        ):
+            # The number of fields in the first tuple of the dump,
+            # or -1 if the block carries no tuples at all.
+            ncols = hton.unpack_int16(cbuf + 5)
+
+        if ncols != -1:
+            self._rewrite_copy_data(
+                buf,
+                cbuf,
+                clen,
+                ncols - len(restore_block.compat_elided_cols),
+                restore_block.data_mending_desc,
+                type_map,
+                restore_block.compat_elided_cols,
+            )
+        else:
+            ln = <uint32_t>hton.unpack_int32(cbuf + 1)
+            buf.write_byte(b'd')
+            buf.write_int32(ln + len(COPY_SIGNATURE) + 8)
+            buf.write_bytes(COPY_SIGNATURE)
+            buf.write_int32(0)
+            buf.write_int32(0)
+            buf.write_cstr(cbuf + 5, clen - 5)
+
+        return buf
+
+    async def _restore(self, restore_block, WriteBuffer data):
+        cdef:
+            WriteBuffer qbuf
 
         qbuf = WriteBuffer.new_message(b'Q')
         qbuf.write_bytestring(restore_block.sql_copy_stmt)
@@ -1211,8 +1719,6 @@ cdef class PGConnection:
 
             if mtype == b'G':
                 # CopyInResponse
-                self.buffer.read_byte()
-                ncols = self.buffer.read_int16()
                 self.buffer.discard_message()
                 break
 
@@ -1229,33 +1735,7 @@ cdef class PGConnection:
         if er is not None:
             raise er[0](fields=er[1])
 
-        buf = WriteBuffer.new()
-        cpython.PyBytes_AsStringAndSize(data, &cbuf, &clen)
-        if (
-            restore_block.compat_elided_cols
-            or any(desc for desc in restore_block.data_mending_desc)
-        ):
-            self._rewrite_copy_data(
-                buf,
-                cbuf,
-                clen,
-                ncols,
-                restore_block.data_mending_desc,
-                type_map,
-                restore_block.compat_elided_cols,
-            )
-        else:
-            if cbuf[0] != b'd':
-                raise RuntimeError('unexpected dump data message structure')
-            ln = <uint32_t>hton.unpack_int32(cbuf + 1)
-            buf.write_byte(b'd')
-            buf.write_int32(ln + len(COPY_SIGNATURE) + 8)
-            buf.write_bytes(COPY_SIGNATURE)
-            buf.write_int32(0)
-            buf.write_int32(0)
-            buf.write_cstr(cbuf + 5, clen - 5)
-
-        self.write(buf)
+        self.write(data)
 
         qbuf = WriteBuffer.new_message(b'c')
         qbuf.end_message()
@@ -1474,10 +1954,10 @@ cdef class PGConnection:
 
         wbuf.write_frbuf(rbuf)
 
-    async def restore(self, restore_block, bytes data, dict type_map):
+    async def restore(self, restore_block, WriteBuffer data):
         self.before_command()
         try:
-            await self._restore(restore_block, data, type_map)
+            await self._restore(restore_block, data)
         finally:
             await self.after_command()
 
@@ -1607,11 +2087,15 @@ cdef class PGConnection:
                 'previous one')
 
         self.idle = False
+        self.command_started_at = time.monotonic()
 
     async def after_command(self):
         if self.idle:
             raise RuntimeError('pgcon: idle while running a command')
 
+        metrics.backend_query_duration.observe(
+            time.monotonic() - self.command_started_at)
+
         if self.cancel_fut is not None:
             await self.cancel_fut
             self.cancel_fut = None
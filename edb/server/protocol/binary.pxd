@@ -28,6 +28,7 @@ from edb.server.pgproto.pgproto cimport (
     ReadBuffer,
 )
 
+from edb.server.cache cimport stmt_cache
 from edb.server.dbview cimport dbview
 from edb.server.pgcon cimport pgcon
 from edb.server.pgproto.debug cimport PG_DEBUG
@@ -62,6 +63,7 @@ cdef class QueryRequestInfo:
     cdef public bint inline_objectids
     cdef public uint64_t allow_capabilities
 
+    cdef readonly tuple cache_key
     cdef int cached_hash
 
 
@@ -97,6 +99,7 @@ cdef class EdgeConnection:
         object _main_task
 
         CompiledQuery _last_anon_compiled
+        stmt_cache.StatementsCache _prepared_stmts
         WriteBuffer _write_buf
 
         bint debug
@@ -125,6 +128,15 @@ cdef class EdgeConnection:
     cdef parse_prepare_query_part(self, bint account_for_stmt_name)
     cdef char render_cardinality(self, query_unit) except -1
 
+    cdef _store_prepared_stmt(
+        self,
+        bytes stmt_name,
+        bytes eql,
+        QueryRequestInfo query_req,
+        CompiledQuery compiled,
+    )
+    cdef _lookup_prepared_stmt(self, bytes stmt_name)
+
     cdef write(self, WriteBuffer buf)
     cdef flush(self)
     cdef abort(self)
@@ -53,6 +53,7 @@ from edb.server.pgproto.pgproto cimport (
 )
 from edb.server.pgproto.pgproto import UUID as pg_UUID
 
+from edb.server.cache cimport stmt_cache
 from edb.server.dbview cimport dbview
 
 from edb.server import config
@@ -60,11 +61,14 @@ from edb.server import config
 from edb.server import buildmeta
 from edb.server import compiler
 from edb.server import defines as edbdef
+from edb.server import metrics
 from edb.server.compiler import errormech
 from edb.server.compiler import enums
 from edb.server.pgcon cimport pgcon
 from edb.server.pgcon import errors as pgerror
 
+from edb.pgsql import common as pg_common
+
 from edb.schema import objects as s_obj
 
 from edb import errors
@@ -79,6 +83,8 @@ include "./consts.pxi"
 
 
 DEF FLUSH_BUFFER_AFTER = 100_000
+DEF SCRIPT_PIPELINE_MAX_UNITS = 1000
+DEF PREPARED_STMTS_CACHE = 100
 cdef bytes ZERO_UUID = b'\x00' * 16
 cdef bytes EMPTY_TUPLE_UUID = s_obj.get_known_type_id('empty-tuple').bytes
 
@@ -116,6 +122,51 @@ DEF SERVER_HEADER_CAPABILITIES = 0x1001
 DEF ALL_CAPABILITIES = 0xFFFFFFFFFFFFFFFF
 
 
+cdef inline bint is_pipelineable(query_unit):
+    return bool(
+        query_unit.sql
+        and query_unit.is_transactional
+        and not query_unit.ddl_stmt_id
+        and not query_unit.has_set
+        and not query_unit.system_config
+        and not query_unit.database_config
+        and not query_unit.config_ops
+        and not query_unit.create_db
+        and not query_unit.drop_db
+        and not query_unit.create_db_template
+        and query_unit.user_schema is None
+        and query_unit.cached_reflection is None
+        and query_unit.global_schema is None
+    )
+
+
+cdef int count_pipelined_units(units, int start, bint in_tx):
+    """Count the script units at *start* that can run as one pipeline.
+
+    Only plain transactional units qualify.  Everything up to the
+    pipeline's single SYNC runs in one implicit transaction, so a unit
+    that would autocommit on its own (one running outside of an
+    explicit transaction) must be the last one in a pipeline.
+    """
+    cdef int end = start
+
+    while (
+        end < len(units)
+        and end - start < SCRIPT_PIPELINE_MAX_UNITS
+        and is_pipelineable(units[end])
+    ):
+        query_unit = units[end]
+        end += 1
+        if query_unit.tx_id is not None:
+            in_tx = True
+        elif not in_tx:
+            break
+        if query_unit.tx_commit or query_unit.tx_rollback:
+            in_tx = False
+
+    return end - start
+
+
 def parse_capabilities_header(value: bytes) -> uint64_t:
     if len(value) != 8:
         raise errors.BinaryProtocolError(
@@ -137,6 +188,18 @@ cdef inline bint parse_boolean(value: bytes, header: str):
         )
 
 
+cdef inline int parse_jobs_header(value: bytes) except -1:
+    try:
+        jobs = int(value.decode())
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        raise errors.BinaryProtocolError(
+            f'JOBS header must be a positive integer'
+        )
+    return jobs
+
+
 @cython.final
 cdef class QueryRequestInfo:
 
@@ -163,7 +226,9 @@ cdef class QueryRequestInfo:
         self.inline_objectids = inline_objectids
         self.allow_capabilities = allow_capabilities
 
-        self.cached_hash = hash((
+        # The cache key is a plain tuple, so that compiled queries
+        # can be persisted along with their keys.
+        self.cache_key = (
             self.source.cache_key(),
             self.protocol_version,
             self.io_format,
@@ -172,22 +237,14 @@ cdef class QueryRequestInfo:
             self.inline_typeids,
             self.inline_typenames,
             self.inline_objectids,
-        ))
+        )
+        self.cached_hash = hash(self.cache_key)
 
     def __hash__(self):
         return self.cached_hash
 
     def __eq__(self, other: QueryRequestInfo) -> bool:
-        return (
-            self.source.cache_key() == other.source.cache_key() and
-            self.protocol_version == other.protocol_version and
-            self.io_format == other.io_format and
-            self.expect_one == other.expect_one and
-            self.implicit_limit == other.implicit_limit and
-            self.inline_typeids == other.inline_typeids and
-            self.inline_typenames == other.inline_typenames and
-            self.inline_objectids == other.inline_objectids
-        )
+        return self.cache_key == other.cache_key
 
 
 @cython.final
@@ -229,6 +286,8 @@ cdef class EdgeConnection:
         self._write_waiter = None
 
         self._last_anon_compiled = None
+        self._prepared_stmts = stmt_cache.StatementsCache(
+            maxsize=PREPARED_STMTS_CACHE)
 
         self._write_buf = None
 
@@ -271,7 +330,10 @@ cdef class EdgeConnection:
                 return self._pinned_pgcon
             if self._pinned_pgcon is not None:
                 raise RuntimeError('there is already a pinned pgcon')
-            conn = await self.server.acquire_pgcon(_dbview.dbname)
+            # Prefer a backend connection that already has the session
+            # state of this connection applied.
+            conn = await self.server.acquire_pgcon(
+                _dbview.dbname, affinity=_dbview.serialize_state())
             self._pinned_pgcon = conn
             self._pgcon_released = False
             return conn
@@ -375,6 +437,7 @@ cdef class EdgeConnection:
         if self._write_buf is not None and self._write_buf.len():
             buf = self._write_buf
             self._write_buf = None
+            metrics.bytes_sent_total.inc(buf.len(), 'binary')
             self._transport.write(memoryview(buf))
 
     async def wait_for_message(self):
@@ -565,6 +628,7 @@ cdef class EdgeConnection:
             conn.close()
 
     async def _start_connection(self, database: str, user: str) -> None:
+        await self.server.ensure_db_introspected(database)
         dbv = self.server.new_dbview(
             dbname=database,
             user=user,
@@ -1016,7 +1080,10 @@ cdef class EdgeConnection:
         cdef:
             bytes state = None
             int i
+            int idx
+            int pipeline_end = 0
             dbview.DatabaseConnectionView _dbview
+            pgcon.PGConnection conn
 
         units = await self._compile_script(eql, stmt_mode=stmt_mode)
 
@@ -1036,10 +1103,21 @@ cdef class EdgeConnection:
 
         conn = await self.get_pgcon()
         try:
-            for query_unit in units:
+            for idx, query_unit in enumerate(units):
                 if self._cancelled:
                     raise ConnectionAbortedError
 
+                if idx < pipeline_end:
+                    # Already executed as part of a pipeline.
+                    continue
+
+                pipeline_end = idx + count_pipelined_units(
+                    units, idx, _dbview.in_tx())
+                if pipeline_end - idx > 1:
+                    await self._execute_pipelined_units(
+                        conn, units[idx:pipeline_end], state)
+                    continue
+
                 new_types = None
                 _dbview.start(query_unit)
                 try:
@@ -1074,6 +1152,11 @@ cdef class EdgeConnection:
                                     # only apply state to the first query.
                                     i += 1
 
+                            if query_unit.has_set:
+                                # The unit has modified the session state
+                                # stored in the backend connection.
+                                conn.invalidate_state()
+
                         if query_unit.create_db:
                             await self.server.introspect_db(
                                 query_unit.create_db
@@ -1106,12 +1189,56 @@ cdef class EdgeConnection:
 
         return query_unit
 
+    async def _execute_pipelined_units(
+        self,
+        pgcon.PGConnection conn,
+        list units,
+        bytes state,
+    ):
+        cdef:
+            dbview.DatabaseConnectionView _dbview
+            int completed
+            int i
+
+        _dbview = self.get_dbview()
+
+        # The first unit is started before anything is sent to Postgres
+        # so that a failed transaction is reported just like it is for
+        # units executed one by one.  The remaining units are started
+        # after the fact: the dbview state transitions are local and
+        # must be replayed in order.
+        _dbview.start(units[0])
+        try:
+            completed, exc = await conn.pipeline_queries(
+                [query_unit.sql for query_unit in units], state)
+        except Exception as ex:
+            completed, exc = 0, ex
+
+        for i in range(completed):
+            query_unit = units[i]
+            if i > 0:
+                _dbview.start(query_unit)
+            side_effects = _dbview.on_success(query_unit, None)
+            if side_effects:
+                await self.signal_side_effects(side_effects)
+
+        if exc is not None:
+            # Attribute the error to the unit that caused it.
+            query_unit = units[completed]
+            if completed > 0:
+                _dbview.start(query_unit)
+            _dbview.on_error(query_unit)
+            if not conn.in_tx() and _dbview.in_tx():
+                # See the comment in _simple_query().
+                _dbview.abort_tx()
+                await self.recover_current_tx_info(conn)
+            raise exc
+
     async def signal_side_effects(self, side_effects):
         if side_effects & dbview.SideEffects.SchemaChanges:
             self.server.create_task(
-                self.server._signal_sysevent(
-                    'schema-changes',
-                    dbname=self.get_dbview().dbname,
+                self.server._publish_schema_change(
+                    self.get_dbview().dbname,
                 ),
             )
         if side_effects & dbview.SideEffects.GlobalSchemaChanges:
@@ -1158,7 +1285,7 @@ cdef class EdgeConnection:
                              'after', source.first_extra())
 
         _dbview = self.get_dbview()
-        query_unit = _dbview.lookup_compiled_query(query_req)
+        query_unit = _dbview.lookup_compiled_query(query_req.cache_key)
         cached = True
         if query_unit is None:
             # Cache miss; need to compile this query.
@@ -1192,7 +1319,7 @@ cdef class EdgeConnection:
                 _dbview.raise_in_tx_error()
 
         if not cached and query_unit.cacheable:
-            _dbview.cache_compiled_query(query_req, query_unit)
+            _dbview.cache_compiled_query(query_req.cache_key, query_unit)
 
         return CompiledQuery(
             query_unit=query_unit,
@@ -1268,9 +1395,6 @@ cdef class EdgeConnection:
 
         if parse_stmt_name:
             stmt_name = self.buffer.read_len_prefixed_bytes()
-            if stmt_name:
-                raise errors.UnsupportedFeatureError(
-                    'prepared statements are not yet supported')
 
         eql = self.buffer.read_len_prefixed_bytes()
         if not eql:
@@ -1345,9 +1469,9 @@ cdef class EdgeConnection:
             bytes eql
             QueryRequestInfo query_req
 
-        self._last_anon_compiled = None
-
         eql, query_req, stmt_name = self.parse_prepare_query_part(True)
+        if not stmt_name:
+            self._last_anon_compiled = None
         compiled_query = await self._parse(eql, query_req)
 
         buf = WriteBuffer.new_message(b'1')  # ParseComplete
@@ -1367,10 +1491,87 @@ cdef class EdgeConnection:
         buf.write_bytes(compiled_query.query_unit.out_type_id)
         buf.end_message()
 
-        self._last_anon_compiled = compiled_query
+        if stmt_name:
+            self._store_prepared_stmt(
+                stmt_name, eql, query_req, compiled_query)
+        else:
+            self._last_anon_compiled = compiled_query
 
         self.write(buf)
 
+    cdef _store_prepared_stmt(
+        self,
+        bytes stmt_name,
+        bytes eql,
+        QueryRequestInfo query_req,
+        CompiledQuery compiled,
+    ):
+        cdef dbview.DatabaseConnectionView _dbview
+
+        # Named statements outlive the anonymous one and are kept
+        # for the lifetime of the connection, so remember the database
+        # version and the session state they were compiled against in
+        # order to detect stale entries on execution.
+        _dbview = self.get_dbview()
+        if _dbview.in_tx_with_ddl():
+            # The schema of a transaction with DDL can be rolled back
+            # to a savepoint without a new version, so the statement
+            # is always compiled again.
+            dbver = None
+        else:
+            dbver = _dbview.dbver
+        self._prepared_stmts[stmt_name] = (
+            eql, query_req, compiled, dbver,
+            _dbview.get_modaliases(), _dbview.get_session_config())
+        while self._prepared_stmts.needs_cleanup():
+            self._prepared_stmts.cleanup_one()
+
+    cdef _lookup_prepared_stmt(self, bytes stmt_name):
+        entry = self._prepared_stmts.get(stmt_name, None)
+        if entry is None:
+            raise errors.TypeSpecNotFoundError(
+                f'prepared statement {stmt_name.decode()!r} does not exist')
+        return entry
+
+    async def _get_prepared_stmt(self, bytes stmt_name):
+        cdef:
+            CompiledQuery compiled
+            CompiledQuery recompiled
+            QueryRequestInfo query_req
+            dbview.DatabaseConnectionView _dbview
+
+        eql, query_req, compiled, dbver, modaliases, session_config = \
+            self._lookup_prepared_stmt(stmt_name)
+        _dbview = self.get_dbview()
+        if (
+            dbver == _dbview.dbver
+            and modaliases == _dbview.get_modaliases()
+            and session_config == _dbview.get_session_config()
+        ):
+            return compiled
+
+        # The schema, the module aliases or the session config have
+        # changed since the statement was prepared.  Recompile it, and
+        # if its input or output shape is no longer what the client
+        # was told in ParseComplete, make the client prepare it again.
+        if self.debug:
+            self.debug_print('EXECUTE /REPARSE', stmt_name, eql)
+
+        recompiled = await self._parse(eql, query_req)
+        if (
+            recompiled.query_unit.in_type_id
+                != compiled.query_unit.in_type_id
+            or recompiled.query_unit.out_type_id
+                != compiled.query_unit.out_type_id
+        ):
+            del self._prepared_stmts[stmt_name]
+            raise errors.TypeSpecNotFoundError(
+                f'prepared statement {stmt_name.decode()!r} is no longer '
+                f'valid after a schema or session change, re-prepare it')
+
+        self._store_prepared_stmt(stmt_name, eql, query_req, recompiled)
+        return recompiled
+
     #############
 
     cdef WriteBuffer make_describe_msg(self, CompiledQuery query):
@@ -1423,8 +1624,9 @@ cdef class EdgeConnection:
             stmt_name = self.buffer.read_len_prefixed_bytes()
 
             if stmt_name:
-                raise errors.UnsupportedFeatureError(
-                    'prepared statements are not yet supported')
+                _, _, compiled, *_ = self._lookup_prepared_stmt(stmt_name)
+                msg = self.make_describe_msg(compiled)
+                self.write(msg)
             else:
                 if self._last_anon_compiled is None:
                     raise errors.TypeSpecNotFoundError(
@@ -1591,14 +1793,17 @@ cdef class EdgeConnection:
             self.debug_print('EXECUTE')
 
         if stmt_name:
-            raise errors.UnsupportedFeatureError(
-                'prepared statements are not yet supported')
+            compiled = await self._get_prepared_stmt(stmt_name)
+            # Named statements are expected to be executed repeatedly,
+            # so use a backend prepared statement for them too.
+            use_prep_stmt = bool(compiled.query_unit.sql_hash)
         else:
             if self._last_anon_compiled is None:
                 raise errors.BinaryProtocolError(
                     'no prepared anonymous statement found')
 
             compiled = self._last_anon_compiled
+            use_prep_stmt = False
 
         if compiled.query_unit.capabilities & ~allow_capabilities:
             raise compiled.query_unit.capabilities.make_error(
@@ -1606,7 +1811,7 @@ cdef class EdgeConnection:
                 errors.DisabledCapabilityError,
             )
 
-        await self._execute(compiled, bind_args, False)
+        await self._execute(compiled, bind_args, use_prep_stmt)
 
     async def optimistic_execute(self):
         cdef:
@@ -1628,7 +1833,8 @@ cdef class EdgeConnection:
         bind_args = self.buffer.read_len_prefixed_bytes()
         self.buffer.finish_message()
 
-        query_unit = self.get_dbview().lookup_compiled_query(query_req)
+        query_unit = self.get_dbview().lookup_compiled_query(
+            query_req.cache_key)
         if query_unit is None:
             if self.debug:
                 self.debug_print('OPTIMISTIC EXECUTE /REPARSE', query)
@@ -2193,6 +2399,7 @@ cdef class EdgeConnection:
             self.abort()
 
     def data_received(self, data):
+        metrics.bytes_received_total.inc(len(data), 'binary')
         self.buffer.feed_data(data)
         if self._msg_take_waiter is not None and self.buffer.take_message():
             self._msg_take_waiter.set_result(True)
@@ -2215,8 +2422,17 @@ cdef class EdgeConnection:
         cdef:
             WriteBuffer msg_buf
             dbview.DatabaseConnectionView _dbview
+            int jobs = 1
 
-        self.reject_headers()
+        headers = self.parse_headers()
+        if headers:
+            for k, v in headers.items():
+                if k == DUMP_HEADER_JOBS:
+                    jobs = parse_jobs_header(v)
+                else:
+                    raise errors.BinaryProtocolError(
+                        f'unexpected message header: {k}'
+                    )
         self.buffer.finish_message()
 
         _dbview = self.get_dbview()
@@ -2230,6 +2446,7 @@ cdef class EdgeConnection:
 
         dbname = _dbview.dbname
         pgcon = await server.acquire_pgcon(dbname)
+        worker_pgcons = []
         try:
             # To avoid having races, we want to:
             #
@@ -2238,8 +2455,9 @@ cdef class EdgeConnection:
             #   2. in the compiler process we connect to that transaction
             #      and re-introspect the schema in it.
             #
-            #   3. all dump worker pg connection would work on the same
-            #      connection.
+            #   3. all dump worker pg connections would work either on
+            #      the same connection, or in transactions importing
+            #      the snapshot exported by it.
             #
             # This guarantees that every pg connection and the compiler work
             # with the same DB state.
@@ -2276,15 +2494,25 @@ cdef class EdgeConnection:
                     if result:
                         schema_ddl += '\n' + result[0][0].decode('utf-8')
 
+            jobs = max(1, min(
+                jobs,
+                len(blocks),
+                edbdef.DUMP_MAX_JOBS,
+                # Leave at least half of the backend pool to other clients.
+                max(server.get_backend_pool_capacity() // 2, 1),
+            ))
+
             msg_buf = WriteBuffer.new_message(b'@')
 
-            msg_buf.write_int16(3)  # number of headers
+            msg_buf.write_int16(4)  # number of headers
             msg_buf.write_int16(DUMP_HEADER_BLOCK_TYPE)
             msg_buf.write_len_prefixed_bytes(DUMP_HEADER_BLOCK_TYPE_INFO)
             msg_buf.write_int16(DUMP_HEADER_SERVER_VER)
             msg_buf.write_len_prefixed_utf8(str(buildmeta.get_version()))
             msg_buf.write_int16(DUMP_HEADER_SERVER_TIME)
             msg_buf.write_len_prefixed_utf8(str(int(time.time())))
+            msg_buf.write_int16(DUMP_HEADER_JOBS)
+            msg_buf.write_len_prefixed_utf8(str(jobs))
 
             msg_buf.write_int16(dump_protocol[0])
             msg_buf.write_int16(dump_protocol[1])
@@ -2308,18 +2536,25 @@ cdef class EdgeConnection:
                     assert len(depid.bytes) == 16
                     msg_buf.write_bytes(depid.bytes)  # uuid
 
-            self._transport.write(memoryview(msg_buf.end_message()))
+            msg_buf.end_message()
+            metrics.bytes_sent_total.inc(msg_buf.len(), 'binary')
+            self._transport.write(memoryview(msg_buf))
             self.flush()
 
+            if jobs > 1:
+                worker_pgcons = await self._start_dump_workers(
+                    pgcon, dbname, jobs - 1)
+
             blocks_queue = collections.deque(blocks)
-            output_queue = asyncio.Queue(maxsize=2)
+            output_queue = asyncio.Queue(maxsize=2 * (len(worker_pgcons) + 1))
 
             async with taskgroup.TaskGroup() as g:
-                g.create_task(pgcon.dump(
-                    blocks_queue,
-                    output_queue,
-                    DUMP_BLOCK_SIZE,
-                ))
+                for con in (pgcon, *worker_pgcons):
+                    g.create_task(con.dump(
+                        blocks_queue,
+                        output_queue,
+                        DUMP_BLOCK_SIZE,
+                    ))
 
                 nstops = 0
                 while True:
@@ -2329,8 +2564,8 @@ cdef class EdgeConnection:
                     out = await output_queue.get()
                     if out is None:
                         nstops += 1
-                        if nstops == 1:
-                            # we only have one worker right now
+                        if nstops == len(worker_pgcons) + 1:
+                            # all workers have drained the blocks queue
                             break
                     else:
                         block, block_num, data = out
@@ -2350,16 +2585,31 @@ cdef class EdgeConnection:
                         msg_buf.write_int16(DUMP_HEADER_BLOCK_DATA)
                         msg_buf.write_len_prefixed_buffer(data)
 
-                        self._transport.write(memoryview(msg_buf.end_message()))
+                        msg_buf.end_message()
+                        metrics.bytes_sent_total.inc(msg_buf.len(), 'binary')
+                        self._transport.write(memoryview(msg_buf))
                         if self._write_waiter:
                             await self._write_waiter
 
+            for con in worker_pgcons:
+                await con.simple_query(
+                    b'''ROLLBACK;''',
+                    True
+                )
+
             await pgcon.simple_query(
                 b'''ROLLBACK;''',
                 True
             )
 
+            for con in worker_pgcons:
+                server.release_pgcon(dbname, con)
+            worker_pgcons = []
+
         finally:
+            for con in worker_pgcons:
+                # The worker transaction may be in any state here.
+                server.release_pgcon(dbname, con, discard=True)
             server.release_pgcon(dbname, pgcon)
 
         msg_buf = WriteBuffer.new_message(b'C')
@@ -2368,6 +2618,37 @@ cdef class EdgeConnection:
         self.write(msg_buf.end_message())
         self.flush()
 
+    async def _start_dump_workers(self, pgcon, dbname, num):
+        # Export the snapshot of the dump transaction and make
+        # `num` additional backend connections look at the very
+        # same database state.
+        result = await pgcon.simple_query(
+            b'SELECT pg_export_snapshot();',
+            ignore_data=False,
+        )
+        snapshot_id = result[0][0].decode()
+
+        server = self.server
+        cons = []
+        try:
+            for _ in range(num):
+                con = await server.acquire_pgcon(dbname)
+                cons.append(con)
+                await con.simple_query(
+                    b'''START TRANSACTION
+                            ISOLATION LEVEL REPEATABLE READ
+                            READ ONLY;
+                        SET TRANSACTION SNAPSHOT ''' +
+                    pg_common.quote_literal(snapshot_id).encode() + b';',
+                    True
+                )
+        except Exception:
+            for con in cons:
+                server.release_pgcon(dbname, con, discard=True)
+            raise
+
+        return cons
+
     async def _execute_utility_stmt(self, eql: str, pgcon):
         cdef dbview.DatabaseConnectionView _dbview
 
@@ -2405,6 +2686,9 @@ cdef class EdgeConnection:
             WriteBuffer msg_buf
             char mtype
             dbview.DatabaseConnectionView _dbview
+            int prefetch
+            uint64_t restored_blocks = 0
+            uint64_t restored_bytes = 0
 
         _dbview = self.get_dbview()
         if _dbview.txid:
@@ -2413,7 +2697,11 @@ cdef class EdgeConnection:
             )
 
         self.reject_headers()
-        self.buffer.read_int16()  # discard -j level
+        # The -j level of the client.  The data is applied on a single
+        # backend connection, so it is only used as the number of
+        # blocks to read ahead of it.
+        prefetch = self.buffer.read_int16()
+        prefetch = max(1, min(prefetch, edbdef.RESTORE_MAX_PREFETCH_BLOCKS))
 
         # Now parse the embedded dump header message:
 
@@ -2534,51 +2822,113 @@ cdef class EdgeConnection:
             # Send "RestoreReadyMessage"
             msg = WriteBuffer.new_message(b'+')
             msg.write_int16(0)  # no headers
-            msg.write_int16(1)  # -j1
+            msg.write_int16(prefetch)
             self.write(msg.end_message())
             self.flush()
 
-            while True:
-                if not self.buffer.take_message():
-                    await self.wait_for_message()
-                mtype = self.buffer.get_message_type()
-
-                if mtype == b'=':
-                    block_type = None
-                    block_id = None
-                    block_num = None
-                    block_data = None
-
-                    num_headers = self.buffer.read_int16()
-                    for _ in range(num_headers):
-                        header = self.buffer.read_int16()
-                        if header == DUMP_HEADER_BLOCK_TYPE:
-                            block_type = self.buffer.read_len_prefixed_bytes()
-                        elif header == DUMP_HEADER_BLOCK_ID:
-                            block_id = self.buffer.read_len_prefixed_bytes()
-                            block_id = pg_UUID(block_id)
-                        elif header == DUMP_HEADER_BLOCK_NUM:
-                            block_num = self.buffer.read_len_prefixed_bytes()
-                        elif header == DUMP_HEADER_BLOCK_DATA:
-                            block_data = self.buffer.read_len_prefixed_bytes()
+            # The data blocks are applied in the same transaction as
+            # the schema DDL, so a single backend connection restores
+            # them in the order they arrive; other connections could
+            # not see the uncommitted tables.  Parsing of the incoming
+            # blocks and mending of their data are pipelined with it:
+            # up to `prefetch` blocks are prepared while the backend
+            # is busy with the COPY of the previous one.
+            #
+            # Note that mending runs on the event loop, so it only
+            # overlaps with the backend processing the COPY data, not
+            # with writing it.
+            restore_queue = asyncio.Queue(maxsize=prefetch)
+            restore_task = asyncio.create_task(
+                self._restore_data_blocks(pgcon, restore_queue))
+            started_at = time.monotonic()
 
-                    self.buffer.finish_message()
+            try:
+                while True:
+                    if not self.buffer.take_message():
+                        await self.wait_for_message()
+                    mtype = self.buffer.get_message_type()
+
+                    if mtype == b'=':
+                        block_type = None
+                        block_id = None
+                        block_num = None
+                        block_data = None
+
+                        num_headers = self.buffer.read_int16()
+                        for _ in range(num_headers):
+                            header = self.buffer.read_int16()
+                            if header == DUMP_HEADER_BLOCK_TYPE:
+                                block_type = (
+                                    self.buffer.read_len_prefixed_bytes())
+                            elif header == DUMP_HEADER_BLOCK_ID:
+                                block_id = (
+                                    self.buffer.read_len_prefixed_bytes())
+                                block_id = pg_UUID(block_id)
+                            elif header == DUMP_HEADER_BLOCK_NUM:
+                                block_num = (
+                                    self.buffer.read_len_prefixed_bytes())
+                            elif header == DUMP_HEADER_BLOCK_DATA:
+                                block_data = (
+                                    self.buffer.read_len_prefixed_bytes())
+
+                        self.buffer.finish_message()
+
+                        if (block_type is None or block_id is None
+                                or block_num is None or block_data is None):
+                            raise errors.ProtocolError('incomplete data block')
+
+                        restore_block = restore_blocks[block_id]
+                        type_id_map = (
+                            self._build_type_id_map_for_restore_mending(
+                                restore_block))
+                        copy_data = pgcon.prepare_restore_data(
+                            restore_block, block_data, type_id_map)
+
+                        await self._queue_restore_block(
+                            restore_queue,
+                            restore_task,
+                            (restore_block, copy_data),
+                        )
+                        restored_blocks += 1
+                        restored_bytes += len(block_data)
 
-                    if (block_type is None or block_id is None
-                            or block_num is None or block_data is None):
-                        raise errors.ProtocolError('incomplete data block')
+                    elif mtype == b'.':
+                        self.buffer.finish_message()
+                        break
 
-                    restore_block = restore_blocks[block_id]
-                    type_id_map = self._build_type_id_map_for_restore_mending(
-                        restore_block)
-                    await pgcon.restore(restore_block, block_data, type_id_map)
+                    else:
+                        self.fallthrough()
 
-                elif mtype == b'.':
-                    self.buffer.finish_message()
-                    break
+                await self._queue_restore_block(
+                    restore_queue, restore_task, None)
+                await restore_task
 
-                else:
-                    self.fallthrough()
+            finally:
+                if not restore_task.done():
+                    # Let the backend connection complete the COPY it
+                    # might be in the middle of, so that the transaction
+                    # can be rolled back cleanly.
+                    while not restore_queue.empty():
+                        restore_queue.get_nowait()
+                    restore_queue.put_nowait(None)
+                    await asyncio.wait([restore_task])
+                if not restore_task.cancelled():
+                    restore_task.exception()
+
+            elapsed = time.monotonic() - started_at
+            metrics.restore_bytes_total.inc(restored_bytes)
+            metrics.restore_throughput.observe(
+                restored_bytes / max(elapsed, 1e-6))
+            log_metrics.info(
+                "Restored %d data blocks (%d bytes) into %r in %.3fs;"
+                + " throughput=%.2f MiB/s; prefetch=%d",
+                restored_blocks,
+                restored_bytes,
+                dbname,
+                elapsed,
+                restored_bytes / (1024 * 1024) / max(elapsed, 1e-6),
+                prefetch,
+            )
 
             await pgcon.simple_query(
                 enable_trigger_q.encode(),
@@ -2604,6 +2954,36 @@ cdef class EdgeConnection:
         self.write(msg.end_message())
         self.flush()
 
+    async def _restore_data_blocks(self, pgcon, restore_queue):
+        while True:
+            item = await restore_queue.get()
+            if item is None:
+                return
+            restore_block, copy_data = item
+            await pgcon.restore(restore_block, copy_data)
+
+    async def _queue_restore_block(self, restore_queue, restore_task, item):
+        if restore_task.done():
+            # Surface the error of the restore task, if any.
+            restore_task.result()
+
+        if not restore_queue.full():
+            restore_queue.put_nowait(item)
+            return
+
+        put = asyncio.ensure_future(restore_queue.put(item))
+        try:
+            await asyncio.wait(
+                [put, restore_task],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            if not put.done():
+                put.cancel()
+
+        if not put.done() or put.cancelled():
+            restore_task.result()
+
     def _build_type_id_map_for_restore_mending(self, restore_block):
         type_map = {}
         descriptor_stack = []
@@ -17,6 +17,7 @@
 #
 
 
+import functools
 import http
 import json
 import urllib.parse
@@ -31,6 +32,7 @@ from edb.common import debug
 from edb.common import markup
 
 from edb.server import compiler
+from edb.server import defines as edbdef
 from edb.server.compiler import IoFormat
 from edb.server.compiler import enums
 
@@ -55,16 +57,33 @@ async def handle_request(
 
     variables = None
     query = None
+    batch = None
+    same_snapshot = False
+    stream = False
 
     try:
         if request.method == b'POST':
             if request.content_type and b'json' in request.content_type:
                 body = json.loads(request.body)
-                if not isinstance(body, dict):
+                if isinstance(body, list):
+                    batch = _parse_batch(body)
+                elif not isinstance(body, dict):
                     raise TypeError(
-                        'the body of the request must be a JSON object')
-                query = body.get('query')
-                variables = body.get('variables')
+                        'the body of the request must be a JSON object '
+                        'or an array')
+                elif 'queries' in body:
+                    if not isinstance(body['queries'], list):
+                        raise TypeError('"queries" must be a JSON array')
+                    batch = _parse_batch(body['queries'])
+                    same_snapshot = body.get('same_snapshot', False)
+                    if not isinstance(same_snapshot, bool):
+                        raise TypeError('"same_snapshot" must be a boolean')
+                else:
+                    query = body.get('query')
+                    variables = body.get('variables')
+                    stream = body.get('stream', False)
+                    if not isinstance(stream, bool):
+                        raise TypeError('"stream" must be a boolean')
             else:
                 raise TypeError(
                     'unable to interpret EdgeQL POST request')
@@ -86,14 +105,19 @@ async def handle_request(
                         raise TypeError(
                             '"variables" must be a JSON object')
 
+                stream = qs.get('stream')
+                if stream is not None:
+                    if stream[0] not in ('true', 'false'):
+                        raise TypeError('"stream" must be true or false')
+                    stream = stream[0] == 'true'
+                else:
+                    stream = False
+
         else:
             raise TypeError('expected a GET or a POST request')
 
-        if not query:
-            raise TypeError('invalid EdgeQL request: query is missing')
-
-        if variables is not None and not isinstance(variables, dict):
-            raise TypeError('"variables" must be a JSON object')
+        if batch is None:
+            _check_query(query, variables)
 
     except Exception as ex:
         if debug.flags.server:
@@ -106,29 +130,88 @@ async def handle_request(
 
     response.status = http.HTTPStatus.OK
     response.content_type = b'application/json'
+
+    if batch is not None:
+        try:
+            results = await execute_batch(db, server, batch, same_snapshot)
+        except Exception as ex:
+            results = [ex] * len(batch)
+
+        response.body = (
+            b'[' + b','.join(_make_result_body(r) for r in results) + b']')
+        return
+
+    if stream:
+        try:
+            response.body_stream = await prepare_stream(
+                db, server, query.encode(), variables)
+        except Exception as ex:
+            response.body = _make_result_body(ex)
+        return
+
     try:
         result = await execute(db, server, query.encode(), variables)
     except Exception as ex:
-        if debug.flags.server:
-            markup.dump(ex)
+        result = ex
 
-        ex_type = type(ex)
-        if not issubclass(ex_type, errors.EdgeDBError):
-            # XXX Fix this when LSP "location" objects are implemented
-            ex_type = errors.InternalServerError
+    response.body = _make_result_body(result)
 
-        err_dct = {
-            'message': str(ex),
-            'type': str(ex_type.__name__),
-            'code': ex_type.get_code(),
-        }
 
-        response.body = json.dumps({'error': err_dct}).encode()
-    else:
-        response.body = b'{"data":' + result + b'}'
+def _check_query(query, variables):
+    if not query:
+        raise TypeError('invalid EdgeQL request: query is missing')
+
+    if not isinstance(query, str):
+        raise TypeError('"query" must be a string')
+
+    if variables is not None and not isinstance(variables, dict):
+        raise TypeError('"variables" must be a JSON object')
+
 
+def _parse_batch(list items):
+    if not items:
+        raise TypeError('invalid EdgeQL request: the batch is empty')
+    if len(items) > edbdef.HTTP_PORT_MAX_BATCH_SIZE:
+        raise TypeError(
+            f'invalid EdgeQL request: the batch has {len(items)} queries, '
+            f'the maximum is {edbdef.HTTP_PORT_MAX_BATCH_SIZE}')
 
-async def compile(db, server, bytes query):
+    batch = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise TypeError('every query in a batch must be a JSON object')
+        query = item.get('query')
+        variables = item.get('variables')
+        _check_query(query, variables)
+        batch.append((query.encode(), variables))
+    return batch
+
+
+def _make_result_body(result):
+    if not isinstance(result, Exception):
+        return b'{"data":' + result + b'}'
+    return b'{"error":' + _make_error_body(result) + b'}'
+
+
+def _make_error_body(ex):
+    if debug.flags.server:
+        markup.dump(ex)
+
+    ex_type = type(ex)
+    if not issubclass(ex_type, errors.EdgeDBError):
+        # XXX Fix this when LSP "location" objects are implemented
+        ex_type = errors.InternalServerError
+
+    err_dct = {
+        'message': str(ex),
+        'type': str(ex_type.__name__),
+        'code': ex_type.get_code(),
+    }
+
+    return json.dumps(err_dct).encode()
+
+
+async def compile(db, server, bytes query, io_format=IoFormat.JSON):
     compiler_pool = server.get_compiler_pool()
 
     units, _ = await compiler_pool.compile(
@@ -141,7 +224,7 @@ async def compile(db, server, bytes query):
         edgeql.Source.from_string(query.decode('utf-8')),
         None,           # modaliases
         None,           # session config
-        IoFormat.JSON,  # json mode
+        io_format,      # json mode
         False,          # expected cardinality is MANY
         0,              # no implicit limit
         False,          # no inlining of type IDs
@@ -154,24 +237,34 @@ async def compile(db, server, bytes query):
     return units[0]
 
 
-async def execute(db, server, bytes query, variables):
-    dbver = db.dbver
-    query_cache = server._http_query_cache
-
-    cache_key = ('edgeql_http', query, dbver)
+async def _compile_and_bind(
+    db,
+    server,
+    bytes query,
+    variables,
+    dbver,
+    io_format=IoFormat.JSON,
+):
+    # Compiled queries are stored in the per-database cache shared with
+    # the binary protocol, so they are bounded and dropped along with all
+    # other cached queries when the schema changes.
+    if io_format is IoFormat.JSON:
+        cache_key = ('edgeql_http', query)
+    else:
+        cache_key = ('edgeql_http', query, io_format)
     use_prep_stmt = False
 
-    query_unit: compiler.QueryUnit = query_cache.get(
-        cache_key, None)
+    query_unit: compiler.QueryUnit = db.lookup_compiled_query(cache_key)
 
     if query_unit is None:
-        query_unit = await compile(db, server, query)
+        query_unit = await compile(db, server, query, io_format)
         if query_unit.capabilities & ~ALLOWED_CAPABILITIES:
             raise query_unit.capabilities.make_error(
                 ALLOWED_CAPABILITIES,
                 errors.UnsupportedCapabilityError,
             )
-        query_cache[cache_key] = query_unit
+        if query_unit.cacheable and db.dbver == dbver:
+            db.cache_compiled_query(cache_key, query_unit)
     else:
         # This is at least the second time this query is used.
         use_prep_stmt = True
@@ -189,6 +282,14 @@ async def execute(db, server, bytes query, variables):
                         f'parameter ${param.name} is required')
                 args.append(value)
 
+    return query_unit, use_prep_stmt, args
+
+
+async def execute(db, server, bytes query, variables):
+    dbver = db.dbver
+    query_unit, use_prep_stmt, args = await _compile_and_bind(
+        db, server, query, variables, dbver)
+
     pgcon = await server.acquire_pgcon(db.name)
     try:
         data = await pgcon.parse_execute_json(
@@ -202,3 +303,92 @@ async def execute(db, server, bytes query, variables):
             f'no data received for a JSON query {query_unit.sql[0]!r}')
 
     return data
+
+
+async def prepare_stream(db, server, bytes query, variables):
+    # Compiles the query so that errors can still be reported in a
+    # regular response; returns the body stream running the query.
+    dbver = db.dbver
+    query_unit, use_prep_stmt, args = await _compile_and_bind(
+        db, server, query, variables, dbver, IoFormat.JSON_ELEMENTS)
+
+    return functools.partial(
+        _stream_result, db, server, query_unit, dbver, use_prep_stmt, args)
+
+
+async def _stream_result(
+    db, server, query_unit, dbver, use_prep_stmt, args, write,
+):
+    # The result set elements are forwarded to the client as they are
+    # received from the backend.  An error in the middle of the result
+    # is reported in the "error" field following the partial "data".
+    await _write_and_drain(write, b'{"data":[')
+    try:
+        pgcon = await server.acquire_pgcon(db.name)
+        try:
+            await pgcon.parse_execute_json_elements(
+                query_unit.sql[0], query_unit.sql_hash, dbver,
+                use_prep_stmt, args, write)
+        finally:
+            server.release_pgcon(db.name, pgcon)
+    except ConnectionAbortedError:
+        raise
+    except Exception as ex:
+        await _write_and_drain(
+            write, b'],"error":' + _make_error_body(ex) + b'}')
+    else:
+        await _write_and_drain(write, b']}')
+
+
+async def _write_and_drain(write, bytes data):
+    waiter = write(data)
+    if waiter is not None:
+        await waiter
+
+
+async def execute_batch(db, server, list batch, bint same_snapshot):
+    # All the queries of the batch that compile successfully are sent
+    # to a single backend connection in one round trip.  Returns a list
+    # with the JSON result or the error of every query.
+    dbver = db.dbver
+    results = [None] * len(batch)
+    pg_queries = []
+    pg_query_idx = []
+
+    for i, (query, variables) in enumerate(batch):
+        try:
+            query_unit, use_prep_stmt, args = await _compile_and_bind(
+                db, server, query, variables, dbver)
+        except Exception as ex:
+            results[i] = ex
+        else:
+            pg_queries.append((
+                query_unit.sql[0], query_unit.sql_hash, dbver,
+                use_prep_stmt, args,
+            ))
+            pg_query_idx.append(i)
+
+    if not pg_queries:
+        return results
+
+    try:
+        pgcon = await server.acquire_pgcon(db.name)
+        try:
+            pg_results = await pgcon.parse_execute_json_batch(
+                pg_queries, same_snapshot)
+        finally:
+            server.release_pgcon(db.name, pgcon)
+    except Exception as ex:
+        # Only the queries that were sent to the backend failed with
+        # its error, the others keep their own compilation errors.
+        for i in pg_query_idx:
+            results[i] = ex
+        return results
+
+    for i, sql_args, data in zip(pg_query_idx, pg_queries, pg_results):
+        if data is None:
+            data = errors.InternalServerError(
+                f'no data received for a JSON query {sql_args[0]!r}')
+        results[i] = data
+
+    return results
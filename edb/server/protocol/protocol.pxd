@@ -37,6 +37,7 @@ cdef class HttpResponse:
         public bytes content_type
         public dict custom_headers
         public bytes body
+        public object body_stream
 
 
 cdef class HttpProtocol:
@@ -58,6 +59,7 @@ cdef class HttpProtocol:
         bint allow_insecure_http_clients
 
         HttpRequest current_request
+        object write_waiter
 
     cdef _write(self, bytes req_version, bytes resp_status,
                 bytes content_type, dict custom_headers, bytes body,
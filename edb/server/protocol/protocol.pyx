@@ -34,6 +34,7 @@ from edb.common import markup
 
 from edb.graphql import extension as graphql_ext
 
+from edb.server import metrics
 from edb.server.protocol import binary
 
 from . import edgeql_ext
@@ -55,6 +56,10 @@ cdef class HttpResponse:
         self.content_type = b'text/plain'
         self.custom_headers = {}
         self.body = b''
+        # An async callable streaming the body instead: it is called with
+        # a function writing a chunk of the body, which returns a future
+        # to wait on when the client is not reading fast enough.
+        self.body_stream = None
         self.close_connection = False
 
 
@@ -81,6 +86,7 @@ cdef class HttpProtocol:
         self.respond_hsts = False  # redirect non-TLS HTTP clients to TLS URL
 
         self.is_tls = False
+        self.write_waiter = None
 
     def connection_made(self, transport):
         self.transport = transport
@@ -89,6 +95,21 @@ cdef class HttpProtocol:
         self.transport = None
         self.unprocessed = None
 
+        waiter = self.write_waiter
+        self.write_waiter = None
+        if waiter is not None and not waiter.done():
+            waiter.set_exception(ConnectionAbortedError())
+
+    def pause_writing(self):
+        if self.write_waiter is None:
+            self.write_waiter = self.loop.create_future()
+
+    def resume_writing(self):
+        waiter = self.write_waiter
+        self.write_waiter = None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
     def eof_received(self):
         pass
 
@@ -143,6 +164,7 @@ cdef class HttpProtocol:
                 self._init_http_parser()
                 self.respond_hsts = not self.allow_insecure_http_clients
 
+        metrics.bytes_received_total.inc(len(data), 'http')
         try:
             self.parser.feed_data(data)
         except Exception as ex:
@@ -219,9 +241,14 @@ cdef class HttpProtocol:
         data = [
             b'HTTP/', req_version, b' ', resp_status, b'\r\n',
             b'Content-Type: ', content_type, b'\r\n',
-            b'Content-Length: ', f'{len(body)}'.encode(), b'\r\n',
         ]
 
+        if body is None:
+            # The body follows in chunks, see _write_chunk().
+            data.append(b'Transfer-Encoding: chunked\r\n')
+        else:
+            data.append(f'Content-Length: {len(body)}\r\n'.encode())
+
         for key, value in custom_headers.items():
             data.append(f'{key}: {value}\r\n'.encode())
 
@@ -236,7 +263,9 @@ cdef class HttpProtocol:
         data.append(b'\r\n')
         if body:
             data.append(body)
-        self.transport.write(b''.join(data))
+        payload = b''.join(data)
+        metrics.bytes_sent_total.inc(len(payload), 'http')
+        self.transport.write(payload)
 
     cdef write(self, HttpRequest request, HttpResponse response):
         assert type(response.status) is HTTPStatus
@@ -248,6 +277,41 @@ cdef class HttpProtocol:
             response.body,
             response.close_connection)
 
+    def _write_chunk(self, data):
+        if self.transport is None:
+            raise ConnectionAbortedError
+
+        size = len(data)
+        if size:
+            # An empty chunk would terminate the body.
+            self.transport.writelines((b'%x\r\n' % size, data, b'\r\n'))
+            metrics.bytes_sent_total.inc(size, 'http')
+        return self.write_waiter
+
+    async def _write_stream(self, HttpRequest request, HttpResponse response):
+        if request.version == b'1.0':
+            # HTTP/1.0 has no chunked transfer encoding: collect the body.
+            chunks = []
+            await response.body_stream(lambda data: chunks.append(bytes(data)))
+            response.body = b''.join(chunks)
+            self.write(request, response)
+            return
+
+        assert type(response.status) is HTTPStatus
+        self._write(
+            request.version,
+            f'{response.status.value} {response.status.phrase}'.encode(),
+            response.content_type,
+            response.custom_headers,
+            None,
+            response.close_connection)
+
+        await response.body_stream(self._write_chunk)
+
+        if self.transport is None:
+            raise ConnectionAbortedError
+        self.transport.write(b'0\r\n\r\n')
+
     def _switch_to_binary_protocol(self, data=None):
         binproto = binary.EdgeConnection(self.server, self.external_auth)
         self.transport.set_protocol(binproto)
@@ -345,7 +409,21 @@ cdef class HttpProtocol:
             self.unhandled_exception(ex)
             return
 
-        self.write(request, response)
+        if response.body_stream is not None:
+            try:
+                await self._write_stream(request, response)
+            except Exception as ex:
+                if debug.flags.server:
+                    markup.dump(ex)
+                # The response might have been sent in part already, so
+                # the connection cannot be used any further.
+                if self.transport is not None:
+                    self.transport.abort()
+                    self.transport = None
+                    self.unprocessed = None
+                return
+        else:
+            self.write(request, response)
         self.in_response = False
 
         if response.close_connection or not request.should_keep_alive:
@@ -361,6 +439,7 @@ cdef class HttpProtocol:
         # Check if this is a request to a registered extension
         if len(path_parts) >= 3 and path_parts[0] == 'db':
             root, dbname, extname, *args = path_parts
+            await self.server.ensure_db_introspected(dbname)
             db = self.server.maybe_get_db(dbname=dbname)
             if extname == 'edgeql':
                 extname = 'edgeql_http'
@@ -27,6 +27,7 @@ from edb import edgeql
 
 from edb.common import debug
 from edb.common import markup
+from edb.common import prometheus
 
 from edb.schema import schema as s_schema
 
@@ -34,6 +35,7 @@ from edb.server import compiler
 from edb.server.compiler import IoFormat
 from edb.server.compiler import enums
 from edb.server import defines as edbdef
+from edb.server import metrics
 
 
 ALLOWED_CAPABILITIES = (
@@ -50,6 +52,8 @@ async def handle_request(
     try:
         if path_parts == ['status', 'ready'] and request.method == b'GET':
             await handle_status_request(request, response, server)
+        elif path_parts == ['metrics'] and request.method == b'GET':
+            handle_metrics_request(request, response)
         else:
             response.body = b'Unknown path'
             response.status = http.HTTPStatus.NOT_FOUND
@@ -102,6 +106,15 @@ async def handle_status_request(
     return
 
 
+def handle_metrics_request(
+    request,
+    response,
+):
+    response.status = http.HTTPStatus.OK
+    response.content_type = prometheus.CONTENT_TYPE.encode()
+    response.body = metrics.registry.generate().encode()
+
+
 async def compile(server, query):
     compiler_pool = server.get_compiler_pool()
 
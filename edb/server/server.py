@@ -22,14 +22,17 @@ from typing import *
 
 import asyncio
 import binascii
+import hashlib
 import json
 import logging
 import os
+import pathlib
 import pickle
 import socket
 import ssl
 import stat
 import sys
+import time
 import uuid
 
 import immutables
@@ -43,15 +46,19 @@ from edb.common import windowedsum
 from edb.schema import reflection as s_refl
 from edb.schema import roles as s_role
 from edb.schema import schema as s_schema
+from edb.schema import version as s_ver
 
 from edb.edgeql import parser as ql_parser
 
+from edb.pgsql import common as pg_common
+
 from edb.server import args as srvargs
 from edb.server import cache
 from edb.server import config
 from edb.server import connpool
 from edb.server import compiler_pool
 from edb.server import defines
+from edb.server import metrics
 from edb.server import protocol
 from edb.server.protocol import binary  # type: ignore
 from edb.server import pgcon
@@ -107,6 +114,11 @@ class Server:
         netport,
         allow_insecure_binary_clients: bool = False,
         allow_insecure_http_clients: bool = False,
+        compiler_pool_delta_sync: bool = False,
+        compiler_pool_max_dbs: int = 32,
+        query_cache_dir: Optional[pathlib.Path] = None,
+        lazy_db_introspection: bool = False,
+        db_idle_eviction_timeout: int = 0,
         auto_shutdown_after: float = -1,
         echo_runtime_info: bool = False,
         status_sink: Optional[Callable[[str], None]] = None,
@@ -139,11 +151,27 @@ class Server:
         # DB state will be initialized in init().
         self._dbindex = None
 
+        self._lazy_db_introspection = lazy_db_introspection
+        self._db_idle_eviction_timeout = db_idle_eviction_timeout
+        # dbname -> introspection task of a lazily loaded database,
+        # shared by all concurrent first connections to it
+        self._db_introspections = {}
+        # dbname -> time.monotonic() of the last use of a database
+        self._db_last_used = {}
+        # dbname -> the user schema other servers are known to have
+        # (as introspected, or as of the last published schema delta)
+        self._schema_delta_bases = {}
+        # dbname -> lock serializing refreshes of a schema on remote DDL
+        self._schema_refresh_locks = {}
+        self._db_evictor = None
+
         self._runstate_dir = runstate_dir
         self._internal_runstate_dir = internal_runstate_dir
         self._max_backend_connections = max_backend_connections
         self._compiler_pool = None
         self._compiler_pool_size = compiler_pool_size
+        self._compiler_pool_delta_sync = compiler_pool_delta_sync
+        self._compiler_pool_max_dbs = compiler_pool_max_dbs
 
         self._listen_hosts = nethosts
         self._listen_port = netport
@@ -180,6 +208,15 @@ class Server:
         self._http_query_cache = cache.StatementsCache(
             maxsize=defines.HTTP_PORT_QUERY_CACHE_SIZE)
 
+        if query_cache_dir is not None:
+            self._persistent_query_cache = cache.PersistentQueryCache(
+                query_cache_dir)
+        else:
+            self._persistent_query_cache = None
+        # dbname -> (dbver, compiled_queries_gen) of the last save
+        self._persisted_query_caches = {}
+        self._query_cache_persister = None
+
         self._http_last_minute_requests = windowedsum.WindowedSum()
         self._http_request_logger = None
 
@@ -231,6 +268,7 @@ class Server:
     def on_binary_client_authed(self, conn):
         self._binary_conns.add(conn)
         self._report_connections(event='opened')
+        metrics.client_connections_total.inc()
 
     def on_binary_client_disconnected(self, conn):
         self._binary_conns.discard(conn)
@@ -246,6 +284,7 @@ class Server:
                 self._auto_shutdown_after, shutdown)
 
     def _report_connections(self, *, event: str) -> None:
+        metrics.client_connections_current.set(len(self._binary_conns))
         log_metrics.info(
             "%s a connection; open_count=%d",
             event,
@@ -270,7 +309,8 @@ class Server:
 
             await self._load_instance_data()
 
-            global_schema = await self.introspect_global_schema()
+            global_schema_json = await self._fetch_global_schema_json()
+            global_schema = self._parse_global_schema(global_schema_json)
             sys_config = await self.load_sys_config()
 
             self._dbindex = dbview.DatabaseIndex(
@@ -278,6 +318,8 @@ class Server:
                 std_schema=self._std_schema,
                 global_schema=global_schema,
                 sys_config=sys_config,
+                global_schema_fingerprint=hashlib.sha1(
+                    global_schema_json).digest(),
             )
 
             self._fetch_roles()
@@ -307,6 +349,16 @@ class Server:
                 self._request_stats_logger()
             )
 
+            if self._persistent_query_cache is not None:
+                self._query_cache_persister = asyncio.create_task(
+                    self._query_cache_persister_loop()
+                )
+
+            if self._db_idle_eviction_timeout:
+                self._db_evictor = asyncio.create_task(
+                    self._db_evictor_loop()
+                )
+
         finally:
             self._initing = False
 
@@ -319,6 +371,8 @@ class Server:
             std_schema=self._std_schema,
             refl_schema=self._refl_schema,
             schema_class_layout=self._schema_class_layout,
+            schema_delta_sync=self._compiler_pool_delta_sync,
+            max_dbs_per_worker=self._compiler_pool_max_dbs,
         )
 
     async def _destroy_compiler_pool(self):
@@ -345,11 +399,56 @@ class Server:
         assert self._dbindex is not None
         return self._dbindex.maybe_get_db(dbname)
 
+    async def ensure_db_introspected(self, dbname: str) -> None:
+        """Introspect a lazily loaded database, if it is not yet loaded.
+
+        Concurrent calls for the same database wait on the same
+        introspection.  Unknown databases are ignored; looking them
+        up in the index raises the appropriate error.
+        """
+        assert self._dbindex is not None
+
+        while self._dbindex.has_db(dbname):
+            # The callers create their database views right after
+            # this returns, so there is no chance for the database
+            # to be evicted in between.
+            self._db_last_used[dbname] = time.monotonic()
+            if self._dbindex.is_db_loaded(dbname):
+                return
+
+            task = self._db_introspections.get(dbname)
+            if task is None:
+                task = self._loop.create_task(
+                    self._introspect_unloaded_db(dbname))
+                self._db_introspections[dbname] = task
+                metrics.db_introspections_total.inc()
+                task.add_done_callback(
+                    lambda _: self._db_introspections.pop(dbname, None))
+
+            # Don't let a cancelled connection attempt cancel
+            # the introspection other connections are waiting for.
+            db = await asyncio.shield(task)
+            if db is None:
+                # The database was dropped concurrently.
+                return
+            # Otherwise check again, as the database might have been
+            # evicted before we got here.
+
+    async def _introspect_unloaded_db(self, dbname):
+        # Serialized with the schema refreshes triggered by remote
+        # DDL, which would otherwise race to register the database.
+        async with self._get_schema_refresh_lock(dbname):
+            db = self._dbindex.maybe_get_db(dbname)
+            if db is not None:
+                return db
+            return await self.introspect_db(dbname, skip_dropped=True)
+
     def new_dbview(self, *, dbname, user, query_cache):
         return self._dbindex.new_view(
             dbname, user=user, query_cache=query_cache)
 
     def remove_dbview(self, dbview):
+        self._db_last_used[dbview.dbname] = time.monotonic()
         return self._dbindex.remove_view(dbview)
 
     def get_global_schema(self):
@@ -358,14 +457,17 @@ class Server:
     def get_compilation_system_config(self):
         return self._dbindex.get_compilation_system_config()
 
-    async def acquire_pgcon(self, dbname):
+    async def acquire_pgcon(self, dbname, *, affinity=None):
         if self._pg_unavailable_msg is not None:
             raise errors.BackendUnavailableError(
                 'Postgres is not available: ' + self._pg_unavailable_msg
             )
 
         for _ in range(self._pg_pool.max_capacity + 1):
-            conn = await self._pg_pool.acquire(dbname)
+            started_at = time.monotonic()
+            conn = await self._pg_pool.acquire(dbname, affinity=affinity)
+            metrics.backend_acquire_wait.observe(
+                time.monotonic() - started_at, dbname)
             if conn.is_healthy():
                 return conn
             else:
@@ -379,11 +481,15 @@ class Server:
                 'please try again.'
             )
 
+    def get_backend_pool_capacity(self) -> int:
+        return self._pg_pool.max_capacity
+
     def release_pgcon(self, dbname, conn, *, discard=False):
         if not conn.is_healthy():
             logger.warning('Released an unhealthy pgcon; discard now.')
             discard = True
-        self._pg_pool.release(dbname, conn, discard=discard)
+        self._pg_pool.release(
+            dbname, conn, discard=discard, affinity=conn.last_state)
 
     async def load_sys_config(self):
         syscon = await self._acquire_sys_pgcon()
@@ -402,21 +508,26 @@ class Server:
         return config.from_json(config.get_settings(), sys_config_json)
 
     async def introspect_global_schema(self, conn=None):
+        json_data = await self._fetch_global_schema_json(conn)
+        return self._parse_global_schema(json_data)
+
+    async def _fetch_global_schema_json(self, conn=None):
         if conn is not None:
-            json_data = await conn.parse_execute_json(
+            return await conn.parse_execute_json(
                 self._global_intro_query, b'__global_intro_db',
                 dbver=0, use_prep_stmt=True, args=(),
             )
         else:
             syscon = await self._acquire_sys_pgcon()
             try:
-                json_data = await syscon.parse_execute_json(
+                return await syscon.parse_execute_json(
                     self._global_intro_query, b'__global_intro_db',
                     dbver=0, use_prep_stmt=True, args=(),
                 )
             finally:
                 self._release_sys_pgcon()
 
+    def _parse_global_schema(self, json_data):
         return s_refl.parse_into(
             base_schema=self._std_schema,
             schema=s_schema.FlatSchema(),
@@ -431,16 +542,24 @@ class Server:
                 "ignoring."
             )
             return
-        new_global_schema = await self.introspect_global_schema()
-        self._dbindex.update_global_schema(new_global_schema)
+        json_data = await self._fetch_global_schema_json()
+        self._dbindex.update_global_schema(
+            self._parse_global_schema(json_data),
+            hashlib.sha1(json_data).digest(),
+        )
         self._fetch_roles()
 
     async def introspect_user_schema(self, conn):
-        json_data = await conn.parse_execute_json(
+        json_data = await self._fetch_user_schema_json(conn)
+        return self._parse_user_schema(json_data)
+
+    async def _fetch_user_schema_json(self, conn):
+        return await conn.parse_execute_json(
             self._local_intro_query, b'__local_intro_db',
             dbver=0, use_prep_stmt=True, args=(),
         )
 
+    def _parse_user_schema(self, json_data):
         base_schema = s_schema.ChainedSchema(
             self._std_schema,
             s_schema.FlatSchema(),
@@ -468,68 +587,180 @@ class Server:
                     "Detected concurrently-dropped database %s; skipping.",
                     dbname,
                 )
-                return
+                return None
             else:
                 raise
 
         try:
-            user_schema = await self.introspect_user_schema(conn)
-
-            reflection_cache_json = await conn.parse_execute_json(
-                b'''
-                    SELECT json_agg(o.c)
-                    FROM (
-                        SELECT
-                            json_build_object(
-                                'eql_hash', t.eql_hash,
-                                'argnames', array_to_json(t.argnames)
-                            ) AS c
-                        FROM
-                            ROWS FROM(edgedb._get_cached_reflection())
-                                AS t(eql_hash text, argnames text[])
-                    ) AS o;
-                ''',
-                b'__reflection_cache',
-                dbver=0,
-                use_prep_stmt=True,
-                args=(),
-            )
-
-            reflection_cache = immutables.Map({
-                r['eql_hash']: tuple(r['argnames'])
-                for r in json.loads(reflection_cache_json)
-            })
-
-            backend_ids_json = await conn.parse_execute_json(
-                b'''
-                SELECT
-                    json_object_agg(
-                        "id"::text,
-                        "backend_id"
-                    )::text
-                FROM
-                    edgedb."_SchemaType"
-                ''',
-                b'__backend_ids_fetch',
-                dbver=0,
-                use_prep_stmt=True,
-                args=(),
-            )
-            backend_ids = json.loads(backend_ids_json)
+            user_schema_json = await self._fetch_user_schema_json(conn)
+            user_schema = self._parse_user_schema(user_schema_json)
 
+            reflection_cache = await self._fetch_reflection_cache(conn)
+            backend_ids = await self._fetch_backend_ids(conn)
             db_config = await self.introspect_db_config(conn)
 
-            self._dbindex.register_db(
+            schema_fingerprint = self._compute_schema_fingerprint(
+                user_schema_json, db_config)
+
+            db = self._dbindex.register_db(
                 dbname,
                 user_schema=user_schema,
                 db_config=db_config,
                 reflection_cache=reflection_cache,
                 backend_ids=backend_ids,
+                schema_fingerprint=schema_fingerprint,
                 refresh=refresh,
             )
+            self._schema_delta_bases[dbname] = user_schema
         finally:
             self.release_pgcon(dbname, conn)
 
+        if (
+            self._persistent_query_cache is not None
+            and schema_fingerprint is not None
+        ):
+            entries = await self._loop.run_in_executor(
+                None,
+                self._persistent_query_cache.load,
+                dbname,
+                schema_fingerprint,
+            )
+            db.warm_compiled_queries(entries)
+            self._persisted_query_caches[dbname] = (
+                db.dbver, db.compiled_queries_gen)
+
+        return db
+
+    async def _fetch_reflection_cache(self, conn):
+        reflection_cache_json = await conn.parse_execute_json(
+            b'''
+                SELECT json_agg(o.c)
+                FROM (
+                    SELECT
+                        json_build_object(
+                            'eql_hash', t.eql_hash,
+                            'argnames', array_to_json(t.argnames)
+                        ) AS c
+                    FROM
+                        ROWS FROM(edgedb._get_cached_reflection())
+                            AS t(eql_hash text, argnames text[])
+                ) AS o;
+            ''',
+            b'__reflection_cache',
+            dbver=0,
+            use_prep_stmt=True,
+            args=(),
+        )
+
+        return immutables.Map({
+            r['eql_hash']: tuple(r['argnames'])
+            for r in json.loads(reflection_cache_json)
+        })
+
+    async def _fetch_backend_ids(self, conn):
+        backend_ids_json = await conn.parse_execute_json(
+            b'''
+            SELECT
+                json_object_agg(
+                    "id"::text,
+                    "backend_id"
+                )::text
+            FROM
+                edgedb."_SchemaType"
+            ''',
+            b'__backend_ids_fetch',
+            dbver=0,
+            use_prep_stmt=True,
+            args=(),
+        )
+        return json.loads(backend_ids_json)
+
+    def _compute_schema_fingerprint(self, user_schema_json, db_config):
+        # The fingerprint is computed from the persisted schema
+        # representation, so it is stable across server restarts.
+        global_fingerprint = self._dbindex.get_global_schema_fingerprint()
+        if global_fingerprint is None:
+            # The global schema was changed by local DDL and is not
+            # known to match its persisted representation.
+            return None
+        h = hashlib.sha1(user_schema_json)
+        h.update(global_fingerprint)
+        comp_config = config.get_compilation_config(db_config)
+        h.update(repr(sorted(comp_config.items())).encode())
+        comp_sys_config = self._dbindex.get_compilation_system_config()
+        h.update(repr(sorted(comp_sys_config.items())).encode())
+        return h.digest()
+
+    async def _persist_query_caches(self):
+        for db in list(self._dbindex.iter_dbs()):
+            await self._persist_query_cache(db)
+
+    async def _persist_query_cache(self, db):
+        if db.schema_fingerprint is None:
+            # The schema was changed by local DDL and we can't
+            # compute a stable fingerprint for it until it is
+            # introspected again.
+            return
+
+        state = (db.dbver, db.compiled_queries_gen)
+        if self._persisted_query_caches.get(db.name) == state:
+            return
+
+        try:
+            await self._loop.run_in_executor(
+                None,
+                self._persistent_query_cache.save,
+                db.name,
+                db.schema_fingerprint,
+                db.get_compiled_queries(),
+            )
+        except Exception:
+            logger.exception(
+                'could not persist the query cache of database %r',
+                db.name)
+        else:
+            self._persisted_query_caches[db.name] = state
+
+    async def _query_cache_persister_loop(self):
+        while True:
+            await asyncio.sleep(defines.QUERY_CACHE_PERSIST_INTERVAL)
+            await self._persist_query_caches()
+
+    async def _db_evictor_loop(self):
+        timeout = self._db_idle_eviction_timeout
+        while True:
+            await asyncio.sleep(min(timeout, 60))
+            await self._evict_idle_dbs(timeout)
+
+    async def _evict_idle_dbs(self, timeout):
+        now = time.monotonic()
+        for db in list(self._dbindex.iter_dbs()):
+            dbname = db.name
+            if now - self._db_last_used.get(dbname, 0) < timeout:
+                continue
+
+            if self._persistent_query_cache is not None:
+                await self._persist_query_cache(db)
+
+            # Re-check, as the database might have been used
+            # or dropped while its query cache was being saved.
+            now = time.monotonic()
+            refresh_lock = self._schema_refresh_locks.get(dbname)
+            if (
+                self._dbindex.maybe_get_db(dbname) is not db
+                or self._dbindex.count_connections(dbname)
+                or now - self._db_last_used.get(dbname, 0) < timeout
+                or dbname in self._db_introspections
+                or (refresh_lock is not None and refresh_lock.locked())
+            ):
+                continue
+
+            self._dbindex.unload_db(dbname)
+            self._db_last_used.pop(dbname, None)
+            self._schema_delta_bases.pop(dbname, None)
+            metrics.db_evictions_total.inc()
+            logger.info('Unloaded the schema of idle database %r', dbname)
+
     async def introspect_db_config(self, conn):
         query = self.get_sys_query('dbconfig')
         result = await conn.parse_execute_json(
@@ -553,6 +784,11 @@ class Server:
         finally:
             self._release_sys_pgcon()
 
+        if self._lazy_db_introspection:
+            for dbname in dbnames:
+                self._dbindex.register_unloaded_db(dbname)
+            return
+
         async with taskgroup.TaskGroup(name='introspect DBs') as g:
             for dbname in dbnames:
                 g.create_task(self.introspect_db(dbname, skip_dropped=True))
@@ -737,6 +973,13 @@ class Server:
     def _on_after_drop_db(self, dbname: str):
         assert self._dbindex is not None
         self._dbindex.unregister_db(dbname)
+        self._db_last_used.pop(dbname, None)
+        self._schema_delta_bases.pop(dbname, None)
+        self._schema_refresh_locks.pop(dbname, None)
+        metrics.remove_database(dbname)
+        if self._persistent_query_cache is not None:
+            self._persistent_query_cache.drop(dbname)
+            self._persisted_query_caches.pop(dbname, None)
 
     async def _on_system_config_add(self, setting_name, value):
         # CONFIGURE INSTANCE INSERT ConfigObject;
@@ -858,12 +1101,199 @@ class Server:
         finally:
             self._release_sys_pgcon()
 
+    @staticmethod
+    def _get_schema_version(schema):
+        ver = schema.get_global(
+            s_ver.SchemaVersion, '__schema_version__', None)
+        if ver is None:
+            return None
+        return ver.get_version(schema)
+
+    async def _publish_schema_change(self, dbname):
+        if not self._initing and not self._serving:
+            return
+
+        db = self._dbindex.maybe_get_db(dbname)
+        base_schema = self._schema_delta_bases.get(dbname)
+        if db is not None and base_schema is not None:
+            new_schema = db.user_schema
+            self._schema_delta_bases[dbname] = new_schema
+            try:
+                await self._log_schema_delta(dbname, base_schema, new_schema)
+            except Exception:
+                # Other servers will notice the gap in the log and
+                # re-introspect the schema.
+                logger.exception(
+                    'could not publish the schema delta of database %r',
+                    dbname)
+
+        await self._signal_sysevent('schema-changes', dbname=dbname)
+
+    async def _log_schema_delta(self, dbname, base_schema, new_schema):
+        base_version = self._get_schema_version(base_schema)
+        version = self._get_schema_version(new_schema)
+        if base_version is None or version is None or base_version == version:
+            return
+
+        delta = base_schema.get_delta(new_schema)
+        data = pickle.dumps(delta, protocol=pickle.HIGHEST_PROTOCOL)
+
+        conn = await self.acquire_pgcon(dbname)
+        try:
+            await conn.simple_query(
+                f'''
+                    INSERT INTO edgedb._schema_delta_log
+                        (base_version, version, delta)
+                    VALUES (
+                        {pg_common.quote_literal(str(base_version))},
+                        {pg_common.quote_literal(str(version))},
+                        {pg_common.quote_bytea_literal(data)}
+                    );
+                    DELETE FROM edgedb._schema_delta_log
+                    WHERE id <= (
+                        SELECT max(id) FROM edgedb._schema_delta_log
+                    ) - {defines.SCHEMA_DELTA_LOG_SIZE};
+                '''.encode(),
+                ignore_data=True,
+            )
+        finally:
+            self.release_pgcon(dbname, conn)
+
+    def _get_schema_refresh_lock(self, dbname):
+        lock = self._schema_refresh_locks.get(dbname)
+        if lock is None:
+            lock = self._schema_refresh_locks[dbname] = asyncio.Lock()
+        return lock
+
+    async def _refresh_db_schema(self, dbname):
+        async with self._get_schema_refresh_lock(dbname):
+            if (
+                self._lazy_db_introspection
+                and not self._dbindex.is_db_loaded(dbname)
+            ):
+                # The database was evicted, or its lazy introspection
+                # failed; the next connection will introspect the
+                # current schema.
+                return
+
+            try:
+                refreshed = await self._apply_remote_schema_deltas(dbname)
+            except Exception:
+                logger.exception(
+                    'could not apply remote schema deltas to database %r',
+                    dbname)
+                refreshed = False
+
+            if not refreshed:
+                await self.introspect_db(dbname, refresh=True)
+
+    async def _apply_remote_schema_deltas(self, dbname):
+        # Returns False if the schema could not be brought up to date
+        # from the schema delta log.
+        db = self._dbindex.maybe_get_db(dbname)
+        if db is None:
+            return False
+
+        user_schema = db.user_schema
+        version = self._get_schema_version(user_schema)
+        if version is None:
+            return False
+
+        conn = await self.acquire_pgcon(dbname)
+        try:
+            rows = await conn.simple_query(
+                b'''
+                    SELECT version::text FROM edgedb."_SchemaSchemaVersion";
+                ''',
+                ignore_data=False,
+            )
+            target_version = uuid.UUID(rows[0][0].decode())
+            if target_version == version:
+                return True
+
+            rows = await conn.simple_query(
+                b'''
+                    SELECT base_version::text, version::text
+                    FROM edgedb._schema_delta_log;
+                ''',
+                ignore_data=False,
+            )
+            links = {
+                uuid.UUID(base.decode()): uuid.UUID(ver.decode())
+                for base, ver in rows
+            }
+
+            chain = []
+            while version != target_version:
+                version = links.get(version)
+                if version is None or len(chain) == len(links):
+                    # A gap in the log, or the log has been trimmed
+                    # past our schema version.
+                    return False
+                chain.append(version)
+
+            versions = ', '.join(
+                pg_common.quote_literal(str(v)) for v in chain)
+            rows = await conn.simple_query(
+                f'''
+                    SELECT version::text, delta
+                    FROM edgedb._schema_delta_log
+                    WHERE version IN ({versions});
+                '''.encode(),
+                ignore_data=False,
+            )
+            deltas = {
+                uuid.UUID(ver.decode()): delta for ver, delta in rows
+            }
+
+            for version in chain:
+                data = deltas.get(version)
+                if data is None:
+                    return False
+                # bytea is returned in the hex format: \x0a0b...
+                delta = pickle.loads(bytes.fromhex(data[2:].decode()))
+                user_schema = user_schema.apply_delta(delta, rebase=True)
+                if self._get_schema_version(user_schema) != version:
+                    return False
+
+            reflection_cache = await self._fetch_reflection_cache(conn)
+            backend_ids = await self._fetch_backend_ids(conn)
+        finally:
+            self.release_pgcon(dbname, conn)
+
+        if self._dbindex.maybe_get_db(dbname) is not db:
+            # The database was dropped or unloaded in the meantime.
+            return True
+
+        self._dbindex.register_db(
+            dbname,
+            user_schema=user_schema,
+            db_config=db.db_config,
+            reflection_cache=reflection_cache,
+            backend_ids=backend_ids,
+            refresh=True,
+        )
+        self._schema_delta_bases[dbname] = user_schema
+        logger.debug(
+            'Applied %d remote schema delta(s) to database %r',
+            len(chain), dbname)
+        return True
+
     def _on_remote_ddl(self, dbname):
         # Triggered by a postgres notification event 'schema-changes'
         # on the __edgedb_sysevent__ channel
-        self._loop.create_task(
-            self.introspect_db(dbname, refresh=True)
-        )
+        if (
+            self._lazy_db_introspection
+            and not self._dbindex.is_db_loaded(dbname)
+            and dbname not in self._db_introspections
+        ):
+            # The schema will be introspected on the first connection.
+            self._dbindex.register_unloaded_db(dbname)
+            return
+        # If a lazy introspection of the database is in progress, the
+        # refresh waits for it to finish, as it might have read the
+        # schema from before the change.
+        self._loop.create_task(self._refresh_db_schema(dbname))
 
     def _on_remote_database_config_change(self, dbname):
         # Triggered by a postgres notification event 'database-config-changes'
@@ -1149,6 +1579,15 @@ class Server:
             if self._http_request_logger is not None:
                 self._http_request_logger.cancel()
 
+            if self._db_evictor is not None:
+                self._db_evictor.cancel()
+                self._db_evictor = None
+
+            if self._query_cache_persister is not None:
+                self._query_cache_persister.cancel()
+                self._query_cache_persister = None
+                await self._persist_query_caches()
+
             await self._stop_servers(self._servers.values())
             self._servers = {}
 
@@ -138,7 +138,8 @@ class EdgeQLTestCase(BaseHttpExtensionTest, server.QueryTestCase):
     def get_extension_path(cls):
         return 'edgeql'
 
-    def edgeql_query(self, query, *, use_http_post=True, variables=None):
+    def edgeql_query(self, query, *, use_http_post=True, variables=None,
+                     stream=False):
         req_data = {
             'query': query
         }
@@ -146,6 +147,8 @@ class EdgeQLTestCase(BaseHttpExtensionTest, server.QueryTestCase):
         if use_http_post:
             if variables is not None:
                 req_data['variables'] = variables
+            if stream:
+                req_data['stream'] = True
             req = urllib.request.Request(self.http_addr, method='POST')
             req.add_header('Content-Type', 'application/json')
             response = urllib.request.urlopen(
@@ -155,6 +158,8 @@ class EdgeQLTestCase(BaseHttpExtensionTest, server.QueryTestCase):
         else:
             if variables is not None:
                 req_data['variables'] = json.dumps(variables)
+            if stream:
+                req_data['stream'] = 'true'
             response = urllib.request.urlopen(
                 f'{self.http_addr}/?{urllib.parse.urlencode(req_data)}',
                 context=self.tls_context,
@@ -171,14 +176,29 @@ class EdgeQLTestCase(BaseHttpExtensionTest, server.QueryTestCase):
 
         raise edgedb.EdgeDBError._from_code(ex_code, ex_msg)
 
+    def edgeql_batch(self, queries, *, same_snapshot=None):
+        if same_snapshot is None:
+            req_data = queries
+        else:
+            req_data = {'queries': queries, 'same_snapshot': same_snapshot}
+
+        req = urllib.request.Request(self.http_addr, method='POST')
+        req.add_header('Content-Type', 'application/json')
+        response = urllib.request.urlopen(
+            req, json.dumps(req_data).encode(), context=self.tls_context
+        )
+        return json.loads(response.read())
+
     def assert_edgeql_query_result(self, query, result, *,
                                    msg=None, sort=None,
                                    use_http_post=True,
-                                   variables=None):
+                                   variables=None,
+                                   stream=False):
         res = self.edgeql_query(
             query,
             use_http_post=use_http_post,
-            variables=variables)
+            variables=variables,
+            stream=stream)
 
         if sort is not None:
             # GQL will always have a single object returned. The data is
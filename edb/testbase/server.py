@@ -1437,6 +1437,9 @@ class _EdgeDBServer:
         tenant_id: Optional[str] = None,
         allow_insecure_binary_clients: bool = False,
         allow_insecure_http_clients: bool = False,
+        query_cache_dir: Optional[str] = None,
+        lazy_db_introspection: bool = False,
+        db_idle_eviction_timeout: Optional[int] = None,
     ) -> None:
         self.auto_shutdown = auto_shutdown
         self.bootstrap_command = bootstrap_command
@@ -1452,6 +1455,9 @@ class _EdgeDBServer:
         self.data = None
         self.allow_insecure_binary_clients = allow_insecure_binary_clients
         self.allow_insecure_http_clients = allow_insecure_http_clients
+        self.query_cache_dir = query_cache_dir
+        self.lazy_db_introspection = lazy_db_introspection
+        self.db_idle_eviction_timeout = db_idle_eviction_timeout
 
     async def wait_for_server_readiness(self, stream: asyncio.StreamReader):
         while True:
@@ -1570,6 +1576,18 @@ class _EdgeDBServer:
         if self.allow_insecure_http_clients:
             cmd += ['--allow-insecure-http-clients']
 
+        if self.query_cache_dir:
+            cmd += ['--query-cache-dir', self.query_cache_dir]
+
+        if self.lazy_db_introspection:
+            cmd += ['--lazy-db-introspection']
+
+        if self.db_idle_eviction_timeout is not None:
+            cmd += [
+                '--db-idle-eviction-timeout',
+                str(self.db_idle_eviction_timeout),
+            ]
+
         if self.debug:
             print(f'Starting EdgeDB cluster with the following params: {cmd}')
 
@@ -1622,6 +1640,9 @@ def start_edgedb_server(
     tenant_id: Optional[str] = None,
     allow_insecure_binary_clients: bool = False,
     allow_insecure_http_clients: bool = False,
+    query_cache_dir: Optional[str] = None,
+    lazy_db_introspection: bool = False,
+    db_idle_eviction_timeout: Optional[int] = None,
 ):
     if not devmode.is_in_dev_mode() and not runstate_dir:
         if postgres_dsn or adjacent_to:
@@ -1643,6 +1664,9 @@ def start_edgedb_server(
         reset_auth=reset_auth,
         allow_insecure_binary_clients=allow_insecure_binary_clients,
         allow_insecure_http_clients=allow_insecure_http_clients,
+        query_cache_dir=query_cache_dir,
+        lazy_db_introspection=lazy_db_introspection,
+        db_idle_eviction_timeout=db_idle_eviction_timeout,
     )
 
 
@@ -0,0 +1,177 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2021-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Benchmark the compiler pool IPC.
+
+An echo worker is spawned and connected to an in-process hub, the
+same way compiler workers are, and the round-trip latency of payloads
+of different sizes is measured with the payload passed through the
+socket and through shared memory.
+"""
+
+
+from __future__ import annotations
+from typing import *
+
+import asyncio
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+from edb.server.compiler_pool import amsg
+from edb.server.compiler_pool import pool
+from edb.tools.edb import edbcommands
+
+
+DEFAULT_SIZES = (
+    1024,
+    64 * 1024,
+    1024 * 1024,
+    16 * 1024 * 1024,
+    64 * 1024 * 1024,
+)
+
+# SHM_THRESHOLD of the hub and of the worker for every transport.
+TRANSPORTS = {
+    'socket': sys.maxsize,
+    'shm': 0,
+}
+
+
+def echo_worker(sockname: str, shm_threshold: int) -> None:
+    amsg.SHM_THRESHOLD = shm_threshold
+    con = amsg.WorkerConnection(sockname)
+    try:
+        for req_id, parts in con.iter_request():
+            con.reply(req_id, parts)
+    finally:
+        con.abort()
+
+
+class _ServerProtocol(amsg.ServerProtocol):
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.connected: asyncio.Future[int] = loop.create_future()
+
+    def worker_connected(self, pid: int) -> None:
+        if not self.connected.done():
+            self.connected.set_result(pid)
+
+
+def _stats(values: List[float], size: int) -> Dict[str, float]:
+    ordered = sorted(values)
+    mean = sum(ordered) / len(ordered)
+    return {
+        'p50': ordered[len(ordered) // 2],
+        'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        'mean': mean,
+        # Both directions.
+        'throughput_mb_s': 2 * size / mean / 1e6,
+    }
+
+
+async def _bench_transport(
+    sizes: Sequence[int],
+    iterations: int,
+    shm_threshold: int,
+) -> Dict[str, Dict[str, float]]:
+    loop = asyncio.get_running_loop()
+    proto = _ServerProtocol(loop)
+
+    with tempfile.TemporaryDirectory() as td:
+        sockname = os.path.join(td, 'bench.sock')
+        server = amsg.Server(sockname, loop, proto)
+        await server.start()
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, '-c',
+            f'from edb.tools import bench_amsg; '
+            f'bench_amsg.echo_worker({sockname!r}, {shm_threshold})',
+            env=pool._ENV,
+            stdin=subprocess.DEVNULL,
+        )
+        saved_threshold = amsg.SHM_THRESHOLD
+        amsg.SHM_THRESHOLD = shm_threshold
+        try:
+            pid = await asyncio.wait_for(proto.connected, 30)
+            con = server.get_by_pid(pid)
+
+            results = {}
+            for size in sizes:
+                blob = os.urandom(size)
+                msg = amsg.dumps(pickle.PickleBuffer(blob))
+                # Warm up.
+                await con.request(msg)
+
+                timings = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    resp = await con.request(msg)
+                    timings.append(time.perf_counter() - started)
+                    assert len(resp[1]) == size
+
+                results[str(size)] = _stats(timings, size)
+            return results
+        finally:
+            amsg.SHM_THRESHOLD = saved_threshold
+            await server.stop()
+            await proc.wait()
+
+
+async def _bench(
+    sizes: Sequence[int],
+    iterations: int,
+) -> Dict[str, Any]:
+    report = {}
+    for transport, shm_threshold in TRANSPORTS.items():
+        report[transport] = await _bench_transport(
+            sizes, iterations, shm_threshold)
+    return report
+
+
+@edbcommands.command('bench-amsg')
+@click.option(
+    '-s', '--size',
+    'sizes',
+    type=int,
+    multiple=True,
+    help='payload size in bytes, can be repeated '
+         '(default: 1KiB, 64KiB, 1MiB, 16MiB and 64MiB)',
+)
+@click.option(
+    '-n', '--iterations',
+    type=int,
+    default=20,
+    show_default=True,
+    help='number of round-trips for every payload size',
+)
+def bench_amsg(*, sizes: Tuple[int, ...], iterations: int) -> None:
+    """Benchmark the compiler pool IPC round-trip latency.
+
+    Reports p50/p99/mean round-trip latency (in seconds) and throughput
+    for every payload size, with the payload sent through the socket
+    and through shared memory.
+    """
+    report = asyncio.run(_bench(sizes or DEFAULT_SIZES, iterations))
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,396 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2021-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Benchmark the stages of the EdgeQL query compiler.
+
+The corpus is the set of queries that the test suite runs against
+the benchmarked schema, e.g. all queries of the test cases declaring
+``SCHEMA = ... 'cards.esdl'``.  Each query is passed through every
+compiler stage in-process, the per-stage latency percentiles and
+allocation peaks are reported as JSON, and can be compared against
+a previously saved report.
+"""
+
+
+from __future__ import annotations
+from typing import *
+
+import ast
+import json
+import math
+import pathlib
+import sys
+import time
+import tracemalloc
+
+import click
+
+from edb import edgeql
+from edb.edgeql import ast as qlast
+from edb.edgeql import codegen as qlcodegen
+from edb.edgeql import compiler as qlcompiler
+from edb.edgeql import parser as qlparser
+from edb.pgsql import codegen as pgcodegen
+from edb.pgsql import compiler as pg_compiler
+from edb.testbase import lang as tb
+from edb.tools.edb import edbcommands
+
+if TYPE_CHECKING:
+    from edb.schema import schema as s_schema
+
+
+TESTS_DIR = pathlib.Path(__file__).parent.parent.parent.resolve() / 'tests'
+
+STAGES = ('normalize', 'parse', 'ir', 'sql', 'codegen')
+
+# Methods of test cases whose first argument is an EdgeQL query.
+QUERY_METHODS = frozenset({
+    'assert_query_result',
+    'query',
+    'query_json',
+    'query_single',
+    'query_required_single',
+})
+
+
+def extract_corpus(tests_dir: pathlib.Path, schema_file: str) -> List[str]:
+    """Collect the queries of the test cases using *schema_file*."""
+    queries: Dict[str, None] = {}
+    for path in sorted(tests_dir.glob('test_*.py')):
+        tree = ast.parse(path.read_text(), str(path))
+        for cls in ast.walk(tree):
+            if not isinstance(cls, ast.ClassDef):
+                continue
+            schemas = [
+                stmt for stmt in cls.body
+                if isinstance(stmt, ast.Assign)
+                and any(
+                    isinstance(t, ast.Name) and t.id.startswith('SCHEMA')
+                    for t in stmt.targets
+                )
+            ]
+            # Only consider cases that use nothing but the benchmarked
+            # schema as their default module.
+            if (
+                len(schemas) != 1
+                or repr(schema_file) not in ast.unparse(schemas[0].value)
+            ):
+                continue
+            for node in ast.walk(cls):
+                if (
+                    isinstance(node, ast.Call)
+                    and isinstance(node.func, ast.Attribute)
+                    and node.func.attr in QUERY_METHODS
+                    and node.args
+                    and isinstance(node.args[0], ast.Constant)
+                    and isinstance(node.args[0].value, str)
+                ):
+                    queries[node.args[0].value.strip()] = None
+    return list(queries)
+
+
+def load_corpus_file(path: pathlib.Path) -> List[str]:
+    return [
+        qlcodegen.generate_source(stmt)
+        for stmt in qlparser.parse_block(path.read_text())
+    ]
+
+
+def load_schema(path: pathlib.Path) -> s_schema.Schema:
+    return tb.BaseSchemaTest.load_schema(path.read_text(), 'default')
+
+
+class Pipeline:
+    """Runs a query through the compiler stages, one at a time."""
+
+    def __init__(self, schema: s_schema.Schema, *, ref_cache: bool) -> None:
+        self._schema = schema
+        self._ref_cache = (
+            qlcompiler.new_schema_ref_cache(schema) if ref_cache else None
+        )
+
+    def run(
+        self,
+        text: str,
+        measure: Callable[[str, Callable[[], Any]], Any],
+    ) -> None:
+        source = measure(
+            'normalize',
+            lambda: edgeql.NormalizedSource.from_string(text),
+        )
+        stmts = measure('parse', lambda: qlparser.parse_block(source))
+        if len(stmts) != 1 or not isinstance(stmts[0], qlast.Query):
+            raise ValueError('not a single query')
+
+        options = qlcompiler.CompilerOptions(
+            modaliases={None: 'default'},
+            schema_ref_cache=self._ref_cache,
+        )
+        try:
+            ir = measure(
+                'ir',
+                lambda: qlcompiler.compile_ast_to_ir(
+                    stmts[0], self._schema, options=options),
+            )
+            qtree = measure(
+                'sql',
+                lambda: pg_compiler.compile_ir_to_sql_tree(
+                    ir, output_format=pg_compiler.OutputFormat.NATIVE),
+            )
+        finally:
+            if self._ref_cache is not None:
+                self._ref_cache.release()
+        measure(
+            'codegen',
+            lambda: pgcodegen.SQLSourceGenerator.to_source(
+                qtree, pretty=False),
+        )
+
+
+def _percentile(values: Sequence[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def _timing_stats(values: Sequence[float]) -> Dict[str, Any]:
+    return {
+        'p50': _percentile(values, 50),
+        'p99': _percentile(values, 99),
+        'mean': sum(values) / len(values),
+    }
+
+
+def run_benchmark(
+    pipeline: Pipeline,
+    corpus: List[str],
+    *,
+    iterations: int,
+    measure_allocs: bool,
+) -> Tuple[Dict[str, Any], List[str]]:
+    skipped = []
+    queries = []
+    # The first run warms up the compiler and weeds out the queries
+    # that cannot be compiled against the schema alone.
+    for text in corpus:
+        try:
+            pipeline.run(text, lambda stage, fn: fn())
+        except Exception:
+            skipped.append(text)
+        else:
+            queries.append(text)
+
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    allocs: Dict[str, List[int]] = {stage: [] for stage in STAGES}
+
+    def timed(stage: str, fn: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        result = fn()
+        timings[stage].append(time.perf_counter() - started)
+        return result
+
+    def traced(stage: str, fn: Callable[[], Any]) -> Any:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        allocs[stage].append(peak - current)
+        return result
+
+    totals = []
+    for _ in range(iterations):
+        for text in queries:
+            started = time.perf_counter()
+            pipeline.run(text, timed)
+            totals.append(time.perf_counter() - started)
+
+    if measure_allocs:
+        # Tracing slows everything down, so allocations are
+        # measured in a separate pass.
+        tracemalloc.start()
+        try:
+            for text in queries:
+                pipeline.run(text, traced)
+        finally:
+            tracemalloc.stop()
+
+    stages: Dict[str, Any] = {}
+    for stage, values in [*timings.items(), ('total', totals)]:
+        if not values:
+            continue
+        stats = _timing_stats(values)
+        if allocs.get(stage):
+            stats['alloc_peak_bytes_p50'] = _percentile(allocs[stage], 50)
+            stats['alloc_peak_bytes_max'] = max(allocs[stage])
+        stages[stage] = stats
+
+    return stages, skipped
+
+
+def run_ddl_benchmark(
+    path: pathlib.Path,
+    *,
+    iterations: int,
+) -> Dict[str, Any]:
+    """Time loading the schema, which runs its SDL migration as DDL."""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        load_schema(path)
+        timings.append(time.perf_counter() - started)
+    return _timing_stats(timings)
+
+
+def compare(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    *,
+    threshold: float,
+) -> List[str]:
+    """Return the stages that regressed compared to *baseline*."""
+    regressions = []
+    for stage, stats in report['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if base is None:
+            continue
+        for metric in ('p50', 'p99', 'alloc_peak_bytes_p50'):
+            if metric not in stats or not base.get(metric):
+                continue
+            ratio = stats[metric] / base[metric]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f'{stage} {metric}: {base[metric]:.6g} -> '
+                    f'{stats[metric]:.6g} (+{(ratio - 1) * 100:.1f}%)')
+    return regressions
+
+
+@edbcommands.command('bench-compile')
+@click.option(
+    '--schema',
+    type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path),
+    default=str(TESTS_DIR / 'schemas' / 'cards.esdl'),
+    show_default=True,
+    help='schema to compile the queries against',
+)
+@click.option(
+    '--corpus',
+    type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path),
+    help='file with the EdgeQL queries to compile; by default, the '
+         'queries are extracted from the tests using the schema',
+)
+@click.option(
+    '-n', '--iterations',
+    type=int,
+    default=10,
+    show_default=True,
+    help='number of times to compile every query',
+)
+@click.option(
+    '--ddl-iterations',
+    type=int,
+    default=3,
+    show_default=True,
+    help='number of times to load the schema to measure DDL, '
+         '0 to skip',
+)
+@click.option(
+    '--ref-cache/--no-ref-cache',
+    default=True,
+    show_default=True,
+    help='share TypeRefs and PointerRefs between compilations, '
+         'as compiler workers do',
+)
+@click.option(
+    '--allocs/--no-allocs',
+    default=True,
+    show_default=True,
+    help='measure memory allocations of every stage',
+)
+@click.option(
+    '-o', '--output',
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help='save the JSON report to a file instead of printing it',
+)
+@click.option(
+    '--baseline',
+    type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path),
+    help='JSON report to compare against',
+)
+@click.option(
+    '--threshold',
+    type=float,
+    default=0.1,
+    show_default=True,
+    help='relative slowdown over the baseline considered a regression',
+)
+def bench_compile(
+    *,
+    schema: pathlib.Path,
+    corpus: Optional[pathlib.Path],
+    iterations: int,
+    ddl_iterations: int,
+    ref_cache: bool,
+    allocs: bool,
+    output: Optional[pathlib.Path],
+    baseline: Optional[pathlib.Path],
+    threshold: float,
+) -> None:
+    """Benchmark the EdgeQL compiler stages on a corpus of queries.
+
+    Reports p50/p99 latency (in seconds) and peak allocations (in bytes)
+    of normalization, parsing, IR compilation, SQL compilation and
+    SQL codegen, and the latency of loading the schema (ddl).  Exits
+    with status 1 if --baseline is given and any stage regressed by
+    more than --threshold.
+    """
+    if corpus is not None:
+        queries = load_corpus_file(corpus)
+    else:
+        queries = extract_corpus(TESTS_DIR, schema.name)
+    if not queries:
+        raise click.UsageError(f'no queries found for {schema.name}')
+
+    pipeline = Pipeline(load_schema(schema), ref_cache=ref_cache)
+    stages, skipped = run_benchmark(
+        pipeline, queries, iterations=iterations, measure_allocs=allocs)
+    if ddl_iterations > 0:
+        stages['ddl'] = run_ddl_benchmark(schema, iterations=ddl_iterations)
+
+    report = {
+        'schema': schema.name,
+        'iterations': iterations,
+        'ref_cache': ref_cache,
+        'queries': len(queries) - len(skipped),
+        'skipped': len(skipped),
+        'stages': stages,
+    }
+
+    text = json.dumps(report, indent=2)
+    if output is not None:
+        output.write_text(text + '\n')
+    else:
+        print(text)
+
+    if baseline is not None:
+        regressions = compare(
+            report, json.loads(baseline.read_text()), threshold=threshold)
+        for regression in regressions:
+            print(f'REGRESSION: {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
@@ -66,4 +66,6 @@ from . import inittestdb  # noqa
 from . import test  # noqa
 from . import wipe  # noqa
 from . import gen_test_dumps  # noqa
+from . import bench_amsg  # noqa
+from . import bench_compile  # noqa
 from .profiling import cli as prof_cli  # noqa
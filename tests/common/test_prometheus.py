@@ -0,0 +1,141 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2021-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import annotations
+from typing import *  # NoQA
+
+import textwrap
+import unittest
+
+from edb.common import prometheus as prom
+
+
+class PrometheusTests(unittest.TestCase):
+
+    def test_common_prometheus_01(self) -> None:
+        r = prom.Registry(prefix='test')
+
+        c = r.new_counter('events_total', 'Total number of events.')
+        c.inc()
+        c.inc(2)
+
+        lc = r.new_labeled_counter(
+            'hits_total', 'Number of hits.', labels=('database',))
+        lc.inc(1.0, 'main')
+        lc.inc(1.0, 'a"b')
+        lc.inc(2.0, 'main')
+
+        g = r.new_gauge('current', 'Current value.')
+        g.inc(5)
+        g.dec()
+
+        self.assertEqual(c.get_value(), 3.0)
+        self.assertEqual(lc.get_value('main'), 3.0)
+        self.assertEqual(lc.get_value('other'), 0.0)
+        self.assertEqual(g.get_value(), 4.0)
+
+        self.assertEqual(
+            r.generate(),
+            textwrap.dedent('''\
+                # HELP test_events_total Total number of events.
+                # TYPE test_events_total counter
+                test_events_total 3.0
+                # HELP test_hits_total Number of hits.
+                # TYPE test_hits_total counter
+                test_hits_total{database="main"} 3.0
+                test_hits_total{database="a\\"b"} 1.0
+                # HELP test_current Current value.
+                # TYPE test_current gauge
+                test_current 4.0
+            '''),
+        )
+
+        with self.assertRaises(ValueError):
+            c.inc(-1)
+
+        with self.assertRaises(ValueError):
+            lc.inc(1.0, 'main', 'extra')
+
+        with self.assertRaises(ValueError):
+            r.new_gauge('current', 'Duplicate.')
+
+    def test_common_prometheus_02(self) -> None:
+        r = prom.Registry()
+
+        h = r.new_histogram('lat_seconds', 'Latency.', buckets=(0.1, 1.0))
+        h.observe(0.05)
+        h.observe(0.1)
+        h.observe(5.0)
+
+        lh = r.new_labeled_histogram(
+            'wait_seconds', 'Wait time.',
+            labels=('database',), buckets=(0.5,))
+        lh.observe(0.25, 'main')
+
+        self.assertEqual(
+            r.generate(),
+            textwrap.dedent('''\
+                # HELP lat_seconds Latency.
+                # TYPE lat_seconds histogram
+                lat_seconds_bucket{le="0.1"} 2
+                lat_seconds_bucket{le="1.0"} 2
+                lat_seconds_bucket{le="+Inf"} 3
+                lat_seconds_sum 5.15
+                lat_seconds_count 3
+                # HELP wait_seconds Wait time.
+                # TYPE wait_seconds histogram
+                wait_seconds_bucket{database="main",le="0.5"} 1
+                wait_seconds_bucket{database="main",le="+Inf"} 1
+                wait_seconds_sum{database="main"} 0.25
+                wait_seconds_count{database="main"} 1
+            '''),
+        )
+
+    def test_common_prometheus_03(self) -> None:
+        r = prom.Registry()
+
+        lc = r.new_labeled_counter(
+            'hits_total', 'Number of hits.', labels=('database',))
+        lc.inc(1.0, 'main')
+        lc.inc(1.0, 'other')
+
+        lh = r.new_labeled_histogram(
+            'wait_seconds', 'Wait time.',
+            labels=('database',), buckets=(0.5,))
+        lh.observe(0.25, 'main')
+        lh.observe(0.25, 'other')
+
+        lc.remove('other')
+        lh.remove('other')
+        # Removing a missing series is a no-op.
+        lc.remove('missing')
+
+        self.assertEqual(lc.get_value('other'), 0.0)
+        self.assertEqual(
+            r.generate(),
+            textwrap.dedent('''\
+                # HELP hits_total Number of hits.
+                # TYPE hits_total counter
+                hits_total{database="main"} 1.0
+                # HELP wait_seconds Wait time.
+                # TYPE wait_seconds histogram
+                wait_seconds_bucket{database="main",le="0.5"} 1
+                wait_seconds_bucket{database="main",le="+Inf"} 1
+                wait_seconds_sum{database="main"} 0.25
+                wait_seconds_count{database="main"} 1
+            '''),
+        )
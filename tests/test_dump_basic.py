@@ -16,14 +16,32 @@
 # limitations under the License.
 #
 
+import asyncio
 import hashlib
+import io
 import os
 import random
 import tempfile
 
+from edb import protocol
+from edb.common import binwrapper
+from edb.protocol import protocol as edb_protocol  # type: ignore
+from edb.server import defines as edbdef
 from edb.testbase import server as tb
 
 
+DUMP_HEADER_JOBS = 105
+DUMP_HEADER_BLOCK_ID = 110
+
+
+def _message_data(msg):
+    # The contents of a dump message, without its type and length,
+    # as sent back to the server on restore.
+    iobuf = io.BytesIO()
+    type(msg).dump(msg, binwrapper.BinWrapper(iobuf))
+    return iobuf.getvalue()
+
+
 class TestDumpBasics(tb.DatabaseTestCase, tb.CLITestCaseMixin):
     DEFAULT_MODULE = 'test'
 
@@ -115,3 +133,270 @@ class TestDumpBasics(tb.DatabaseTestCase, tb.CLITestCaseMixin):
         finally:
             await con2.aclose()
             await self.con.execute(f'DROP DATABASE {restored_dbname}')
+
+
+class TestDumpProtocol(tb.DatabaseTestCase):
+    DEFAULT_MODULE = 'test'
+
+    TRANSACTION_ISOLATION = False
+
+    # Arrays of tuples need their type ids mended on restore.
+    SETUP = '''
+        CREATE TYPE test::Mended {
+            CREATE REQUIRED PROPERTY idx -> std::int64;
+            CREATE PROPERTY pairs -> array<tuple<std::int64, std::str>>;
+        };
+
+        CREATE TYPE test::EmptyMended {
+            CREATE PROPERTY pairs -> array<tuple<std::int64, std::str>>;
+        };
+
+        CREATE TYPE test::SnapshotRight {
+            CREATE REQUIRED PROPERTY idx -> std::int64;
+        };
+
+        CREATE TYPE test::SnapshotLeft {
+            CREATE REQUIRED PROPERTY idx -> std::int64;
+            CREATE LINK right -> test::SnapshotRight;
+        };
+    '''
+
+    TEARDOWN = '''
+        DROP TYPE test::SnapshotLeft;
+        DROP TYPE test::SnapshotRight;
+        DROP TYPE test::EmptyMended;
+        DROP TYPE test::Mended;
+    '''
+
+    async def _dump(self, connect_args, *, headers=()):
+        con = await edb_protocol.new_connection(**connect_args)
+        try:
+            await con.connect()
+            await con.send(
+                protocol.Dump(headers=list(headers)),
+                protocol.Sync(),
+            )
+            header = await con.recv()
+            self.assertIsInstance(header, protocol.DumpHeader)
+
+            blocks = []
+            while True:
+                msg = await con.recv()
+                if isinstance(msg, protocol.CommandComplete):
+                    break
+                self.assertIsInstance(msg, protocol.DumpBlock)
+                blocks.append(msg)
+
+            await con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=(
+                    protocol.TransactionState.NOT_IN_TRANSACTION),
+            )
+        finally:
+            await con.aclose()
+
+        return header, blocks
+
+    async def _restore(self, dbname, header, blocks, *, jobs):
+        con = await edb_protocol.new_connection(
+            **self.get_connect_args(database=dbname))
+        try:
+            await con.connect()
+            await con.send(
+                protocol.Restore(
+                    headers=[],
+                    jobs=jobs,
+                    header_data=_message_data(header),
+                ),
+            )
+            await con.recv_match(
+                protocol.RestoreReady,
+                jobs=min(jobs, edbdef.RESTORE_MAX_PREFETCH_BLOCKS),
+            )
+
+            for block in blocks:
+                await con.send(
+                    protocol.RestoreBlock(block_data=_message_data(block)),
+                )
+            await con.send(protocol.RestoreEof())
+
+            await con.recv_match(protocol.CommandComplete, status='RESTORE')
+            self.assertEqual(
+                await con.sync(),
+                protocol.TransactionState.NOT_IN_TRANSACTION,
+            )
+        finally:
+            await con.aclose()
+
+    async def _check_dump_restore(self, *, jobs):
+        dbname = self.get_database_name()
+        restored_dbname = f'{dbname}_restored'
+        query = '''
+            SELECT (
+                mended := (
+                    SELECT Mended { idx, pairs } ORDER BY .idx
+                ),
+                empty := count(EmptyMended),
+            )
+        '''
+
+        header, blocks = await self._dump(
+            self.get_connect_args(database=dbname))
+
+        await self.con.execute(f'CREATE DATABASE {restored_dbname}')
+        try:
+            await self._restore(restored_dbname, header, blocks, jobs=jobs)
+
+            con2 = await self.connect(database=restored_dbname)
+            try:
+                self.assertEqual(
+                    await con2.query_json(query),
+                    await self.con.query_json(query),
+                )
+            finally:
+                await con2.aclose()
+        finally:
+            await self.con.execute(f'DROP DATABASE {restored_dbname}')
+
+        return header, blocks
+
+    async def _populate(self, nrows):
+        for idx in range(nrows):
+            await self.con.query('''
+                INSERT Mended {
+                    idx := <int64>$idx,
+                    pairs := [(<int64>$idx, <str>$idx), (-1, 'x')],
+                }
+            ''', idx=idx)
+
+    async def test_dump_restore_prefetch_01(self):
+        # A restore with more than one job reads blocks ahead of the
+        # backend connection, the data must not be reordered or lost.
+        await self._populate(200)
+        await self._check_dump_restore(jobs=4)
+
+        # Requesting more jobs than supported is not an error.
+        await self._check_dump_restore(
+            jobs=edbdef.RESTORE_MAX_PREFETCH_BLOCKS + 1)
+
+    async def test_dump_restore_mending_01(self):
+        # The column count of the first tuple of a block decides how
+        # the block is mended; it must also work for blocks without
+        # tuples (EmptyMended), and for a single tuple.
+        await self.con.execute('DELETE Mended')
+        await self._check_dump_restore(jobs=1)
+        await self._populate(1)
+        await self._check_dump_restore(jobs=1)
+
+    def _get_header(self, msg, code):
+        for header in msg.headers:
+            if header.code == code:
+                return header.value
+        return None
+
+    def _check_dump_blocks(self, header, blocks):
+        # Every object of the dump has its data blocks in the output.
+        object_ids = {desc.object_id for desc in header.descriptors}
+        block_ids = {
+            self._get_header(block, DUMP_HEADER_BLOCK_ID)
+            for block in blocks
+        }
+        self.assertEqual(block_ids, object_ids)
+
+    async def test_dump_restore_jobs_02(self):
+        dbname = self.get_database_name()
+        restored_dbname = f'{dbname}_restored'
+
+        await self.con.query('''
+            FOR idx IN {array_unpack(<array<int64>>$ids)}
+            UNION (
+                INSERT SnapshotLeft {
+                    idx := idx,
+                    right := (INSERT SnapshotRight { idx := idx }),
+                }
+            )
+        ''', ids=list(range(1000)))
+
+        dumped = asyncio.Event()
+
+        async def write():
+            # Every pair is inserted in a single transaction, so the
+            # dump must contain either both objects or none.
+            idx = 1000
+            while not dumped.is_set():
+                await self.con.query('''
+                    INSERT SnapshotLeft {
+                        idx := <int64>$idx,
+                        right := (INSERT SnapshotRight { idx := <int64>$idx }),
+                    }
+                ''', idx=idx)
+                idx += 1
+
+        writer = asyncio.create_task(write())
+        try:
+            header, blocks = await self._dump(
+                self.get_connect_args(database=dbname),
+                headers=[protocol.Header(code=DUMP_HEADER_JOBS, value=b'4')],
+            )
+        finally:
+            dumped.set()
+            await writer
+
+        jobs = int(self._get_header(header, DUMP_HEADER_JOBS))
+        self.assertGreater(jobs, 1)
+        self.assertLessEqual(jobs, 4)
+        self._check_dump_blocks(header, blocks)
+
+        await self.con.execute(f'CREATE DATABASE {restored_dbname}')
+        try:
+            await self._restore(restored_dbname, header, blocks, jobs=4)
+
+            con2 = await self.connect(database=restored_dbname)
+            try:
+                left, right, linked = await con2.query_one('''
+                    WITH MODULE test
+                    SELECT (
+                        array_agg((SELECT SnapshotLeft ORDER BY .idx).idx),
+                        array_agg((SELECT SnapshotRight ORDER BY .idx).idx),
+                        count(SnapshotLeft.right),
+                    )
+                ''')
+                self.assertGreaterEqual(len(left), 1000)
+                self.assertEqual(left, right)
+                self.assertEqual(linked, len(left))
+            finally:
+                await con2.aclose()
+        finally:
+            await self.con.execute(f'DROP DATABASE {restored_dbname}')
+
+    async def test_dump_jobs_pool_capacity(self):
+        # The number of dump jobs is capped by half of the backend
+        # connection pool capacity.
+        async with tb.start_edgedb_server(max_allowed_connections=4) as sd:
+            con = await sd.connect()
+            try:
+                for i in range(4):
+                    await con.execute(f'''
+                        CREATE TYPE default::Capped{i} {{
+                            CREATE PROPERTY name -> std::str;
+                        }};
+                        INSERT default::Capped{i} {{ name := 'capped' }};
+                    ''')
+            finally:
+                await con.aclose()
+
+            header, blocks = await self._dump(
+                dict(
+                    user='edgedb',
+                    password=sd.password,
+                    host=sd.host,
+                    port=sd.port,
+                    tls_ca_file=sd.tls_cert_file,
+                ),
+                headers=[protocol.Header(code=DUMP_HEADER_JOBS, value=b'8')],
+            )
+
+        jobs = int(self._get_header(header, DUMP_HEADER_JOBS))
+        self.assertGreaterEqual(jobs, 1)
+        self.assertLessEqual(jobs, 2)
+        self._check_dump_blocks(header, blocks)
@@ -0,0 +1,108 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2021-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import os.path
+
+from edb.testbase import lang as tb
+
+from edb.edgeql import compiler
+from edb.edgeql import parser as qlparser
+from edb.ir import ast as irast
+from edb.pgsql import compiler as pg_compiler
+
+
+class TestEdgeQLIRRefCache(tb.BaseEdgeQLCompilerTest):
+    """Unit tests for the TypeRef/PointerRef cache shared by compilations."""
+
+    SCHEMA = os.path.join(os.path.dirname(__file__), 'schemas',
+                          'cards.esdl')
+
+    def _compile(self, source, schema_ref_cache=None):
+        ir = compiler.compile_ast_to_ir(
+            qlparser.parse(source),
+            self.schema,
+            options=compiler.CompilerOptions(
+                modaliases={None: 'default'},
+                schema_ref_cache=schema_ref_cache,
+            )
+        )
+        try:
+            sql, _ = pg_compiler.compile_ir_to_sql(ir)
+        finally:
+            if schema_ref_cache is not None:
+                schema_ref_cache.release()
+        return ir, sql
+
+    def test_edgeql_ir_ref_cache_reuse(self):
+        query = '''
+            SELECT User { name, deck: { name, cost } }
+            FILTER .name = 'Alice' AND count(.deck) > 2
+        '''
+        _, expected_sql = self._compile(query)
+
+        cache = compiler.new_schema_ref_cache(self.schema)
+        _, sql1 = self._compile(query, cache)
+        self.assertEqual(sql1, expected_sql)
+
+        User = self.schema.get('default::User')
+        self.assertIn(User.id, {tid for tid, _, _ in cache.type_refs})
+        self.assertTrue(cache.ptr_refs)
+        self.assertTrue(cache.callables)
+
+        type_refs = dict(cache.type_refs)
+        ptr_refs = dict(cache.ptr_refs)
+
+        _, sql2 = self._compile(query, cache)
+        self.assertEqual(sql2, expected_sql)
+
+        # The second compilation reused the descriptors
+        # computed by the first one.
+        for key, typeref in type_refs.items():
+            self.assertIs(cache.type_refs[key], typeref)
+        for key, ptrref in ptr_refs.items():
+            self.assertIs(cache.ptr_refs[key], ptrref)
+
+    def test_edgeql_ir_ref_cache_no_derived(self):
+        cache = compiler.new_schema_ref_cache(self.schema)
+
+        self._compile('SELECT User { name, foo := .name ++ "!" }', cache)
+        self._compile('SELECT Card { name, owners: { name } }', cache)
+
+        for typeref in cache.type_refs.values():
+            self.assertFalse(typeref.is_view, typeref)
+
+        for ptrref in cache.ptr_refs.values():
+            self.assertIsInstance(ptrref, irast.PointerRef)
+            self.assertFalse(ptrref.is_derived, ptrref)
+            for child in ptrref.children:
+                self.assertFalse(child.is_derived, ptrref)
+
+    def test_edgeql_ir_ref_cache_callables(self):
+        cache = compiler.new_schema_ref_cache(self.schema)
+
+        _, sql1 = self._compile('SELECT Card.cost + 1', cache)
+        self.assertTrue(cache.callables)
+        self.assertTrue(all(len(v) == 1 for v in cache.callables.values()))
+
+        _, sql2 = self._compile('SELECT Card.cost + 1', cache)
+        self.assertEqual(sql1, sql2)
+
+        _, sql3 = self._compile('SELECT Card.cost + 1.5', cache)
+        _, expected_sql3 = self._compile('SELECT Card.cost + 1.5')
+        self.assertEqual(sql3, expected_sql3)
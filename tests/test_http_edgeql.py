@@ -17,10 +17,12 @@
 #
 
 
+import json
 import os
 
 import edgedb
 
+from edb.server import defines as edbdef
 from edb.testbase import http as tb
 
 
@@ -257,3 +259,192 @@ class TestHttpEdgeQL(tb.EdgeQLTestCase):
                 r'''SELECT <str>$x ?? '-default' ''',
                 variables={'x': None},
             )
+
+    def test_http_edgeql_batch_01(self):
+        for _ in range(3):  # repeat to test prepared pgcon statements
+            results = self.edgeql_batch([
+                {'query': 'SELECT 1 + 1'},
+                {
+                    'query': 'SELECT Setting.value FILTER .name = <str>$n',
+                    'variables': {'n': 'perks'},
+                },
+                {'query': 'SELECT UNRECOGNIZABLE'},
+                {'query': 'SELECT <int64>"not a number"'},
+                {
+                    'query': 'SELECT Setting.value FILTER .name = <str>$n',
+                    'variables': {'n': 'template'},
+                },
+            ])
+
+            self.assertEqual(len(results), 5)
+            self.assertEqual(results[0], {'data': [2]})
+            self.assertEqual(results[1], {'data': ['full']})
+            self.assertEqual(
+                results[2]['error']['type'], 'InvalidReferenceError')
+            self.assertIn('error', results[3])
+            # An error does not affect the queries after it.
+            self.assertEqual(sorted(results[4]['data']), ['blue', 'none'])
+
+    def test_http_edgeql_batch_02(self):
+        results = self.edgeql_batch(
+            [
+                {'query': 'SELECT count(Setting)'},
+                {'query': 'SELECT count(User)'},
+            ],
+            same_snapshot=True,
+        )
+        self.assertEqual(results, [{'data': [3]}, {'data': [4]}])
+
+        results = self.edgeql_batch(
+            [
+                {'query': 'INSERT Setting { name := "x", value := "y" }'},
+                {'query': 'SELECT 1'},
+            ],
+            same_snapshot=True,
+        )
+        # The snapshot is read-only, and the first error aborts the
+        # rest of the batch.
+        self.assertIn('error', results[0])
+        self.assertIn('error', results[1])
+
+        self.assert_edgeql_query_result(
+            r'''SELECT count(Setting)''',
+            [3],
+        )
+
+    def test_http_edgeql_batch_03(self):
+        with self.http_con() as con:
+            con.request(
+                'POST',
+                self.http_addr,
+                body=b'[{"variables": {}}]',
+                headers={'Content-Type': 'application/json'},
+            )
+            data, headers, status = self.http_con_read_response(con)
+
+            self.assertEqual(status, 400)
+            self.assertIn(b'query is missing', data)
+
+    def test_http_edgeql_batch_04(self):
+        # The same statement several times in one batch, both for a
+        # query that fails in the backend and one that does not.
+        results = self.edgeql_batch([
+            {'query': 'SELECT <int64>"not a number" + 0'},
+            {'query': 'SELECT 40 + 2'},
+            {'query': 'SELECT <int64>"not a number" + 0'},
+            {'query': 'SELECT 40 + 2'},
+            {'query': 'SELECT <int64>"not a number" + 0'},
+        ])
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[1], {'data': [42]})
+        self.assertEqual(results[3], {'data': [42]})
+        self.assertIn('error', results[0])
+        self.assertNotIn(
+            'prepared statement', results[0]['error']['message'])
+        # Every repeat reports the error of the query itself.
+        self.assertEqual(results[2], results[0])
+        self.assertEqual(results[4], results[0])
+
+    def test_http_edgeql_batch_05(self):
+        with self.http_con() as con:
+            con.request(
+                'POST',
+                self.http_addr,
+                body=json.dumps(
+                    [{'query': 'SELECT 1'}]
+                    * (edbdef.HTTP_PORT_MAX_BATCH_SIZE + 1)
+                ).encode(),
+                headers={'Content-Type': 'application/json'},
+            )
+            data, headers, status = self.http_con_read_response(con)
+
+            self.assertEqual(status, 400)
+            self.assertIn(b'the maximum is', data)
+
+        results = self.edgeql_batch(
+            [{'query': 'SELECT 1'}] * edbdef.HTTP_PORT_MAX_BATCH_SIZE)
+        self.assertEqual(results, [{'data': [1]}] * len(results))
+        self.assertEqual(len(results), edbdef.HTTP_PORT_MAX_BATCH_SIZE)
+
+    def test_http_edgeql_stream_01(self):
+        for _ in range(3):  # repeat to test prepared pgcon statements
+            for use_http_post in [True, False]:
+                self.assert_edgeql_query_result(
+                    r"""
+                        SELECT Setting {
+                            name,
+                            value
+                        }
+                        FILTER .name = <str>$name
+                        ORDER BY .value ASC;
+                    """,
+                    [
+                        {'name': 'template', 'value': 'blue'},
+                        {'name': 'template', 'value': 'none'},
+                    ],
+                    variables={'name': 'template'},
+                    use_http_post=use_http_post,
+                    stream=True,
+                )
+
+        self.assert_edgeql_query_result(
+            r"""SELECT <str>{}""",
+            [],
+            stream=True,
+        )
+
+        # Large enough for several chunks.
+        self.assert_edgeql_query_result(
+            r"""SELECT array_unpack(<array<int64>>$arr)""",
+            list(range(100000)),
+            variables={'arr': list(range(100000))},
+            stream=True,
+        )
+
+    def test_http_edgeql_stream_02(self):
+        with self.http_con() as con:
+            con.request(
+                'POST',
+                self.http_addr,
+                body=json.dumps({
+                    'query': 'SELECT {1, 2, 3}',
+                    'stream': True,
+                }).encode(),
+                headers={'Content-Type': 'application/json'},
+            )
+            data, headers, status = self.http_con_read_response(con)
+
+            self.assertEqual(status, 200)
+            self.assertEqual(headers['transfer-encoding'], 'chunked')
+            self.assertEqual(json.loads(data), {'data': [1, 2, 3]})
+
+            # The connection is still usable after a streamed response.
+            data, headers, status = self.http_con_request(
+                con, {'query': 'SELECT 42', 'stream': 'true'})
+            self.assertEqual(status, 200)
+            self.assertEqual(json.loads(data), {'data': [42]})
+
+    def test_http_edgeql_stream_03(self):
+        # Compilation errors are reported before the result is streamed.
+        with self.assertRaisesRegex(edgedb.InvalidReferenceError,
+                                    r'UNRECOGNIZABLE'):
+            self.edgeql_query('SELECT UNRECOGNIZABLE', stream=True)
+
+        # Errors in the middle of the result follow the partial data.
+        with self.http_con() as con:
+            con.request(
+                'POST',
+                self.http_addr,
+                body=json.dumps({
+                    'query': 'SELECT 1 / {1, 0}',
+                    'stream': True,
+                }).encode(),
+                headers={'Content-Type': 'application/json'},
+            )
+            data, headers, status = self.http_con_read_response(con)
+            res = json.loads(data)
+
+        self.assertEqual(status, 200)
+        self.assertIn('data', res)
+        self.assertEqual(res['error']['type'], 'InternalServerError')
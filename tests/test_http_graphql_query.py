@@ -2049,6 +2049,108 @@ class TestGraphQLFunctional(tb.GraphQLTestCase):
             }],
         })
 
+    def test_graphql_functional_partial_schema_01(self):
+        # The document is validated against a schema that only has
+        # the types it uses, which must still know the implementations
+        # of the interfaces used in fragments.
+        for _ in range(2):  # repeat to use the cached partial schema
+            self.assert_graphql_query_result(r"""
+                fragment userFrag on User {
+                    age
+                }
+
+                query {
+                    NamedObject(filter: {name: {eq: "Bob"}}) {
+                        name
+                        ... userFrag
+                        ... on Person {
+                            active
+                        }
+                    }
+                }
+            """, {
+                'NamedObject': [{
+                    'name': 'Bob',
+                    'age': 21,
+                    'active': True,
+                }],
+            })
+
+        self.assert_graphql_query_result(r"""
+            query {
+                User(filter: {name: {eq: "Bob"}}) {
+                    ... on NamedObject {
+                        name
+                    }
+                    profile {
+                        ... on NamedObject {
+                            name
+                        }
+                    }
+                }
+            }
+        """, {
+            'User': [{
+                'name': 'Bob',
+                'profile': {
+                    'name': 'Bob profile',
+                },
+            }],
+        })
+
+    def test_graphql_functional_partial_schema_02(self):
+        # The suggestions come from the complete schema, even though
+        # the document only uses the Setting root field.
+        with self.assertRaisesRegex(
+                edgedb.QueryError,
+                r"Cannot query field 'UserGrop' on type 'Query'\. "
+                r"Did you mean 'UserGroup'",
+                _line=6, _col=21):
+            self.graphql_query(r"""
+                query {
+                    Setting {
+                        name
+                    }
+                    UserGrop {
+                        name
+                    }
+                }
+            """)
+
+    def test_graphql_functional_partial_schema_03(self):
+        # The suggested fragment types are not used by the document.
+        with self.assertRaisesRegex(
+                edgedb.QueryError,
+                r"Cannot query field 'age' on type 'NamedObject'\. "
+                r"Did you mean to use an inline fragment on .*'User'",
+                _line=5, _col=25):
+            self.graphql_query(r"""
+                query {
+                    NamedObject {
+                        name
+                        age
+                    }
+                }
+            """)
+
+    def test_graphql_functional_partial_schema_04(self):
+        # Unknown types are reported by the complete schema.
+        with self.assertRaisesRegex(
+                edgedb.QueryError,
+                r"Unknown type 'Uxer'\. Did you mean 'User'",
+                _line=2, _col=38):
+            self.graphql_query(r"""
+                fragment userFrag on Uxer {
+                    name
+                }
+
+                query {
+                    User {
+                        ... userFrag
+                    }
+                }
+            """)
+
     def test_graphql_functional_directives_01(self):
         self.assert_graphql_query_result(r"""
             query {
@@ -17,11 +17,18 @@
 #
 
 
+import collections
 import os
+from unittest import mock
 
 import edgedb
+import graphql
 
+from edb.graphql import compiler as gql_compiler
+from edb.graphql import types as gt
+from edb.schema import schema as s_schema
 from edb.testbase import http as tb
+from edb.testbase import lang as tb_lang
 
 
 class TestGraphQLSchema(tb.GraphQLTestCase):
@@ -2414,3 +2421,167 @@ class TestGraphQLSchema(tb.GraphQLTestCase):
                 "specifiedByUrl": None,
             }
         })
+
+
+class TestGraphQLCoreSchema(tb_lang.BaseSchemaTest):
+    SCHEMA_DEFAULT = os.path.join(os.path.dirname(__file__), 'schemas',
+                                  'graphql.esdl')
+
+    def _get_document_schema(self, gqlcore, text):
+        doc = graphql.parse(text)
+        schema = gqlcore.get_document_schema(doc)
+        self.assertEqual(graphql.validate(schema, doc), [])
+        return schema
+
+    def test_graphql_core_schema_partial_01(self):
+        gqlcore = gt.GQLCoreSchema(self.schema)
+
+        schema = self._get_document_schema(gqlcore, r"""
+            query {
+                Setting {
+                    name
+                }
+            }
+        """)
+        self.assertEqual(list(schema.query_type.fields), ['Setting'])
+        self.assertIsNone(schema.mutation_type)
+        self.assertNotIn('User', schema.type_map)
+
+        # The same root fields and types share the partial schema.
+        self.assertIs(
+            self._get_document_schema(gqlcore, r"""
+                query {
+                    Setting(filter: {name: {eq: "perks"}}) {
+                        value
+                    }
+                }
+            """),
+            schema,
+        )
+
+        self.assertIsNone(gqlcore._gql_schema)
+
+    def test_graphql_core_schema_partial_02(self):
+        gqlcore = gt.GQLCoreSchema(self.schema)
+
+        # The implementations of the interfaces used in fragments are
+        # a part of the schema.
+        schema = self._get_document_schema(gqlcore, r"""
+            fragment userFrag on User {
+                age
+            }
+
+            query {
+                NamedObject {
+                    name
+                    ... userFrag
+                }
+            }
+        """)
+        self.assertIn('User_Type', schema.type_map)
+        self.assertIn('Person_Type', schema.type_map)
+        self.assertNotIn('Setting', schema.query_type.fields)
+
+        self.assertIsNone(gqlcore._gql_schema)
+
+    def test_graphql_core_schema_partial_03(self):
+        gqlcore = gt.GQLCoreSchema(self.schema)
+
+        # Unknown types are left to the complete schema.
+        doc = graphql.parse(r"""
+            fragment userFrag on Uxer {
+                name
+            }
+
+            query {
+                User {
+                    ... userFrag
+                }
+            }
+        """)
+        self.assertIs(
+            gqlcore.get_document_schema(doc), gqlcore.graphql_schema)
+
+        # And so is introspection.
+        gqlcore = gt.GQLCoreSchema(self.schema)
+        self.assertIs(
+            self._get_document_schema(gqlcore, r"""
+                query {
+                    __schema {
+                        queryType {
+                            name
+                        }
+                    }
+                }
+            """),
+            gqlcore.graphql_schema,
+        )
+
+        # Once built, the complete schema is used for everything.
+        self.assertIs(
+            self._get_document_schema(gqlcore, r"""
+                query {
+                    Setting {
+                        name
+                    }
+                }
+            """),
+            gqlcore.graphql_schema,
+        )
+
+    def test_graphql_core_schema_partial_04(self):
+        gqlcore = gt.GQLCoreSchema(self.schema)
+        texts = [
+            'query { Setting { name } }',
+            'query { User { name } }',
+            'query { Profile { name } }',
+        ]
+
+        with mock.patch.object(gt, 'PARTIAL_SCHEMA_CACHE_SIZE', 2):
+            schemas = [
+                self._get_document_schema(gqlcore, text) for text in texts
+            ]
+            self.assertEqual(len(gqlcore._partial_schemas), 2)
+
+            # The oldest partial schema was evicted.
+            self.assertIsNot(
+                self._get_document_schema(gqlcore, texts[0]), schemas[0])
+            self.assertIs(
+                self._get_document_schema(gqlcore, texts[0]),
+                gqlcore._partial_schemas[
+                    (frozenset({'Setting'}), frozenset(), frozenset())],
+            )
+            self.assertEqual(len(gqlcore._partial_schemas), 2)
+
+    def test_graphql_core_schema_cache_01(self):
+        user_schema = s_schema.FlatSchema()
+        global_schema = s_schema.FlatSchema()
+
+        with mock.patch.object(gql_compiler, '_gqlcore_cache',
+                               collections.OrderedDict()) as cache, \
+                mock.patch.object(gql_compiler, 'GQLCORE_CACHE_SIZE', 2):
+            gqlcore = gql_compiler._get_gqlcore(
+                'db1', self.schema, user_schema, global_schema)
+            self.assertIs(
+                gql_compiler._get_gqlcore(
+                    'db1', self.schema, user_schema, global_schema),
+                gqlcore,
+            )
+
+            # A new version of the schema replaces the database entry.
+            user_schema = s_schema.FlatSchema()
+            new_gqlcore = gql_compiler._get_gqlcore(
+                'db1', self.schema, user_schema, global_schema)
+            self.assertIsNot(new_gqlcore, gqlcore)
+            self.assertEqual(list(cache), ['db1'])
+            self.assertIs(cache['db1'][3], new_gqlcore)
+
+            # The least recently used database is evicted.
+            gql_compiler._get_gqlcore(
+                'db2', self.schema, user_schema, global_schema)
+            gql_compiler._get_gqlcore(
+                'db1', self.schema, user_schema, global_schema)
+            gql_compiler._get_gqlcore(
+                'db3', self.schema, user_schema, global_schema)
+            self.assertEqual(list(cache), ['db1', 'db3'])
+            self.assertIs(cache['db1'][3], new_gqlcore)
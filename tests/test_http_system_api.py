@@ -34,3 +34,46 @@ class TestHttpSystemAPI(tb.BaseHttpTest, tb_server.ConnectedTestCase):
 
             self.assertEqual(status, 200)
             self.assertIn(b'OK', data)
+
+    async def test_http_sys_api_metrics(self):
+        # Make sure there is at least one compiled query to report on.
+        await self.con.query('SELECT 1')
+
+        with self.http_con() as con:
+            data, headers, status = self.http_con_request(
+                con, {}, path='metrics')
+
+            self.assertEqual(status, 200)
+            self.assertIn('text/plain', headers['content-type'])
+            self.assertIn(
+                b'# TYPE edgedb_server_client_connections_current gauge',
+                data)
+            self.assertIn(b'edgedb_server_client_connections_total ', data)
+            self.assertIn(
+                b'edgedb_server_compile_duration_seconds_bucket{worker=',
+                data)
+            self.assertIn(b'edgedb_server_backend_query_duration_seconds',
+                          data)
+
+    async def test_http_sys_api_metrics_drop_db(self):
+        await self.con.execute('CREATE DATABASE metricstestdb;')
+        try:
+            conn = await self.connect(database='metricstestdb')
+            try:
+                await conn.query('SELECT 1')
+            finally:
+                await conn.aclose()
+
+            with self.http_con() as con:
+                data, _, status = self.http_con_request(
+                    con, {}, path='metrics')
+                self.assertEqual(status, 200)
+                self.assertIn(b'database="metricstestdb"', data)
+        finally:
+            await self.con.execute('DROP DATABASE metricstestdb;')
+
+        # The series of a dropped database are not reported anymore.
+        with self.http_con() as con:
+            data, _, status = self.http_con_request(con, {}, path='metrics')
+            self.assertEqual(status, 200)
+            self.assertNotIn(b'database="metricstestdb"', data)
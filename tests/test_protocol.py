@@ -177,6 +177,192 @@ class TestProtocol(ProtocolTestCase):
             transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
         )
 
+    async def test_proto_prepared_stmt_01(self):
+        await self.con.connect()
+
+        await self.con.send(
+            protocol.Prepare(
+                headers=[],
+                io_format=protocol.IOFormat.BINARY,
+                expected_cardinality=compiler.Cardinality.AT_MOST_ONE,
+                statement_name=b'one',
+                command='SELECT 1',
+            ),
+            # The anonymous statement must not replace the named one.
+            protocol.Prepare(
+                headers=[],
+                io_format=protocol.IOFormat.BINARY,
+                expected_cardinality=compiler.Cardinality.AT_MOST_ONE,
+                statement_name=b'',
+                command='SELECT "anon"',
+            ),
+            protocol.DescribeStatement(
+                headers=[],
+                aspect=protocol.DescribeAspect.DATA_DESCRIPTION,
+                statement_name=b'one',
+            ),
+            protocol.Flush(),
+        )
+        await self.con.recv_match(
+            protocol.PrepareComplete,
+            cardinality=compiler.Cardinality.AT_MOST_ONE,
+        )
+        await self.con.recv_match(protocol.PrepareComplete)
+        await self.con.recv_match(
+            protocol.CommandDataDescription,
+            result_cardinality=compiler.Cardinality.AT_MOST_ONE,
+        )
+
+        for _ in range(2):
+            await self.con.send(
+                protocol.Execute(
+                    headers=[],
+                    statement_name=b'one',
+                    arguments=b'\x00\x00\x00\x00',
+                ),
+                protocol.Sync(),
+            )
+            await self.con.recv_match(protocol.Data)
+            await self.con.recv_match(
+                protocol.CommandComplete,
+                status='SELECT'
+            )
+            await self.con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=(
+                    protocol.TransactionState.NOT_IN_TRANSACTION),
+            )
+
+        await self.con.send(
+            protocol.Execute(
+                headers=[],
+                statement_name=b'two',
+                arguments=b'\x00\x00\x00\x00',
+            ),
+            protocol.Sync(),
+        )
+        await self.con.recv_match(
+            protocol.ErrorResponse,
+            message="prepared statement 'two' does not exist"
+        )
+        await self.con.recv_match(
+            protocol.ReadyForCommand,
+            transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+        )
+
+    async def _execute_script(self, script, transaction_state):
+        await self.con.send(
+            protocol.ExecuteScript(
+                headers=[],
+                script=script,
+            )
+        )
+        await self.con.recv_match(protocol.CommandComplete)
+        await self.con.recv_match(
+            protocol.ReadyForCommand,
+            transaction_state=transaction_state,
+        )
+
+    async def _prepare_stmt(self, stmt_name, command):
+        await self.con.send(
+            protocol.Prepare(
+                headers=[],
+                io_format=protocol.IOFormat.BINARY,
+                expected_cardinality=compiler.Cardinality.AT_MOST_ONE,
+                statement_name=stmt_name,
+                command=command,
+            ),
+            protocol.Flush(),
+        )
+        await self.con.recv_match(protocol.PrepareComplete)
+
+    async def _execute_stmt(self, stmt_name):
+        await self.con.send(
+            protocol.Execute(
+                headers=[],
+                statement_name=stmt_name,
+                arguments=b'\x00\x00\x00\x00',
+            ),
+            protocol.Sync(),
+        )
+
+    async def test_proto_prepared_stmt_02(self):
+        # A prepared statement is compiled again when the module
+        # aliases change.
+        await self.con.connect()
+
+        await self._execute_script(
+            'SET ALIAS x AS MODULE std',
+            protocol.TransactionState.NOT_IN_TRANSACTION,
+        )
+        await self._prepare_stmt(b'aliased', 'SELECT x::len("abc")')
+
+        await self._execute_stmt(b'aliased')
+        await self.con.recv_match(protocol.Data)
+        await self.con.recv_match(protocol.CommandComplete, status='SELECT')
+        await self.con.recv_match(
+            protocol.ReadyForCommand,
+            transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+        )
+
+        await self._execute_script(
+            'SET ALIAS x AS MODULE sys',
+            protocol.TransactionState.NOT_IN_TRANSACTION,
+        )
+
+        await self._execute_stmt(b'aliased')
+        await self.con.recv_match(
+            protocol.ErrorResponse,
+            message=r'.*len.*does not exist',
+        )
+        await self.con.recv_match(
+            protocol.ReadyForCommand,
+            transaction_state=protocol.TransactionState.NOT_IN_TRANSACTION,
+        )
+
+    async def test_proto_prepared_stmt_03(self):
+        # A statement prepared in a transaction with DDL is compiled
+        # again after a rollback to a savepoint.
+        await self.con.connect()
+
+        await self._execute_script(
+            '''
+                START TRANSACTION;
+                DECLARE SAVEPOINT sp1;
+                CREATE ALIAS PreparedStmtAlias := 'aliased';
+            ''',
+            protocol.TransactionState.IN_TRANSACTION,
+        )
+        await self._prepare_stmt(b'in_tx', 'SELECT PreparedStmtAlias')
+
+        await self._execute_stmt(b'in_tx')
+        await self.con.recv_match(protocol.Data)
+        await self.con.recv_match(protocol.CommandComplete, status='SELECT')
+        await self.con.recv_match(
+            protocol.ReadyForCommand,
+            transaction_state=protocol.TransactionState.IN_TRANSACTION,
+        )
+
+        await self._execute_script(
+            'ROLLBACK TO SAVEPOINT sp1',
+            protocol.TransactionState.IN_TRANSACTION,
+        )
+
+        await self._execute_stmt(b'in_tx')
+        await self.con.recv_match(
+            protocol.ErrorResponse,
+            message=r'.*PreparedStmtAlias.*does not exist',
+        )
+        await self.con.recv_match(
+            protocol.ReadyForCommand,
+            transaction_state=protocol.TransactionState.IN_FAILED_TRANSACTION,
+        )
+
+        await self._execute_script(
+            'ROLLBACK',
+            protocol.TransactionState.NOT_IN_TRANSACTION,
+        )
+
     async def test_proto_connection_lost_cancel_query(self):
         # This test is occasionally hanging - adding a timeout to find out why
         await asyncio.wait_for(
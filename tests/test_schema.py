@@ -20,7 +20,9 @@
 from __future__ import annotations
 from typing import *
 
+import pickle
 import re
+from unittest import mock
 
 from edb import errors
 
@@ -31,8 +33,10 @@ from edb.edgeql import parser as qlparser
 from edb.edgeql import qltypes
 
 from edb.schema import ddl as s_ddl
+from edb.schema import delta as sd
 from edb.schema import links as s_links
 from edb.schema import name as s_name
+from edb.schema import objects as so
 from edb.schema import objtypes as s_objtypes
 
 from edb.testbase import lang as tb
@@ -1746,6 +1750,312 @@ class TestSchema(tb.BaseSchemaLoadTest):
                 ALTER TYPE Foo EXTENDING Bar;
             ''')
 
+    def test_schema_delta_01(self):
+        schema = self.load_schema('''
+            type Foo {
+                property foo1 -> str;
+            }
+
+            type Bar extending Foo;
+        ''')
+
+        new_schema = self.run_ddl(schema, '''
+            ALTER TYPE Foo CREATE PROPERTY foo2 -> int64;
+            ALTER TYPE Bar RENAME TO Baz;
+        ''', default_module='test')
+
+        delta = schema.get_delta(new_schema)
+        self.assertLess(delta.get_size(), len(new_schema._id_to_data))
+
+        # Compiler workers apply deltas to unpickled schema copies.
+        base = pickle.loads(pickle.dumps(schema, -1))
+        result = base.apply_delta(pickle.loads(pickle.dumps(delta, -1)))
+
+        self.assertEqual(result._generation, new_schema._generation)
+        for index_name in type(schema)._index_names:
+            self.assertEqual(
+                getattr(result, index_name),
+                getattr(new_schema, index_name),
+            )
+
+        Baz = result.get('test::Baz', type=s_objtypes.ObjectType)
+        foo2 = Baz.getptr(result, s_name.UnqualName('foo2'))
+        self.assertEqual(foo2.get_shortname(result).name, 'foo2')
+
+        with self.assertRaisesRegex(
+            errors.SchemaError,
+            "cannot apply schema delta"
+        ):
+            new_schema.apply_delta(delta)
+
+    def test_schema_delta_02(self):
+        schema = self.load_schema('''
+            type Foo {
+                property foo1 -> str;
+            }
+        ''')
+
+        new_schema = self.run_ddl(schema, '''
+            ALTER TYPE Foo CREATE PROPERTY foo2 -> int64;
+        ''', default_module='test')
+
+        # A peer server holds an equivalent schema of its own
+        # generation.
+        peer_schema = self.run_ddl(schema, '''
+            CREATE TYPE Bar;
+            DROP TYPE Bar;
+        ''', default_module='test')
+        self.assertNotEqual(peer_schema._generation, schema._generation)
+
+        delta = schema.get_delta(new_schema)
+        with self.assertRaisesRegex(
+            errors.SchemaError,
+            "cannot apply schema delta"
+        ):
+            peer_schema.apply_delta(delta)
+
+        result = peer_schema.apply_delta(delta, rebase=True)
+        self.assertEqual(result._generation, peer_schema._generation + 1)
+
+        Foo = result.get('test::Foo', type=s_objtypes.ObjectType)
+        foo2 = Foo.getptr(result, s_name.UnqualName('foo2'))
+        self.assertEqual(foo2.get_shortname(result).name, 'foo2')
+
+    def test_schema_get_objects_indexes_01(self):
+        schema = self.load_schema('''
+            type Foo {
+                property foo1 -> str;
+            }
+            type Bar {
+                link foo -> Foo;
+            }
+        ''')
+
+        schema = self.run_ddl(schema, '''
+            CREATE MODULE other;
+            CREATE TYPE other::Baz;
+            ALTER TYPE test::Bar RENAME TO other::Bar;
+            CREATE TYPE test::Spam;
+            DROP TYPE test::Spam;
+        ''', default_module='test')
+
+        def names(objs):
+            return {str(obj.get_name(schema)) for obj in objs}
+
+        self.assertEqual(
+            names(schema.get_objects(
+                type=s_objtypes.ObjectType,
+                included_modules=[s_name.UnqualName('other')],
+            )),
+            {'other::Bar', 'other::Baz'},
+        )
+
+        self.assertEqual(
+            names(schema.get_objects(
+                type=s_objtypes.ObjectType,
+                included_modules=(
+                    m for m in [s_name.UnqualName('test')]),
+            )),
+            {'test::Foo'},
+        )
+
+        # The indexed lookups must agree with a full scan.
+        all_objects = list(schema.get_objects(exclude_internal=False))
+        for objtype in (s_objtypes.ObjectType, s_links.Link):
+            self.assertEqual(
+                names(schema.get_objects(
+                    type=objtype, exclude_internal=False)),
+                names(o for o in all_objects if isinstance(o, objtype)),
+            )
+
+        # The per-class id sets are sent whole in a delta and must be
+        # counted as such.
+        new_schema = self.run_ddl(schema, '''
+            CREATE TYPE test::Ham;
+        ''', default_module='test')
+        delta = schema.get_delta(new_schema)
+        self.assertGreater(
+            delta.get_size(),
+            len(new_schema._type_to_ids['ObjectType']),
+        )
+
+    def test_schema_memo_tables_01(self):
+        schema = self.load_schema('''
+            type Foo {
+                property foo1 -> str;
+            }
+            type Bar extending Foo;
+        ''')
+
+        Foo = schema.get('test::Foo', type=s_objtypes.ObjectType)
+        hits, misses, _ = schema.get_memo_stats()['referrers']
+        refs = schema.get_referrers(Foo)
+        self.assertIs(schema.get_referrers(Foo), refs)
+        self.assertEqual(
+            schema.get_memo_stats()['referrers'][:2],
+            (hits + 1, misses + 1),
+        )
+
+        # Memo tables are carried over when the underlying indexes
+        # are unchanged...
+        same = schema._replace()
+        self.assertIs(same._referrers_memo, schema._referrers_memo)
+        self.assertIs(same._functions_memo, schema._functions_memo)
+
+        # ...but not when they change.
+        new_schema = self.run_ddl(schema, '''
+            CREATE TYPE test::Baz EXTENDING test::Foo;
+        ''', default_module='test')
+        self.assertIsNot(
+            new_schema._referrers_memo, schema._referrers_memo)
+        self.assertGreater(
+            len(new_schema.get_referrers(Foo)), len(refs))
+
+        # Memo tables are not pickled.
+        restored = pickle.loads(pickle.dumps(schema))
+        self.assertEqual(len(restored._referrers_memo), 0)
+        self.assertEqual(restored.get_referrers(Foo), refs)
+
+    def test_schema_memo_tables_02(self):
+        schema = self.load_schema('''
+            type Foo {
+                property foo1 -> str {
+                    default := 'foo';
+                }
+                property foo2 -> str {
+                    default := 'baz';
+                }
+            }
+        ''')
+
+        Foo = schema.get('test::Foo', type=s_objtypes.ObjectType)
+        foo1 = Foo.getptr(schema, s_name.UnqualName('foo1'))
+        foo2 = Foo.getptr(schema, s_name.UnqualName('foo2'))
+
+        # Reducible field values are restored once per object state.
+        default = foo1.get_default(schema)
+        default2 = foo2.get_default(schema)
+        self.assertIs(foo1.get_default(schema), default)
+        self.assertIs(foo1.get_field_value(schema, 'default'), default)
+        self.assertIs(
+            schema._replace()._restore_memo, schema._restore_memo)
+
+        # The memo is carried over DDL, only the values of the
+        # mutated objects are restored again.
+        new_schema = self.run_ddl(schema, '''
+            ALTER TYPE test::Foo {
+                ALTER PROPERTY foo1 SET default := 'bar';
+            };
+        ''', default_module='test')
+        self.assertIs(new_schema._restore_memo, schema._restore_memo)
+        self.assertEqual(foo1.get_default(new_schema).text, "'bar'")
+        self.assertIs(foo2.get_default(new_schema), default2)
+        self.assertEqual(foo1.get_default(schema).text, "'foo'")
+
+    def _diff_object_types(self, old_schema, new_schema):
+        # Diff the object types of both schemas, first scoring the full
+        # cross product and then only the pairs sharing a blocking key.
+        def diff():
+            context = so.ComparisonContext()
+            delta = sd.delta_objects(
+                old_schema.get_objects(
+                    type=s_objtypes.ObjectType,
+                    included_modules=[s_name.UnqualName('test')],
+                ),
+                new_schema.get_objects(
+                    type=s_objtypes.ObjectType,
+                    included_modules=[s_name.UnqualName('test')],
+                ),
+                sclass=s_objtypes.ObjectType,
+                context=context,
+                old_schema=old_schema,
+                new_schema=new_schema,
+            )
+            ops = {
+                (type(op).__name__, str(op.classname))
+                for op in delta.get_subcommands()
+            }
+            return ops, context.scored_pairs
+
+        full_ops, full_pairs = diff()
+        # The pointers every object type has (e.g. id) are shared by
+        # more than one type, and are too common to block on.
+        with mock.patch.object(sd, 'DELTA_BLOCKING_MIN_PAIRS', 0), \
+                mock.patch.object(sd, 'DELTA_BLOCKING_MAX_BUCKET', 1):
+            blocked_ops, blocked_pairs = diff()
+
+        return full_ops, full_pairs, blocked_ops, blocked_pairs
+
+    def test_schema_delta_blocking_01(self):
+        old_schema = self.load_schema('''
+            type Foo {
+                property a -> str;
+                property b -> int64;
+            }
+            type Bar {
+                property c -> str;
+            }
+            type Spam {
+                property x -> str;
+            }
+        ''')
+
+        new_schema = self.load_schema('''
+            type Foo2 {
+                property a -> str;
+                property b -> int64;
+            }
+            type Bar {
+                property c -> str;
+                property e -> str;
+            }
+            type Ham {
+                property y -> str;
+            }
+        ''')
+
+        full_ops, full_pairs, blocked_ops, blocked_pairs = (
+            self._diff_object_types(old_schema, new_schema))
+
+        # Of the types, only Bar/Bar (same name) and Foo/Foo2 (shared
+        # pointers) are scored, and the result is the same.
+        self.assertLess(blocked_pairs, full_pairs)
+        self.assertEqual(blocked_ops, full_ops)
+        self.assertIn(('AlterObjectType', 'test::Foo'), full_ops)
+
+    def test_schema_delta_blocking_02(self):
+        old_schema = self.load_schema('''
+            type Foo {
+                property a -> str;
+                property b -> int64;
+            }
+            type Bar {
+                property c -> str;
+            }
+        ''')
+
+        # Foo is both renamed and altered, so it shares neither its
+        # name nor its exact set of pointers with the old version.
+        new_schema = self.load_schema('''
+            type Foo2 {
+                property a -> str;
+                property b -> int64;
+                property d -> str;
+            }
+            type Bar {
+                property c -> str;
+            }
+        ''')
+
+        full_ops, full_pairs, blocked_ops, blocked_pairs = (
+            self._diff_object_types(old_schema, new_schema))
+
+        self.assertLess(blocked_pairs, full_pairs)
+        self.assertEqual(blocked_ops, full_ops)
+        self.assertIn(('AlterObjectType', 'test::Foo'), blocked_ops)
+        self.assertNotIn(('CreateObjectType', 'test::Foo2'), blocked_ops)
+        self.assertNotIn(('DeleteObjectType', 'test::Foo'), blocked_ops)
+
 
 class TestGetMigration(tb.BaseSchemaLoadTest):
     """Test migration deparse consistency.
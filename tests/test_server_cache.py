@@ -0,0 +1,50 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2021-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import pathlib
+import tempfile
+import unittest
+
+from edb.server import cache
+
+
+class TestPersistentQueryCache(unittest.TestCase):
+
+    def test_server_persistent_query_cache_01(self):
+        with tempfile.TemporaryDirectory() as td:
+            qcache = cache.PersistentQueryCache(pathlib.Path(td))
+            entries = [
+                (('edgeql_http', b'SELECT 1'), 'unit1'),
+                (('edgeql_http', b'SELECT 2'), 'unit2'),
+            ]
+
+            self.assertEqual(qcache.load('db1', b'fp1'), [])
+
+            qcache.save('db1', b'fp1', entries)
+            self.assertEqual(qcache.load('db1', b'fp1'), entries)
+            self.assertEqual(qcache.load('db2', b'fp1'), [])
+
+            # A different schema fingerprint rejects the saved entries
+            # and removes them.
+            self.assertEqual(qcache.load('db1', b'fp2'), [])
+            self.assertEqual(os.listdir(td), [])
+
+            qcache.save('db1', b'fp1', entries)
+            qcache.drop('db1')
+            self.assertEqual(qcache.load('db1', b'fp1'), [])
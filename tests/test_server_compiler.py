@@ -24,12 +24,14 @@ import signal
 import subprocess
 import sys
 import tempfile
+import unittest
 
 from edb.testbase import lang as tb
 from edb.testbase import server as tbs
 from edb.server import compiler as edbcompiler
 from edb.server.compiler_pool import amsg
 from edb.server.compiler_pool import pool
+from edb.server.compiler_pool import queue
 from edb.server.dbview import dbview
 
 
@@ -110,13 +112,31 @@ class TestAmsg(tbs.TestCase):
                 await server.stop()
                 self.assertEqual(len(proto.pids), 0)
 
-    async def check_pid(self, pid, server):
+    async def check_pid(self, pid, server, args=()):
         conn = server.get_by_pid(pid)
-        resp = await conn.request(pickle.dumps(('not_exist', ())))
-        status, *data = pickle.loads(resp)
+        resp = await conn.request(amsg.dumps(('not_exist', args)))
+        status, *data = amsg.loads(resp)
         self.assertEqual(status, 1)
         self.assertIsInstance(data[0], RuntimeError)
 
+    async def test_server_compiler_pool_large_message(self):
+        def segments():
+            return {
+                name for name in os.listdir(amsg.SHM_DIR)
+                if name.startswith(f'edgedb-amsg-{os.getpid()}-')
+            }
+
+        async with self.compiler_pool(1) as (server, proto, proc, sn):
+            pid = await asyncio.wait_for(proto.connected.get(), 10)
+            before = segments()
+
+            blob = os.urandom(amsg.SHM_THRESHOLD + 1)
+            await self.check_pid(pid, server, (pickle.PickleBuffer(blob),))
+            await self.check_pid(pid, server)
+
+            # The worker has removed the shared memory segment.
+            self.assertEqual(segments(), before)
+
     async def test_server_compiler_pool_restart(self):
         pids = []
         async with self.compiler_pool(2) as (server, proto, proc, sn):
@@ -237,6 +257,61 @@ class TestAmsg(tbs.TestCase):
                     os.kill(pid, 0)
 
 
+class TestAmsgFraming(unittest.TestCase):
+
+    def roundtrip(self, obj, stream=None):
+        buffers, shm_name = amsg.encode_message(42, amsg.dumps(obj))
+        if stream is None:
+            stream = amsg.MessageStream(buffer_size=64)
+        data = b''.join(buffers)
+        msgs = []
+        # Feed the data in small chunks to exercise partial reads.
+        for i in range(0, len(data), 7):
+            msgs.extend(stream.feed_data(data[i:i + 7]))
+        self.assertEqual(len(msgs), 1)
+        req_id, parts = amsg.decode_message(msgs[0])
+        self.assertEqual(req_id, 42)
+        return amsg.loads(parts), shm_name
+
+    def test_server_amsg_roundtrip(self):
+        for obj in [None, 'small', ('x' * 1000, [1, 2, 3])]:
+            self.assertEqual(self.roundtrip(obj), (obj, None))
+
+    def test_server_amsg_out_of_band(self):
+        blob = os.urandom(1000)
+        parts = amsg.dumps(('meth', (pickle.PickleBuffer(blob), b'in')))
+        self.assertEqual(len(parts), 2)
+        self.assertEqual(bytes(parts[1]), blob)
+        self.assertNotIn(blob, bytes(parts[0]))
+
+        (meth, (arg, inband)), _ = self.roundtrip(
+            ('meth', (pickle.PickleBuffer(blob), b'in')))
+        self.assertEqual(meth, 'meth')
+        self.assertEqual(bytes(arg), blob)
+        self.assertEqual(inband, b'in')
+
+    def test_server_amsg_multiple_messages(self):
+        stream = amsg.MessageStream(buffer_size=64)
+        data = b''.join(
+            b''.join(amsg.encode_message(i, amsg.dumps(i))[0])
+            for i in range(10)
+        )
+        msgs = stream.feed_data(data)
+        self.assertEqual(
+            [amsg.loads(amsg.decode_message(m)[1]) for m in msgs],
+            list(range(10)),
+        )
+
+    def test_server_amsg_shared_memory(self):
+        blob = os.urandom(amsg.SHM_THRESHOLD + 1)
+        (arg,), shm_name = self.roundtrip((pickle.PickleBuffer(blob),))
+        self.assertIsNotNone(shm_name)
+        self.assertEqual(bytes(arg), blob)
+        # The receiver removes the segment once read.
+        self.assertFalse(
+            os.path.exists(os.path.join(amsg.SHM_DIR, shm_name)))
+
+
 class TestCompilerPool(tbs.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -261,7 +336,12 @@ class TestCompilerPool(tbs.TestCase):
                 refl_schema=self._refl_schema,
                 schema_class_layout=self._schema_class_layout,
             )
+            preload_file = os.path.join(td, 'compilers.preload')
             try:
+                # The preloaded std schemas are kept for a restart of
+                # the template process.
+                self.assertTrue(os.path.exists(preload_file))
+
                 w1 = await pool_._acquire_worker()
                 w2 = await pool_._acquire_worker()
                 with self.assertRaises(AttributeError):
@@ -288,3 +368,132 @@ class TestCompilerPool(tbs.TestCase):
                 pool_._release_worker(w2)
             finally:
                 await pool_.stop()
+
+            self.assertFalse(os.path.exists(preload_file))
+
+
+class TestCompilerPoolStateSync(unittest.TestCase):
+
+    def setUp(self):
+        self.db_states = {}
+
+    def new_worker(self, max_dbs):
+        pool_ = pool.Pool(
+            loop=None,
+            runstate_dir='',
+            dbindex=None,
+            backend_runtime_params=None,
+            std_schema=None,
+            refl_schema=None,
+            schema_class_layout=None,
+            pool_size=1,
+            max_dbs_per_worker=max_dbs,
+        )
+        return pool.Worker(
+            pool_, max_dbs, None, None, None, None, 'global', 'sysconf',
+            None, 1,
+        )
+
+    def test_server_compiler_pool_worker_slots(self):
+        worker1 = self.new_worker(1)
+        pool_ = worker1._manager
+
+        def new_worker(pid):
+            return pool.Worker(
+                pool_, 1, None, None, None, None, 'global', 'sysconf',
+                None, pid,
+            )
+
+        worker2 = new_worker(2)
+        self.assertEqual((worker1._slot, worker2._slot), (0, 1))
+        pool_._workers.update({1: worker1, 2: worker2})
+
+        # A worker replacing a disconnected one takes its slot, so the
+        # number of compile_duration_seconds series stays bounded.
+        pool_.worker_disconnected(1)
+        self.assertEqual(new_worker(3)._slot, 0)
+        self.assertEqual(new_worker(4)._slot, 2)
+
+    def sync(self, worker, dbname):
+        # The pool compares the states by identity.
+        user_schema, reflection_cache, database_config = (
+            self.db_states.setdefault(dbname, (
+                f'{dbname}_schema', f'{dbname}_refl', f'{dbname}_config',
+            ))
+        )
+        preargs, sync_state = worker._manager._compute_compile_preargs(
+            worker,
+            dbname,
+            user_schema,
+            'global',
+            reflection_cache,
+            database_config,
+            'sysconf',
+        )
+        sync_state()
+        # Whether the user schema was sent.
+        return preargs[1] is not None
+
+    def test_server_compiler_pool_db_lru(self):
+        worker = self.new_worker(2)
+
+        self.assertTrue(self.sync(worker, 'db1'))
+        self.assertTrue(self.sync(worker, 'db2'))
+        self.assertFalse(self.sync(worker, 'db1'))
+        self.assertEqual(list(worker._dbs), ['db2', 'db1'])
+
+        # db2 is the least recently used one.
+        self.assertTrue(self.sync(worker, 'db3'))
+        self.assertEqual(list(worker._dbs), ['db1', 'db3'])
+
+        self.assertFalse(self.sync(worker, 'db1'))
+        self.assertTrue(self.sync(worker, 'db2'))
+        self.assertEqual(list(worker._dbs), ['db1', 'db2'])
+
+
+class TestWorkerQueue(tbs.TestCase):
+
+    async def test_server_compiler_queue_affinity_free(self):
+        q = queue.WorkerQueue(self.loop)
+        for w in ['a', 'b', 'c']:
+            q.release(w)
+
+        w = await q.acquire(condition=lambda w: w == 'b', affinity_timeout=1)
+        self.assertEqual(w, 'b')
+
+    async def test_server_compiler_queue_affinity_wait(self):
+        q = queue.WorkerQueue(self.loop)
+        q.release('a')
+
+        # 'b' is busy, but is released before the timeout.
+        acquire = self.loop.create_task(
+            q.acquire(condition=lambda w: w == 'b', affinity_timeout=10))
+        await asyncio.sleep(0.01)
+        self.assertFalse(acquire.done())
+        q.release('b')
+        self.assertEqual(await acquire, 'b')
+        self.assertEqual(await q.acquire(), 'a')
+
+    async def test_server_compiler_queue_affinity_timeout(self):
+        q = queue.WorkerQueue(self.loop)
+        q.release('a')
+
+        w = await q.acquire(
+            condition=lambda w: w == 'b', affinity_timeout=0.01)
+        self.assertEqual(w, 'a')
+
+        # 'b' is not handed over to the waiter that timed out.
+        q.release('b')
+        self.assertEqual(await q.acquire(), 'b')
+
+    async def test_server_compiler_queue_affinity_cancel(self):
+        q = queue.WorkerQueue(self.loop)
+        acquire = self.loop.create_task(
+            q.acquire(condition=lambda w: w == 'b', affinity_timeout=10))
+        await asyncio.sleep(0.01)
+        acquire.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await acquire
+
+        q.release('b')
+        self.assertEqual(await q.acquire(), 'b')
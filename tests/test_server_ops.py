@@ -349,6 +349,225 @@ class TestServerOps(tb.TestCase):
             finally:
                 cluster.stop()
 
+    def _get_metric(self, sd, series):
+        tls_context = ssl.create_default_context(cafile=sd.tls_cert_file)
+        tls_context.check_hostname = False
+        con = http.client.HTTPSConnection(
+            sd.host, sd.port, context=tls_context)
+        con.connect()
+        try:
+            con.request(
+                'GET',
+                f'https://{sd.host}:{sd.port}/server/metrics'
+            )
+            resp = con.getresponse()
+            self.assertEqual(resp.status, 200)
+            data = resp.read().decode()
+        finally:
+            con.close()
+
+        prefix = f'{series} '
+        for line in data.splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        return 0.0
+
+    def test_server_ops_query_cache_persistence(self):
+        query = 'SELECT "persisted query cache"'
+        hits_total = 'edgedb_server_query_cache_hits_total{database="edgedb"}'
+
+        async def run_query(pgdata_path, cache_dir, *, config=None):
+            async with tb.start_edgedb_server(
+                postgres_dsn=f'postgres:///?user=postgres&host={pgdata_path}',
+                reset_auth=True,
+                runstate_dir=None if devmode.is_in_dev_mode() else pgdata_path,
+                query_cache_dir=cache_dir,
+            ) as sd:
+                con = await sd.connect()
+                try:
+                    if config is not None:
+                        await con.execute(config)
+                        return None
+                    hits = self._get_metric(sd, hits_total)
+                    await con.query_one(query)
+                    return self._get_metric(sd, hits_total) - hits
+                finally:
+                    await con.aclose()
+
+        async def test(pgdata_path, cache_dir):
+            # The query is compiled and saved on shutdown.
+            self.assertEqual(await run_query(pgdata_path, cache_dir), 0)
+            # After a restart the cache is warm.
+            self.assertEqual(await run_query(pgdata_path, cache_dir), 1)
+
+            # A change of an instance setting affecting compilation
+            # invalidates the saved queries.
+            await run_query(
+                pgdata_path,
+                cache_dir,
+                config='''
+                    CONFIGURE INSTANCE SET allow_dml_in_functions := true;
+                ''',
+            )
+            self.assertEqual(await run_query(pgdata_path, cache_dir), 0)
+            self.assertEqual(await run_query(pgdata_path, cache_dir), 1)
+
+        with tempfile.TemporaryDirectory() as td, \
+                tempfile.TemporaryDirectory() as cache_dir:
+            cluster = pgcluster.get_local_pg_cluster(td)
+            cluster.set_connection_params(
+                pgconnparams.ConnectionParameters(
+                    user='postgres',
+                    database='template1',
+                ),
+            )
+            self.assertTrue(cluster.ensure_initialized())
+            cluster.start()
+            try:
+                self.loop.run_until_complete(test(td, cache_dir))
+            finally:
+                cluster.stop()
+
+    def test_server_ops_lazy_db_introspection(self):
+        introspections = 'edgedb_server_db_lazy_introspections_total'
+        evictions = 'edgedb_server_db_evictions_total'
+
+        async def wait_for_eviction(sd, count):
+            deadline = time.monotonic() + 30
+            while self._get_metric(sd, evictions) < count:
+                if time.monotonic() > deadline:
+                    raise AssertionError('the database was not evicted')
+                await asyncio.sleep(0.5)
+
+        async def connect_and_query(sd):
+            con = await sd.connect(database='lazydb')
+            try:
+                self.assertEqual(await con.query_one('SELECT 42'), 42)
+            finally:
+                await con.aclose()
+
+        async def test():
+            async with tb.start_edgedb_server(
+                lazy_db_introspection=True,
+                db_idle_eviction_timeout=1,
+            ) as sd:
+                con = await sd.connect()
+                try:
+                    await con.execute('CREATE DATABASE lazydb')
+                finally:
+                    await con.aclose()
+
+                await connect_and_query(sd)
+                await wait_for_eviction(sd, 1)
+
+                # The first connections to an unloaded database all
+                # wait on the same introspection.
+                loaded = self._get_metric(sd, introspections)
+                async with taskgroup.TaskGroup() as g:
+                    for _ in range(5):
+                        g.create_task(connect_and_query(sd))
+                self.assertEqual(
+                    self._get_metric(sd, introspections), loaded + 1)
+
+                # An idle database is unloaded again, and introspected
+                # on the next connection.
+                await wait_for_eviction(sd, 2)
+                await connect_and_query(sd)
+                self.assertEqual(
+                    self._get_metric(sd, introspections), loaded + 2)
+
+        self.loop.run_until_complete(test())
+
+    def test_server_ops_lazy_db_introspection_remote_ddl(self):
+        evictions = 'edgedb_server_db_evictions_total'
+
+        async def wait_for_eviction(sd, count):
+            deadline = time.monotonic() + 30
+            while self._get_metric(sd, evictions) < count:
+                if time.monotonic() > deadline:
+                    raise AssertionError('the database was not evicted')
+                await asyncio.sleep(0.5)
+
+        async def connect_and_query(sd, query):
+            con = await sd.connect(database='lazydb')
+            try:
+                return await con.query_one(query)
+            finally:
+                await con.aclose()
+
+        async def execute(sd, command):
+            con = await sd.connect(database='lazydb')
+            try:
+                await con.execute(command)
+            finally:
+                await con.aclose()
+
+        async def wait_for_schema(sd, query):
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    return await connect_and_query(sd, query)
+                except edgedb.InvalidReferenceError:
+                    if time.monotonic() > deadline:
+                        raise
+                    await asyncio.sleep(0.1)
+
+        async def test(pgdata_path):
+            server_args = dict(
+                postgres_dsn=f'postgres:///?user=postgres&host={pgdata_path}',
+                runstate_dir=None if devmode.is_in_dev_mode() else pgdata_path,
+            )
+            async with tb.start_edgedb_server(
+                reset_auth=True,
+                **server_args,
+            ) as sd_ddl:
+                con = await sd_ddl.connect()
+                try:
+                    await con.execute('CREATE DATABASE lazydb')
+                finally:
+                    await con.aclose()
+
+                async with tb.start_edgedb_server(
+                    lazy_db_introspection=True,
+                    db_idle_eviction_timeout=1,
+                    **server_args,
+                ) as sd:
+                    self.assertEqual(
+                        await connect_and_query(sd, 'SELECT 42'), 42)
+
+                    for i in range(1, 6):
+                        await wait_for_eviction(sd, i)
+
+                        # The schema change notification arrives while
+                        # the first connections introspect the database.
+                        async with taskgroup.TaskGroup() as g:
+                            g.create_task(
+                                execute(sd_ddl, f'CREATE TYPE Lazy{i}'))
+                            for _ in range(5):
+                                g.create_task(
+                                    connect_and_query(sd, 'SELECT 42'))
+
+                        self.assertEqual(
+                            await wait_for_schema(
+                                sd, f'SELECT count(Lazy{i})'),
+                            0,
+                        )
+
+        with tempfile.TemporaryDirectory() as td:
+            cluster = pgcluster.get_local_pg_cluster(td)
+            cluster.set_connection_params(
+                pgconnparams.ConnectionParameters(
+                    user='postgres',
+                    database='template1',
+                ),
+            )
+            self.assertTrue(cluster.ensure_initialized())
+            cluster.start()
+            try:
+                self.loop.run_until_complete(test(td))
+            finally:
+                cluster.stop()
+
     async def _test_connection(self, con):
         await con.connect()
 
@@ -29,13 +29,23 @@ Alternatively, run with
   $ python tests/test_server_pool.py
 
 to get interactive HTML report of all tests aggregated in one HTML
-file in `./tmp/connpool.html`.
+file in `./tmp/connpool.html`.  Pass `--json FILE` (or `--json -` for
+stdout) to also get the per-simulation scores, latency percentiles and
+connection overhead as JSON, e.g. to compare pool algorithm changes;
+see `python tests/test_server_pool.py --help` for all options.
+
+The simulations run in virtual time by default: the event loop clock
+jumps straight to the next scheduled timer whenever there is nothing
+else to do, so a simulation takes as long as it takes to compute it.
+Set VIRTUAL_TIME=0 to run them on the real clock instead.
 """
 
 
 from __future__ import annotations
+import argparse
 import asyncio
 import collections
+import contextlib
 import dataclasses
 import datetime
 import functools
@@ -59,6 +69,9 @@ from edb.server.connpool import pool as pool_impl
 # TIME_SCALE is used to run the simulation for longer time, the default is 1x.
 TIME_SCALE = int(os.environ.get("TIME_SCALE", '1'))
 
+# Run the simulations on a virtual clock (see VirtualTimeEventLoop).
+VIRTUAL_TIME = os.environ.get('VIRTUAL_TIME', '1') != '0'
+
 # Running this script individually for the simulation test will exit with
 # code 0 if the final score is above MIN_SCORE, non-zero otherwise.
 MIN_SCORE = int(os.environ.get('MIN_SCORE', 80))
@@ -68,13 +81,84 @@ MIN_SCORE = int(os.environ.get('MIN_SCORE', 80))
 CI_MAX_REPORTS = int(os.environ.get('CI_MAX_REPORTS', 50))
 
 C = typing.TypeVar('C')
+MIN_LATENCY = 1e-6
+T = typing.TypeVar('T')
+
+
+class _VirtualTimeSelector:
+    # Wraps the selector of a VirtualTimeEventLoop: instead of waiting
+    # for the next timer, advance the loop clock to it right away.
+
+    def __init__(self, selector, loop: VirtualTimeEventLoop) -> None:
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout=None):
+        if timeout is not None and timeout > 0:
+            self._loop.advance_time(timeout)
+            timeout = 0
+        return self._selector.select(timeout)
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """An event loop with a clock that only moves when the loop is idle.
+
+    All callbacks run in zero time, and the clock jumps straight to the
+    next scheduled timer when there is nothing else to run.  Simulated
+    connect, disconnect and query latencies (asyncio.sleep()), as well
+    as the pool ticks and GC, therefore take no real time at all.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._virtual_time = 0.0
+        self._selector = _VirtualTimeSelector(self._selector, self)
+
+    def time(self) -> float:
+        return self._virtual_time
+
+    def advance_time(self, delta: float) -> None:
+        self._virtual_time += delta
+
+
+class _LoopClock:
+    # Stands in for the `time` module in connpool.pool, so that the pool
+    # uses the virtual clock of the loop.
+
+    def monotonic(self) -> float:
+        return asyncio.get_running_loop().time()
+
+
+def run_simulation(coro: typing.Awaitable[T]) -> T:
+    if not VIRTUAL_TIME:
+        return asyncio.run(coro)
+
+    loop = VirtualTimeEventLoop()
+    try:
+        asyncio.set_event_loop(loop)
+        with unittest.mock.patch.object(pool_impl, 'time', _LoopClock()):
+            return loop.run_until_complete(coro)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+def monotonic() -> float:
+    # The time of the running loop, which is virtual in a simulation.
+    return asyncio.get_running_loop().time()
 
 
 def with_base_test(m):
     @functools.wraps(m)
     def wrapper(self):
         if self.full_qps is None:
-            self.full_qps = asyncio.run(
+            self.full_qps = run_simulation(
                 asyncio.wait_for(self.base_test(), 30 * TIME_SCALE)
             )
         return m(self)
@@ -381,7 +465,7 @@ class SimulatedCaseMeta(type):
             @functools.wraps(meth)
             def wrapper(self, meth=meth, testname=methname):
                 spec = meth(self)
-                asyncio.run(self.simulate(testname, spec))
+                run_simulation(self.simulate(testname, spec))
 
             wrapper.__name__ = methname
             wrapper.__pooltest__ = True
@@ -477,9 +561,12 @@ class SimulatedCase(unittest.TestCase, metaclass=SimulatedCaseMeta):
     ):
         async def query(sim=sim, db=db):
             try:
-                st = time.monotonic()
+                st = monotonic()
                 conn = await pool.acquire(db)
-                sim.latencies[db].append(time.monotonic() - st)
+                # An uncontended acquire takes no time at all on the
+                # virtual clock, and the latency stats need positive values.
+                sim.latencies[db].append(
+                    max(monotonic() - st, MIN_LATENCY))
                 conn.lock(db)
                 await asyncio.sleep(dur)
                 conn.unlock(db)
@@ -509,11 +596,11 @@ class SimulatedCase(unittest.TestCase, metaclass=SimulatedCaseMeta):
 
         TICK_EVERY = 0.001
 
-        started_at = time.monotonic()
+        started_at = monotonic()
         async with taskgroup.TaskGroup() as g:
             elapsed = 0
             while elapsed < spec.duration:
-                elapsed = time.monotonic() - started_at
+                elapsed = monotonic() - started_at
 
                 for db in spec.dbs:
                     if not (db.start_at < elapsed < db.end_at):
@@ -615,11 +702,11 @@ class SimulatedCase(unittest.TestCase, metaclass=SimulatedCaseMeta):
     ):
         getters = 0
         TICK_EVERY = 0.001
-        started_at = time.monotonic()
+        started_at = monotonic()
         async with taskgroup.TaskGroup() as g:
             elapsed = 0
             while elapsed < total_duration * TIME_SCALE:
-                elapsed = time.monotonic() - started_at
+                elapsed = monotonic() - started_at
 
                 qpt = qps * TICK_EVERY
                 qpt = int(random.random() <= qpt - int(qpt)) + int(qpt)
@@ -683,46 +770,98 @@ class SimulatedCase(unittest.TestCase, metaclass=SimulatedCaseMeta):
                   f'fully load the pool.')
         return qps
 
-    def simulate_all_and_collect_stats(self) -> int:
+    def simulate_all_and_collect_stats(
+        self,
+        names: typing.Sequence[str] = (),
+        *,
+        html_report: bool = True,
+        json_report: typing.Optional[typing.TextIO] = None,
+    ) -> int:
         os.environ['EDGEDB_TEST_DEBUG_POOL'] = '1'
         specs = {}
         for methname in dir(self):
             if not methname.startswith('test_'):
                 continue
+            if names and not any(name in methname for name in names):
+                continue
             meth = getattr(self, methname)
             if not getattr(meth, '__pooltest__', False):
                 continue
             spec = meth.__wrapped__(self)
             specs[methname] = spec
 
+        if not specs:
+            raise NoSimulationsError(
+                f'no simulations match {", ".join(names)}')
+
         js_data = []
         for testname, spec in specs.items():
             print(f'Running {testname}...')
             js_data.append(
-                asyncio.run(
+                run_simulation(
                     self.simulate_and_collect_stats(testname, spec)))
 
-        html = string.Template(HTML_TPL).safe_substitute(
-            DATA=json.dumps(js_data))
         score = int(round(statistics.fmean(
             sim['runs'][0]['score'] for sim in js_data
         )))
 
-        if os.environ.get("SIMULATION_CI"):
-            self.write_ci_report(html, js_data, score)
+        if json_report is not None:
+            json.dump(
+                self.make_json_report(js_data, score), json_report, indent=2)
+            print(file=json_report)
 
-        else:
-            if not os.path.exists('tmp'):
-                os.mkdir('tmp')
-            with open(f'tmp/connpool.html', 'wt') as f:
-                f.write(html)
-            now = int(datetime.datetime.now().timestamp())
-            with open(f'tmp/connpool_{now}.html', 'wt') as f:
-                f.write(html)
+        if html_report:
+            html = string.Template(HTML_TPL).safe_substitute(
+                DATA=json.dumps(js_data))
+            if os.environ.get("SIMULATION_CI"):
+                self.write_ci_report(html, js_data, score)
+            else:
+                if not os.path.exists('tmp'):
+                    os.mkdir('tmp')
+                with open(f'tmp/connpool.html', 'wt') as f:
+                    f.write(html)
+                now = int(datetime.datetime.now().timestamp())
+                with open(f'tmp/connpool_{now}.html', 'wt') as f:
+                    f.write(html)
 
         print('Final QoS score:', score)
         return score
 
+    def make_json_report(self, js_data, score):
+        # A compact summary of the simulations, without the time series
+        # of the pool stats that the HTML report is built from.
+        percentile_names = ('P1', 'P25', 'P50', 'P75', 'P99', 'Mean')
+        simulations = []
+        for sim in js_data:
+            runs = []
+            for run in sim['runs']:
+                last_stats = run['stats'][-1] if run['stats'] else {}
+                runs.append({
+                    'pool_name': run['pool_name'],
+                    'score': run['score'],
+                    'scores': run['scores'],
+                    'latency': dict(
+                        zip(percentile_names, run['total_lats'])),
+                    'db_latency': {
+                        db: dict(zip(percentile_names, lats))
+                        for db, lats in run['lats'].items()
+                    },
+                    'connects': last_stats.get('successful_connects'),
+                    'disconnects': last_stats.get('successful_disconnects'),
+                    'ending_capacity': last_stats.get('capacity'),
+                })
+            simulations.append({
+                'test_name': sim['test_name'],
+                'runs': runs,
+            })
+
+        return {
+            'score': score,
+            'time_scale': TIME_SCALE,
+            'virtual_time': VIRTUAL_TIME,
+            'simulations': simulations,
+        }
+
     def write_ci_report(self, html, js_data, score):
         sha = os.environ.get('GITHUB_SHA')
         path = f'reports/{sha}.html'
@@ -1407,6 +1546,35 @@ class TestServerConnectionPool(unittest.TestCase):
 
         asyncio.run(main())
 
+    def test_connpool_affinity(self):
+        async def test():
+            pool = connpool.Pool(
+                connect=self.make_fake_connect(),
+                disconnect=self.make_fake_disconnect(),
+                max_capacity=5,
+            )
+
+            conns = [await pool.acquire('A') for _ in range(3)]
+            pool.release('A', conns[0], affinity='x')
+            pool.release('A', conns[1], affinity='y')
+            pool.release('A', conns[2])
+
+            # A connection released with the same affinity is preferred
+            # over the most recently used one.
+            conn = await pool.acquire('A', affinity='x')
+            self.assertIs(conn, conns[0])
+            pool.release('A', conn, affinity='x')
+
+            conn = await pool.acquire('A', affinity='y')
+            self.assertIs(conn, conns[1])
+            pool.release('A', conn)
+
+            conn = await pool.acquire('A', affinity='x')
+            self.assertIs(conn, conns[0])
+            pool.release('A', conn)
+
+        asyncio.run(asyncio.wait_for(test(), timeout=5))
+
     class MockLogger(logging.Logger):
         logs: asyncio.Queue
 
@@ -2307,16 +2475,66 @@ HTML_TPL = R'''<!DOCTYPE html>
 '''
 
 
+class NoSimulationsError(Exception):
+    pass
+
+
 def run():
-    try:
-        import uvloop
-    except ImportError:
-        pass
-    else:
-        uvloop.install()
+    global VIRTUAL_TIME
+
+    parser = argparse.ArgumentParser(
+        description='Run the connection pool simulations.')
+    parser.add_argument(
+        'names', nargs='*', metavar='NAME',
+        help='only run the simulations with names containing NAME')
+    parser.add_argument(
+        '--json', metavar='FILE', dest='json_path',
+        help='write the results as JSON to FILE ("-" for stdout)')
+    parser.add_argument(
+        '--no-html', action='store_true',
+        help='do not write the HTML report')
+    parser.add_argument(
+        '--seed', type=int,
+        help='seed the random load generator for repeatable runs')
+    parser.add_argument(
+        '--real-time', action='store_true',
+        help='run the simulations on the real clock')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    if args.real_time:
+        VIRTUAL_TIME = False
+
+    if not VIRTUAL_TIME:
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            uvloop.install()
 
     test_sim = TestServerConnpoolSimulation()
-    if test_sim.simulate_all_and_collect_stats() < MIN_SCORE:
+    with contextlib.ExitStack() as stack:
+        if args.json_path == '-':
+            json_report = sys.stdout
+            # Keep the progress output out of the JSON.
+            stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+        elif args.json_path:
+            json_report = stack.enter_context(open(args.json_path, 'wt'))
+        else:
+            json_report = None
+
+        try:
+            score = test_sim.simulate_all_and_collect_stats(
+                args.names,
+                html_report=not args.no_html,
+                json_report=json_report,
+            )
+        except NoSimulationsError as e:
+            parser.error(str(e))
+
+    if score < MIN_SCORE:
         print(
             f'WARNING: the score is below the bar ({MIN_SCORE}), please '
             f'double check the changes made to edb/server/connpool/pool.py'
@@ -1427,6 +1427,50 @@ class TestServerProto(tb.QueryTestCase):
             await self.con.query('SELECT 42'),
             [42])
 
+    async def test_server_proto_tx_08(self):
+        # Test that scripts of many transactions, which are sent to
+        # Postgres as a pipeline, keep the transactions that committed
+        # before an error.
+
+        try:
+            with self.assertRaises(edgedb.DivisionByZeroError):
+                await self.con.execute('''
+                    START TRANSACTION;
+                    INSERT Tmp { tmp := 'pipeline-1' };
+                    COMMIT;
+                    START TRANSACTION;
+                    INSERT Tmp { tmp := 'pipeline-2' };
+                    COMMIT;
+                    START TRANSACTION;
+                    INSERT Tmp { tmp := 'pipeline-3' };
+                    SELECT 1 / 0;
+                    COMMIT;
+                    START TRANSACTION;
+                    INSERT Tmp { tmp := 'pipeline-4' };
+                    COMMIT;
+                ''')
+
+            # The failed transaction must be rolled back explicitly.
+            with self.assertRaisesRegex(
+                    edgedb.TransactionError,
+                    "current transaction is aborted"):
+                await self.con.query('SELECT 1;')
+
+            await self.con.query('ROLLBACK')
+
+            self.assertEqual(
+                await self.con.query('''
+                    SELECT Tmp.tmp
+                    FILTER Tmp.tmp LIKE 'pipeline-%'
+                    ORDER BY Tmp.tmp
+                '''),
+                ['pipeline-1', 'pipeline-2'],
+            )
+        finally:
+            await self.con.execute('''
+                DELETE (SELECT Tmp FILTER Tmp.tmp LIKE 'pipeline-%');
+            ''')
+
     async def test_server_proto_tx_10(self):
         # Basic test that ROLLBACK works on SET ALIAS changes.
 